@@ -0,0 +1,204 @@
+"""
+Async SMTP Client
+=================
+Non-blocking counterpart of email_sender's SMTPPool for asyncio code.
+Keeps a small pool of connected, authenticated aiosmtplib sessions per
+event loop, so many sends run at once on one loop without a thread each.
+
+Covers the same settings as the sync sender (email_sender.get_smtp_settings):
+SMTP_SECURITY=starttls|tls|none, SMTP_TLS_VERIFY, SMTP_USER/SMTP_PASSWORD
+auth, and SMTP_TIMEOUT for the connect and every command.
+
+Usage:
+    from email_sender import send_email_async, send_bulk_async
+    await send_email_async(to_email, subject, body)
+    results = await send_bulk_async([(to_email, subject, body), ...])
+
+    # Lower level
+    from async_smtp_client import get_async_smtp_pool
+    await get_async_smtp_pool(settings).send_message(msg)   # MIME message or RenderedEmail
+    await close_async_smtp_pools()          # on shutdown
+
+Try it against a local sink (no network): python smtp_sink.py --demo 500
+"""
+
+import asyncio
+import time
+import weakref
+from typing import Dict, List
+
+import aiosmtplib
+
+from email_sender import (
+    SMTP_MAX_MESSAGES_PER_CONNECTION,
+    SMTP_NOOP_AFTER_SECONDS,
+    SMTP_POOL_IDLE_SECONDS,
+    SMTP_POOL_SIZE,
+    format_from,
+    get_smtp_settings,
+    settings_key,
+)
+from email_templates import RenderedEmail
+from send_rate_limiter import get_rate_limiter
+
+# Errors after which the session is still usable
+MESSAGE_ERRORS = (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPSenderRefused, aiosmtplib.SMTPDataError)
+# The session is gone; the message in flight was not acknowledged
+DISCONNECT_ERRORS = (aiosmtplib.SMTPServerDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+async def transmit(client: aiosmtplib.SMTP, msg, settings: dict):
+    """Async email_sender.transmit: RenderedEmails go out as pre-encoded 8BITMIME bytes."""
+    if isinstance(msg, RenderedEmail):
+        if msg.wire_ready and client.supports_extension('8bitmime'):
+            return await client.sendmail(settings['from_email'], [msg.to_email],
+                                         msg.as_bytes(format_from(settings)), mail_options=['BODY=8BITMIME'])
+        msg = msg.as_mime(settings)
+    return await client.send_message(msg)
+
+
+class AsyncPooledConnection:
+    def __init__(self, client: aiosmtplib.SMTP):
+        self.client = client
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages_sent = 0
+
+    async def close(self):
+        try:
+            await self.client.quit()
+        except Exception:
+            self.client.close()
+
+
+class AsyncSMTPPool:
+    """
+    Pool of authenticated aiosmtplib sessions bound to one event loop.
+
+    At most max_size sessions are open; further sends wait on a semaphore.
+    Idle sessions are reused LIFO, NOOP-checked after sitting idle, and
+    closed once idle longer than idle_timeout.
+    """
+
+    def __init__(self, settings: dict, max_size: int = SMTP_POOL_SIZE,
+                 idle_timeout: float = SMTP_POOL_IDLE_SECONDS):
+        self.settings = settings
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self._idle: List[AsyncPooledConnection] = []
+        self._slots = asyncio.Semaphore(self.max_size)
+        self.stats = {'opened': 0, 'reused': 0, 'dropped': 0, 'sent': 0}
+
+    async def _open(self) -> AsyncPooledConnection:
+        settings = self.settings
+        client = aiosmtplib.SMTP(
+            hostname=settings['host'],
+            port=settings['port'],
+            use_tls=settings['security'] == 'tls',
+            start_tls=settings['security'] == 'starttls',
+            timeout=settings['timeout'],
+            validate_certs=settings['verify_certs'],
+        )
+        await client.connect()
+        try:
+            if settings['user'] and settings['password']:
+                await client.login(settings['user'], settings['password'])
+        except Exception:
+            client.close()
+            raise
+        self.stats['opened'] += 1
+        return AsyncPooledConnection(client)
+
+    async def _is_healthy(self, conn: AsyncPooledConnection) -> bool:
+        if not conn.client.is_connected or conn.messages_sent >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+            return False
+        if time.monotonic() - conn.last_used < SMTP_NOOP_AFTER_SECONDS:
+            return True
+        try:
+            return (await conn.client.noop()).code == 250
+        except (aiosmtplib.SMTPException, OSError):
+            return False
+
+    async def _checkout(self) -> AsyncPooledConnection:
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle:
+            conn = self._idle.pop()
+            if conn.last_used >= cutoff and await self._is_healthy(conn):
+                self.stats['reused'] += 1
+                return conn
+            await self._discard(conn)
+        return await self._open()
+
+    async def _discard(self, conn: AsyncPooledConnection):
+        self.stats['dropped'] += 1
+        await conn.close()
+
+    def _checkin(self, conn: AsyncPooledConnection):
+        conn.last_used = time.monotonic()
+        self._idle.append(conn)
+
+    async def _send_once(self, msg) -> bool:
+        """Send on one pooled session. Returns whether that session was reused."""
+        async with self._slots:
+            conn = await self._checkout()
+            reused = conn.messages_sent > 0 or conn.last_used != conn.created_at
+            try:
+                errors, _ = await transmit(conn.client, msg, self.settings)
+            except MESSAGE_ERRORS:
+                self._checkin(conn)
+                raise
+            except BaseException as e:
+                # Unknown session state: never reuse. Tag disconnects on reused
+                # sessions so send_message can retry them on a fresh one.
+                await self._discard(conn)
+                e.stale_connection = reused
+                raise
+            conn.messages_sent += 1
+            self._checkin(conn)
+            if errors:
+                raise aiosmtplib.SMTPRecipientsRefused(
+                    [aiosmtplib.SMTPRecipientRefused(code, message, rcpt)
+                     for rcpt, (code, message) in errors.items()]
+                )
+            return reused
+
+    async def send_message(self, msg):
+        """
+        Send one message. A reused session that the server already dropped is
+        retried once on a fresh one; other errors propagate unchanged.
+        Waits for a token from the account's shared rate limiter first.
+        """
+        await get_rate_limiter(self.settings).acquire_async()
+        try:
+            await self._send_once(msg)
+        except DISCONNECT_ERRORS as e:
+            if not getattr(e, 'stale_connection', False):
+                raise
+            await self._send_once(msg)
+        self.stats['sent'] += 1
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await conn.close()
+
+
+# event loop -> {settings key: pool}; entries vanish with their loop
+_pools: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, AsyncSMTPPool]]' = \
+    weakref.WeakKeyDictionary()
+
+
+def get_async_smtp_pool(settings: dict = None) -> AsyncSMTPPool:
+    """The running event loop's pool for these SMTP settings."""
+    settings = settings or get_smtp_settings()
+    loop_pools = _pools.setdefault(asyncio.get_running_loop(), {})
+    key = settings_key(settings)
+    if key not in loop_pools:
+        loop_pools[key] = AsyncSMTPPool(settings)
+    return loop_pools[key]
+
+
+async def close_async_smtp_pools():
+    """QUIT every pooled session owned by the running event loop."""
+    for pool in _pools.pop(asyncio.get_running_loop(), {}).values():
+        await pool.close()
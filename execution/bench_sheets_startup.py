@@ -0,0 +1,93 @@
+"""
+Sheets Client Startup Benchmark
+===============================
+Measures time from process start to the first Google Sheets request, the
+cold-start path for the webhook workers and the hourly scheduler cron.
+
+Each run spawns a fresh Python process that imports google_sheets_client,
+builds a SheetsClient and reads the header row. Three configurations:
+    full   - SHEETS_DISCOVERY_CACHE=0, full bundled discovery doc via build()
+    cold   - pruned discovery doc, cache file deleted before the run
+    warm   - pruned discovery doc loaded from the on-disk cache
+
+Usage:
+    python bench_sheets_startup.py --runs 5
+    python bench_sheets_startup.py --no-request    # stop at client construction
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from sheets_discovery import DISCOVERY_CACHE_DIR
+
+CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {here!r})
+from google_sheets_client import SheetsClient
+t1 = time.perf_counter()
+client = SheetsClient()
+t2 = time.perf_counter()
+if {request}:
+    client.sheet.values().get(spreadsheetId=client.sheet_id, range='Sheet1!1:1').execute()
+t3 = time.perf_counter()
+print(json.dumps({{'import_ms': (t1 - t0) * 1000, 'construct_ms': (t2 - t1) * 1000,
+                  'first_request_ms': (t3 - t2) * 1000}}))
+'''
+
+
+def run_once(mode: str, request: bool) -> dict:
+    env = dict(os.environ)
+    if mode == 'full':
+        env['SHEETS_DISCOVERY_CACHE'] = '0'
+    elif mode == 'cold':
+        shutil.rmtree(DISCOVERY_CACHE_DIR, ignore_errors=True)
+
+    code = CHILD.format(here=str(Path(__file__).parent), request=request)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True)
+    total_ms = (time.perf_counter() - started) * 1000
+
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'child failed')
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process_total_ms'] = total_ms
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Sheets client cold start')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--no-request', action='store_true',
+                        help='Skip the first Sheets request (no network needed)')
+    args = parser.parse_args()
+
+    print(f"\n{'='*72}")
+    target = 'client ready' if args.no_request else 'first Sheets request'
+    print(f"Process start -> {target} (median of {args.runs} runs, ms)")
+    print(f"{'='*72}")
+    print(f"{'mode':<8}{'import':>12}{'construct':>12}{'request':>12}{'process total':>18}")
+
+    for mode in ('full', 'cold', 'warm'):
+        try:
+            runs = [run_once(mode, not args.no_request) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{mode:<8} failed: {e}")
+            continue
+
+        def median(key):
+            return statistics.median(r[key] for r in runs)
+
+        print(f"{mode:<8}{median('import_ms'):>12.1f}{median('construct_ms'):>12.1f}"
+              f"{median('first_request_ms'):>12.1f}{median('process_total_ms'):>18.1f}")
+
+
+if __name__ == '__main__':
+    main()
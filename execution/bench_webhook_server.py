@@ -0,0 +1,101 @@
+"""
+Webhook Server Load Benchmark
+=============================
+Drives a running webhook server with concurrent clients and reports
+throughput (req/s) and latency percentiles (p50/p95/p99).
+
+Usage:
+    python webhook_server.py --workers 4 --threads 8 &
+    python bench_webhook_server.py --requests 2000 --concurrency 32
+    python bench_webhook_server.py --path /api/webinar --payload '{"email": "load@test.dev"}'
+
+Defaults to GET /health so it can run without touching the Google Sheet.
+Only POST to /api/* against a test sheet and test SMTP account.
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+
+def run_client(target, path, method, body, count, latencies, errors, lock):
+    """Issue `count` requests over one keep-alive connection."""
+    conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+    headers = {'Content-Type': 'application/json'} if body else {}
+    for _ in range(count):
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 500
+        except Exception:
+            conn.close()
+            conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+            ok = False
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors.append(elapsed)
+    conn.close()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the PlanWell webhook server')
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--path', default='/health')
+    parser.add_argument('--payload', default=None, help='JSON body (switches method to POST)')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    target = urlparse(args.url)
+    method = 'POST' if args.payload else 'GET'
+    body = json.dumps(json.loads(args.payload)) if args.payload else None
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    per_client = max(1, args.requests // args.concurrency)
+
+    threads = [
+        threading.Thread(target=run_client,
+                         args=(target, args.path, method, body, per_client, latencies, errors, lock))
+        for _ in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"\n{'='*60}")
+    print(f"{method} {args.url}{args.path} - {len(latencies)} requests, {args.concurrency} clients")
+    print(f"{'='*60}")
+    print(f"  Throughput: {len(latencies) / elapsed:,.1f} req/s")
+    print(f"  p50: {percentile(latencies, 50):.2f} ms")
+    print(f"  p95: {percentile(latencies, 95):.2f} ms")
+    print(f"  p99: {percentile(latencies, 99):.2f} ms")
+    print(f"  Errors: {len(errors)}")
+
+    try:
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=5)
+        conn.request('GET', '/metrics')
+        print(f"  Server-side (one worker): {conn.getresponse().read().decode()}")
+    except Exception as e:
+        print(f"  Could not read /metrics: {e}")
+
+
+if __name__ == '__main__':
+    main()
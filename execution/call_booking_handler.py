@@ -15,6 +15,7 @@ Environment Variables Required:
 import os
 import json
 import csv
+import threading
 from datetime import datetime
 from pathlib import Path
 from flask import Flask, request, jsonify
@@ -24,6 +25,9 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent / '.env')
 
+from email_templates import EmailTemplate, check_header_value
+from outbox import PermanentJobError, enqueue, ensure_dispatcher, register_job
+
 app = Flask(__name__)
 CORS(app)
 
@@ -49,6 +53,8 @@ ADVISORS = [
 
 # Track round-robin state
 STATE_FILE = Path(__file__).parent / '.call_booking_state.json'
+# Serializes the state file's read-modify-write and the CSV appends across request threads
+_files_lock = threading.Lock()
 
 def get_state():
     """Load round-robin state from file."""
@@ -67,18 +73,19 @@ def get_next_advisor():
     Round-robin assignment between advisors.
     Returns the advisor who should get the next lead.
     """
-    state = get_state()
-    
-    # Simple alternation
-    if state['last_assigned'] == 'david':
-        next_advisor = 'brennan'
-    else:
-        next_advisor = 'david'
-    
-    # Update state
-    state['last_assigned'] = next_advisor
-    state['assignment_count'][next_advisor] += 1
-    save_state(state)
+    with _files_lock:
+        state = get_state()
+        
+        # Simple alternation
+        if state['last_assigned'] == 'david':
+            next_advisor = 'brennan'
+        else:
+            next_advisor = 'david'
+        
+        # Update state
+        state['last_assigned'] = next_advisor
+        state['assignment_count'][next_advisor] += 1
+        save_state(state)
     
     # Return advisor info
     return next(a for a in ADVISORS if a['id'] == next_advisor)
@@ -102,14 +109,25 @@ def is_qualified(screening):
     
     return True, "qualified"
 
+def header_field_error(data):
+    """
+    Error message if a field that ends up in an email header (the name in
+    the advisor's subject, the email as a recipient) has a line break, else None.
+    """
+    for field in ('name', 'email'):
+        try:
+            check_header_value(str(data.get(field) or ''), field)
+        except ValueError:
+            return f"{field} must not contain line breaks"
+    return None
+
 def log_submission(data, advisor, qualified):
     """Log submission to CSV file for tracking."""
     log_file = Path(__file__).parent / '.tmp' / 'call_bookings.csv'
     log_file.parent.mkdir(exist_ok=True)
     
-    file_exists = log_file.exists()
-    
-    with open(log_file, 'a', newline='') as f:
+    with _files_lock, open(log_file, 'a', newline='') as f:
+        file_exists = f.tell() > 0
         writer = csv.writer(f)
         if not file_exists:
             writer.writerow(['timestamp', 'name', 'email', 'phone', 'topic', 
@@ -127,21 +145,16 @@ def log_submission(data, advisor, qualified):
             data.get('single_question', '')
         ])
 
-def send_confirmation_email(prospect, advisor):
-    """
-    Send confirmation email to prospect introducing their assigned advisor.
-    """
-    from email_sender import send_email
-    
-    subject = f"Your Call with {advisor['name']} at PlanWell"
-    
-    body = f"""Hi {prospect.get('name', 'there')},
+CALL_CONFIRMATION = EmailTemplate(
+    'call_confirmation',
+    subject="Your Call with {advisor_name} at PlanWell",
+    plain="""Hi {prospect_name},
 
-You're all set! {advisor['name']} will be reaching out within 1 business day to schedule your call.
+You're all set! {advisor_name} will be reaching out within 1 business day to schedule your call.
 
-About {advisor['name']}:
-{advisor['name']}, {advisor['title']}
-{advisor['bio']}
+About {advisor_name}:
+{advisor_name}, {advisor_title}
+{advisor_bio}
 
 In the meantime, you can prepare by:
 • Gathering your latest SF-50
@@ -151,14 +164,75 @@ In the meantime, you can prepare by:
 We look forward to speaking with you!
 
 — The PlanWell Team
-"""
+""",
+)
+
+ADVISOR_NOTIFICATION = EmailTemplate(
+    'advisor_notification',
+    subject="🔔 New Call Booking: {prospect_name}",
+    plain="""New call booking request:
+
+Name: {name}
+Email: {email}
+Phone: {phone}
+Topic: {topic}
+
+Screening Answers:
+- Federal Employee: {is_federal_employee}
+- Wants Advisor: {wants_advisor}
+- Single Question: {single_question}
+
+Submitted: {submitted}
+
+Please reach out within 1 business day to schedule the call.
+""",
+)
+
+def render_confirmation_email(prospect, advisor):
+    """
+    Render the prospect confirmation email, addressed to the prospect.
+    """
+    return CALL_CONFIRMATION.render(
+        prospect['email'],
+        prospect_name=prospect.get('name', 'there'),
+        advisor_name=advisor['name'],
+        advisor_title=advisor['title'],
+        advisor_bio=advisor['bio']
+    )
+
+def render_advisor_notification(prospect, advisor):
+    """
+    Render the new-lead notification, addressed to the assigned advisor.
+    """
+    return ADVISOR_NOTIFICATION.render(
+        advisor['email'],
+        prospect_name=prospect.get('name', 'Unknown'),
+        submitted=datetime.now().strftime('%Y-%m-%d %I:%M %p'),
+        **{field: prospect.get(field) for field in (
+            'name', 'email', 'phone', 'topic', 'is_federal_employee', 'wants_advisor', 'single_question'
+        )}
+    )
+
+def build_confirmation_email(prospect, advisor):
+    """
+    Build the prospect confirmation email. Returns (subject, body).
+    """
+    return render_confirmation_email(prospect, advisor).as_text()[:2]
+
+def build_advisor_notification(prospect, advisor):
+    """
+    Build the new-lead notification for the assigned advisor. Returns (subject, body).
+    """
+    return render_advisor_notification(prospect, advisor).as_text()[:2]
+
+def send_confirmation_email(prospect, advisor):
+    """
+    Send confirmation email to prospect introducing their assigned advisor.
+    """
+    from email_sender import send_rendered
     
     try:
-        send_email(
-            to_email=prospect['email'],
-            subject=subject,
-            body=body
-        )
+        send_rendered(render_confirmation_email(prospect, advisor))
         return True
     except Exception as e:
         print(f"Failed to send confirmation email: {e}")
@@ -168,39 +242,56 @@ def send_advisor_notification(prospect, advisor):
     """
     Notify the assigned advisor about the new lead.
     """
-    from email_sender import send_email
-    
-    subject = f"🔔 New Call Booking: {prospect.get('name', 'Unknown')}"
-    
-    body = f"""New call booking request:
-
-Name: {prospect.get('name')}
-Email: {prospect.get('email')}
-Phone: {prospect.get('phone')}
-Topic: {prospect.get('topic')}
-
-Screening Answers:
-- Federal Employee: {prospect.get('is_federal_employee')}
-- Wants Advisor: {prospect.get('wants_advisor')}
-- Single Question: {prospect.get('single_question')}
-
-Submitted: {datetime.now().strftime('%Y-%m-%d %I:%M %p')}
-
-Please reach out within 1 business day to schedule the call.
-"""
+    from email_sender import send_rendered
     
     try:
-        send_email(
-            to_email=advisor['email'],
-            subject=subject,
-            body=body
-        )
+        send_rendered(render_advisor_notification(prospect, advisor))
         return True
     except Exception as e:
         print(f"Failed to send advisor notification: {e}")
         return False
 
 
+def process_call_booking_emails(job):
+    """
+    Outbox job: send the prospect confirmation and the advisor notification.
+    
+    Both go out in one SMTP session via send_bulk. Each email is
+    checkpointed once sent, so a retry only resends what failed.
+    """
+    from email_sender import get_smtp_settings, send_bulk, smtp_configured
+    
+    prospect = job.payload['prospect']
+    advisor = next(a for a in ADVISORS if a['id'] == job.payload['advisor_id'])
+    
+    # A bad header value or template fails the same way on every attempt
+    invalid = header_field_error(prospect)
+    if invalid:
+        raise PermanentJobError(invalid)
+    pending = {}
+    try:
+        if not job.payload.get('confirmation_sent'):
+            pending['confirmation_sent'] = render_confirmation_email(prospect, advisor)
+        if not job.payload.get('notification_sent'):
+            pending['notification_sent'] = render_advisor_notification(prospect, advisor)
+    except ValueError as e:
+        raise PermanentJobError(str(e))
+    if not pending:
+        return
+    
+    results = send_bulk(pending.values())
+    if not smtp_configured(get_smtp_settings()):
+        return  # send_bulk logged the messages; nothing to retry until SMTP is set up
+    job.checkpoint(**{flag: True for flag, result in zip(pending, results) if result.ok})
+    
+    failed = [result for result in results if not result.ok]
+    if failed:
+        raise RuntimeError('; '.join(f"Email to {r.to_email} was not sent: {r.error}" for r in failed))
+
+
+register_job('call_booking_emails', process_call_booking_emails)
+
+
 @app.route('/api/book-call', methods=['POST'])
 def book_call():
     """
@@ -222,6 +313,13 @@ def book_call():
     if not data:
         return jsonify({'success': False, 'error': 'No data provided'}), 400
     
+    if not data.get('email'):
+        return jsonify({'success': False, 'error': 'Email is required'}), 400
+    
+    invalid = header_field_error(data)
+    if invalid:
+        return jsonify({'success': False, 'error': invalid}), 400
+    
     # Check screening qualification
     qualified, reason = is_qualified(data)
     
@@ -240,15 +338,19 @@ def book_call():
                 'message': reason
             })
     
-    # Assign advisor (round-robin)
-    advisor = get_next_advisor()
-    
-    # Log the submission
-    log_submission(data, advisor, True)
+    try:
+        # Assign advisor (round-robin)
+        advisor = get_next_advisor()
+        
+        # Log the submission
+        log_submission(data, advisor, True)
+        
+        # Queue both emails; the outbox dispatcher sends them with retries
+        enqueue('call_booking_emails', {'prospect': data, 'advisor_id': advisor['id']})
     
-    # Send emails
-    send_confirmation_email(data, advisor)
-    send_advisor_notification(data, advisor)
+    except Exception as e:
+        print(f"Error handling call booking: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
     
     return jsonify({
         'success': True,
@@ -258,7 +360,7 @@ def book_call():
             'bio': advisor['bio']
         },
         'message': f"You've been matched with {advisor['name']}!"
-    })
+    }), 202
 
 
 @app.route('/health', methods=['GET'])
@@ -270,4 +372,5 @@ def health():
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
     print(f"Starting Call Booking Handler on port {port}")
+    ensure_dispatcher()  # drain jobs left over from before a restart
     app.run(host='0.0.0.0', port=port, debug=True)
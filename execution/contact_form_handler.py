@@ -28,6 +28,7 @@ from dotenv import load_dotenv
 load_dotenv(Path(__file__).parent.parent / '.env')
 
 from google_sheets_client import SheetsClient
+from outbox import enqueue, ensure_dispatcher, register_job
 
 app = Flask(__name__)
 CORS(app)
@@ -36,6 +37,19 @@ CORS(app)
 CONTACT_SHEET_ID = os.environ.get('CONTACT_SHEET_ID', os.environ.get('GOOGLE_SHEET_ID'))
 
 
+def build_contact_row(data: dict) -> list:
+    """Build a contact sheet row (First Name .. Source) from form data."""
+    return [
+        data.get('first_name', ''),
+        data.get('last_name', ''),
+        data.get('email', ''),
+        data.get('phone', ''),
+        data.get('message', ''),
+        data.get('submitted_at') or datetime.now().isoformat(),
+        'contact_form'
+    ]
+
+
 class ContactSheetsClient(SheetsClient):
     """Extended client for contact form submissions."""
     
@@ -45,35 +59,59 @@ class ContactSheetsClient(SheetsClient):
     
     def add_contact_submission(self, data: dict) -> int:
         """Add a contact form submission to the sheet."""
-        row = [
-            data.get('first_name', ''),
-            data.get('last_name', ''),
-            data.get('email', ''),
-            data.get('phone', ''),
-            data.get('message', ''),
-            datetime.now().isoformat(),
-            'contact_form'
-        ]
-        
-        result = self.sheet.values().append(
+        # Coalesced with concurrent submissions into one append call
+        return self.append_batcher('Sheet1!A:G').append(build_contact_row(data))
+    
+    def find_contact_submission(self, email: str, submitted_at: str):
+        """Row number of a submission already in the sheet (matched on Email and Submitted At), or None."""
+        result = self.sheet.values().get(
             spreadsheetId=self.sheet_id,
-            range='Sheet1!A:G',
-            valueInputOption='RAW',
-            insertDataOption='INSERT_ROWS',
-            body={'values': [row]}
+            range='Sheet1!C:F'
         ).execute()
-        
-        updated_range = result.get('updates', {}).get('updatedRange', '')
-        if updated_range:
-            return int(updated_range.split('!')[1].split(':')[0][1:])
-        return -1
+        for row_num, row in enumerate(result.get('values', []), start=1):
+            if len(row) >= 4 and row[0] == email and row[3] == submitted_at:
+                return row_num
+        return None
+
+
+def process_contact_submission(job):
+    """
+    Outbox job: append the contact form submission to the contact sheet.
+    
+    The row number is checkpointed once appended, so a retry never appends
+    again. A retry with no checkpoint (the worker died, or the append timed
+    out after Sheets wrote it) first looks for the row by its email and
+    submission time.
+    """
+    data = job.payload
+    if data.get('row_num') is not None:
+        return
+    
+    sheets = ContactSheetsClient.shared()
+    if job.attempts and data.get('submitted_at'):
+        row_num = sheets.find_contact_submission(data.get('email', ''), data['submitted_at'])
+        if row_num is not None:
+            job.checkpoint(row_num=row_num)
+            print(f"Contact form submission already in row {row_num}")
+            return
+    
+    row_num = sheets.add_contact_submission(data)
+    job.checkpoint(row_num=row_num)
+    
+    print(f"Contact form submission added to row {row_num}")
+    print(f"  Name: {data.get('first_name')} {data.get('last_name')}")
+    print(f"  Email: {data.get('email')}")
+
+
+register_job('contact_submission', process_contact_submission)
 
 
 @app.route('/api/contact', methods=['POST'])
 def handle_contact_form():
     """
     Handle contact form submission.
-    Adds to Google Sheet (no notification emails - advisors check sheet directly).
+    Queues it for the contact sheet and returns 202
+    (no notification emails - advisors check sheet directly).
     """
     data = request.json
     
@@ -85,17 +123,16 @@ def handle_contact_form():
         return jsonify({'success': False, 'error': 'Email is required'}), 400
     
     try:
-        sheets = ContactSheetsClient()
-        row_num = sheets.add_contact_submission(data)
-        
-        print(f"Contact form submission added to row {row_num}")
-        print(f"  Name: {data.get('first_name')} {data.get('last_name')}")
-        print(f"  Email: {email}")
+        # Stamp the submission time now rather than when the dispatcher runs
+        submission = dict(data, submitted_at=datetime.now().isoformat())
+        job_id = enqueue('contact_submission', submission)
         
         return jsonify({
             'success': True,
-            'message': 'Contact form received'
-        })
+            'message': 'Contact form received',
+            'queued': True,
+            'job_id': job_id
+        }), 202
         
     except Exception as e:
         print(f"Error handling contact form: {e}")
@@ -115,4 +152,5 @@ if __name__ == '__main__':
     port = int(os.environ.get('CONTACT_PORT', 5002))
     print(f"Starting Contact Form Handler on port {port}")
     print(f"Webhook URL: http://localhost:{port}/api/contact")
+    ensure_dispatcher()  # drain jobs left over from before a restart
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,184 @@
+"""
+Email Retry Queue
+=================
+Persistent retries for emails that failed to send, built on the outbox
+(outbox.py): each failed message becomes an 'email' outbox job, stored as
+its template name and values and rendered again on every attempt.
+
+Attempts back off exponentially with jitter (outbox BASE_BACKOFF_SECONDS,
+5s doubling, +/-20%), so a transient SMTP failure is retried within
+seconds rather than at the next hourly scheduler run. Permanent failures
+(5xx refusals, bad credentials) and jobs that run out of attempts land in
+the outbox's dead-letter status, where the CLI can list and replay them.
+
+When a queued reminder finally goes out, it is recorded in the send
+ledger (send_ledger.py) as sent, then as synced once its sheet flag (e.g.
+Email_7Day_Sent) and the registrant mirror are updated. The scheduler
+skips rows with a queued or dead-lettered retry for the same flag, so a
+message is never both retried and re-sent by the next run.
+
+Any outbox dispatcher that has imported this module delivers retries
+(the webhook server's, `python outbox.py dispatch`), and the scheduler
+drains due retries itself at the start and end of every run.
+
+Usage:
+    from email_retry import queue_retry, drain
+    queue_retry(rendered, error, sheet_id=..., row_number=12, column='Email_7Day_Sent',
+                webinar_id='2026-01-16')
+    drain(max_seconds=60)
+
+CLI:
+    python email_retry.py stats              # retry jobs by status
+    python email_retry.py dead               # dead-lettered messages and their errors
+    python email_retry.py replay <id>        # move one dead message back to the queue
+    python email_retry.py replay --all       # ... or all of them
+    python email_retry.py drain [seconds]    # deliver due retries now (default 60s budget)
+"""
+
+import json
+import os
+import smtplib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+from email_sender import SMTPNotConfigured, deliver
+from email_templates import RenderedEmail, get_template
+from outbox import BASE_BACKOFF_SECONDS, OutboxDispatcher, PermanentJobError, get_outbox, register_job
+import webinar_emails  # noqa: F401 - registers the nurture templates
+
+EMAIL_JOB = 'email'
+# Job statuses during which the scheduler must not send the same reminder itself
+OPEN_STATUSES = ['pending', 'processing', 'dead']
+RETRY_DRAIN_SECONDS = float(os.environ.get('EMAIL_RETRY_DRAIN_SECONDS', 60))
+
+
+def is_permanent(error: Exception) -> bool:
+    """SMTP 5xx replies won't change on retry; timeouts, disconnects and 4xx replies might."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+def queue_retry(message: RenderedEmail, error: Exception, sheet_id: str = None,
+                row_number: int = None, column: str = None, label: str = None,
+                webinar_id: str = None) -> Optional[int]:
+    """
+    Queue a failed send for retry, or dead-letter it straight away if the
+    failure is permanent. With row_number and column, the sheet flag is
+    set once the retry succeeds; with webinar_id as well, the send ledger
+    records it. Returns the job id (None when SMTP is not
+    configured at all - there is nothing to retry against).
+    """
+    if isinstance(error, SMTPNotConfigured):
+        return None
+    payload = {
+        'to_email': message.to_email,
+        'template': message.template.name,
+        'values': message.values,
+        'label': label or message.template.name,
+        'sheet_id': sheet_id,
+        'row_number': row_number,
+        'column': column,
+        'webinar_id': webinar_id,
+    }
+    error_text = f"{type(error).__name__}: {error}"
+    if is_permanent(error):
+        return get_outbox().enqueue(EMAIL_JOB, payload, status='dead', error=error_text)
+    return get_outbox().enqueue(EMAIL_JOB, payload, delay=BASE_BACKOFF_SECONDS, error=error_text)
+
+
+def open_retry_keys(sheet_id: str = None) -> Set[Tuple[int, str]]:
+    """(row_number, column) of every queued or dead-lettered reminder for a sheet."""
+    keys = set()
+    for row in get_outbox().jobs(OPEN_STATUSES, kinds=[EMAIL_JOB]):
+        payload = json.loads(row['payload'])
+        if payload.get('column') and payload.get('sheet_id') == sheet_id:
+            keys.add((payload['row_number'], payload['column']))
+    return keys
+
+
+def process_email_retry(job):
+    """Outbox job: re-render and send one failed message, then record it in the ledger and sheet."""
+    payload = job.payload
+    ledger = None
+    if payload.get('column') and payload.get('webinar_id') is not None:
+        from send_ledger import get_ledger
+        ledger = get_ledger(payload.get('sheet_id'))
+        ledger_key = (payload['to_email'], payload['webinar_id'], payload['column'], payload['row_number'])
+    
+    if not payload.get('sent'):
+        message = get_template(payload['template']).render(payload['to_email'], **payload['values'])
+        try:
+            deliver(message)
+        except Exception as e:
+            if is_permanent(e):
+                raise PermanentJobError(f"{type(e).__name__}: {e}") from e
+            raise
+        if ledger is not None:
+            ledger.record(*ledger_key, 'sent')
+        job.checkpoint(sent=True)
+        print(f"Retried {payload['label']} to {payload['to_email']}: sent (attempt {job.attempts + 1})")
+
+    if payload.get('column'):
+        from google_sheets_client import SheetsClient
+        from registrant_mirror import get_mirror
+
+        sheets = SheetsClient.shared(payload.get('sheet_id'))
+        sheets.update_email_sent(payload['row_number'], payload['column'])
+        get_mirror(sheets.sheet_id).mark_email_sent(
+            payload['row_number'], payload['column'], datetime.now().isoformat()
+        )
+        if ledger is not None:
+            ledger.record(*ledger_key, 'synced')
+
+
+register_job(EMAIL_JOB, process_email_retry)
+
+
+def drain(max_seconds: float = RETRY_DRAIN_SECONDS) -> Dict[str, int]:
+    """
+    Deliver due retries in this process, waiting for backoffs that come due
+    within max_seconds. Returns retry job counts by status.
+    """
+    outbox = get_outbox()
+    dispatcher = OutboxDispatcher(outbox, kinds=[EMAIL_JOB])
+    deadline = time.monotonic() + max_seconds
+    with ThreadPoolExecutor(max_workers=dispatcher.concurrency, thread_name_prefix='email-retry') as executor:
+        while True:
+            if dispatcher.drain_once(executor):
+                continue
+            due = outbox.next_attempt_at([EMAIL_JOB])
+            if due is None:
+                break
+            wait = max(0.0, due - time.time())
+            if time.monotonic() + wait > deadline:
+                break
+            time.sleep(wait)
+    return outbox.stats([EMAIL_JOB])
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    outbox = get_outbox()
+
+    if command == 'stats':
+        print(outbox.stats([EMAIL_JOB]))
+    elif command == 'dead':
+        for row in outbox.dead_jobs([EMAIL_JOB]):
+            payload = json.loads(row['payload'])
+            print(f"{row['id']:>6}  {payload['label']:<22} {payload['to_email']:<32} "
+                  f"attempts={row['attempts']}  {row['last_error']}")
+    elif command == 'replay' and len(sys.argv) > 2:
+        ids = [row['id'] for row in outbox.dead_jobs([EMAIL_JOB])] if sys.argv[2] == '--all' else [int(sys.argv[2])]
+        replayed = sum(outbox.retry(job_id) for job_id in ids)
+        print(f"Requeued {replayed} message(s); run `python email_retry.py drain` or wait for a dispatcher")
+    elif command == 'drain':
+        seconds = float(sys.argv[2]) if len(sys.argv) > 2 else RETRY_DRAIN_SECONDS
+        print(drain(seconds))
+    else:
+        print(__doc__)
@@ -3,21 +3,407 @@ Email Sender
 =============
 SMTP email sending utility for call booking confirmations and notifications.
 
+Messages go out over a per-process pool of authenticated SMTP
+connections that are reused across sends (and threads), health-checked
+with NOOP after sitting idle, replaced when the server drops them, and
+closed after SMTP_POOL_IDLE_SECONDS without use.
+
+Every message first takes a token from the account's shared rate limiter
+(send_rate_limiter), so all processes together stay under the relay's
+per-minute and per-day limits; sends over the limit wait their turn.
+
 Usage:
-    from email_sender import send_email
+    from email_sender import send_email, send_bulk
     send_email(to_email, subject, body)
+
+    # Many messages over as few SMTP sessions as possible
+    results = send_bulk([(to_email, subject, body, html_body), ...])
+    failed = [r for r in results if not r.ok]
+
+    # Precompiled templates (email_templates) skip MIME building entirely
+    send_rendered(TEMPLATE.render(to_email, first_name='John'))
+    send_bulk([TEMPLATE.render(email, **values) for email, values in batch])
 """
 
+import asyncio
+import atexit
 import os
 import smtplib
+import ssl
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
 from dotenv import load_dotenv
 
+from email_templates import EmailTemplate, RenderedEmail
+from send_rate_limiter import RateLimitExceeded, get_rate_limiter
+
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent / '.env')
 
+# Connection pool sizing and lifetime
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', 8))
+SMTP_POOL_IDLE_SECONDS = float(os.environ.get('SMTP_POOL_IDLE_SECONDS', 60))
+# Servers cap messages per session (Gmail ~100); start a new session before that
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.environ.get('SMTP_MAX_MESSAGES_PER_CONNECTION', 90))
+# Connections idle for less than this are trusted without a NOOP round trip
+SMTP_NOOP_AFTER_SECONDS = 5
+SMTP_TIMEOUT_SECONDS = 30
+
+# Errors after which the connection is still usable (smtplib has already sent RSET)
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+# Errors raised before any SMTP command for the message (a CR/LF header value,
+# a non-ASCII address without SMTPUTF8); the session is untouched
+BUILD_ERRORS = (ValueError, UnicodeError, smtplib.SMTPNotSupportedError)
+# Errors meaning the session is gone; the message in flight was not acknowledged
+DISCONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionResetError, BrokenPipeError)
+
+class SMTPNotConfigured(RuntimeError):
+    """No SMTP credentials; nothing can be sent until they are set."""
+
+
+class _SessionSpoiled(Exception):
+    """A message failed in a way that leaves the session's state unknown; start a new one."""
+
+
+# Outcome of one message in send_bulk(); error is None when ok
+SendResult = namedtuple('SendResult', ['to_email', 'subject', 'ok', 'error'])
+
+def get_smtp_settings() -> dict:
+    """
+    Read SMTP connection settings from the environment.
+    
+    SMTP_SECURITY selects transport security:
+        starttls - plain connect, then STARTTLS (default, port 587)
+        tls      - implicit TLS from the first byte (port 465)
+        none     - no TLS; only for a local relay or test sink
+    SMTP_TLS_VERIFY=0 accepts self-signed certificates (local sink testing).
+    """
+    smtp_user = os.environ.get('SMTP_USER')
+    return {
+        'host': os.environ.get('SMTP_HOST', 'smtp.gmail.com'),
+        'port': int(os.environ.get('SMTP_PORT', 587)),
+        'user': smtp_user,
+        'password': os.environ.get('SMTP_PASSWORD'),
+        'from_email': os.environ.get('FROM_EMAIL', smtp_user),
+        'from_name': os.environ.get('FROM_NAME', 'PlanWell Financial Planning'),
+        'security': os.environ.get('SMTP_SECURITY', 'starttls').lower(),
+        'timeout': float(os.environ.get('SMTP_TIMEOUT', SMTP_TIMEOUT_SECONDS)),
+        'verify_certs': os.environ.get('SMTP_TLS_VERIFY', '1') != '0',
+    }
+
+
+def smtp_configured(settings: dict) -> bool:
+    """Credentials are required, except for an unauthenticated local relay (SMTP_SECURITY=none)."""
+    return bool(settings['user'] and settings['password']) or settings['security'] == 'none'
+
+
+def settings_key(settings: dict) -> tuple:
+    """Identity of an SMTP endpoint + account, for keying connection pools."""
+    return (settings['host'], settings['port'], settings['security'], settings['user'], settings['password'])
+
+
+def format_from(settings: dict) -> str:
+    return f"{settings['from_name']} <{settings['from_email']}>"
+
+
+def build_message(to_email: str, subject: str, body: str, html_body: str = None,
+                  settings: dict = None) -> MIMEMultipart:
+    """Build the MIME message for a plain text (and optional HTML) email."""
+    settings = settings or get_smtp_settings()
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = format_from(settings)
+    msg['To'] = to_email
+    
+    # Attach plain text version
+    msg.attach(MIMEText(body, 'plain'))
+    
+    # Attach HTML version if provided
+    if html_body:
+        msg.attach(MIMEText(html_body, 'html'))
+    
+    return msg
+
+
+def transmit(server: smtplib.SMTP, msg, settings: dict) -> dict:
+    """
+    Send a MIME message, or a RenderedEmail as its pre-encoded bytes (8bit
+    UTF-8, so it needs 8BITMIME; other servers get the MIME form instead).
+    Returns the refused-recipients dict like SMTP.send_message.
+    """
+    if isinstance(msg, RenderedEmail):
+        server.ehlo_or_helo_if_needed()
+        if msg.wire_ready and server.has_extn('8bitmime'):
+            return server.sendmail(settings['from_email'], [msg.to_email],
+                                   msg.as_bytes(format_from(settings)), mail_options=['BODY=8BITMIME'])
+        msg = msg.as_mime(settings)
+    return server.send_message(msg)
+
+
+class PooledConnection:
+    """One logged-in SMTP session plus its bookkeeping."""
+    
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages_sent = 0
+    
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            self.server.close()
+
+
+class SMTPPool:
+    """
+    Thread-safe pool of authenticated SMTP connections.
+    
+    At most max_size connections exist at once; callers beyond that wait
+    for one to be returned. Idle connections are kept LIFO so the warmest
+    one is reused and the rest age out.
+    """
+    
+    def __init__(self, settings: dict, max_size: int = SMTP_POOL_SIZE,
+                 idle_timeout: float = SMTP_POOL_IDLE_SECONDS):
+        self.settings = settings
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self._idle: List[PooledConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._closed = threading.Event()
+        self.stats = {'opened': 0, 'reused': 0, 'dropped': 0, 'sent': 0}
+        threading.Thread(target=self._reap_idle, name='smtp-pool-reaper', daemon=True).start()
+    
+    def _open(self) -> PooledConnection:
+        settings = self.settings
+        context = ssl.create_default_context()
+        if not settings['verify_certs']:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        if settings['security'] == 'tls':
+            server = smtplib.SMTP_SSL(settings['host'], settings['port'], timeout=settings['timeout'],
+                                      context=context)
+        else:
+            server = smtplib.SMTP(settings['host'], settings['port'], timeout=settings['timeout'])
+        try:
+            if settings['security'] == 'starttls':
+                server.starttls(context=context)
+            if settings['user'] and settings['password']:
+                server.login(settings['user'], settings['password'])
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self.stats['opened'] += 1
+        return PooledConnection(server)
+    
+    def _is_healthy(self, conn: PooledConnection) -> bool:
+        if conn.messages_sent >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+            return False
+        if time.monotonic() - conn.last_used < SMTP_NOOP_AFTER_SECONDS:
+            return True
+        try:
+            return conn.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+    
+    def _checkout(self) -> PooledConnection:
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._open()
+            if self._is_healthy(conn):
+                with self._lock:
+                    self.stats['reused'] += 1
+                return conn
+            self._discard(conn)
+    
+    def _discard(self, conn: PooledConnection):
+        with self._lock:
+            self.stats['dropped'] += 1
+        conn.close()
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a logged-in connection; it is returned to the pool afterwards."""
+        self._slots.acquire()
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+            except MESSAGE_ERRORS + BUILD_ERRORS + (RateLimitExceeded,):
+                self._checkin(conn)
+                raise
+            except BaseException:
+                # Unknown state (dropped, timed out, protocol error): never reuse
+                self._discard(conn)
+                raise
+            else:
+                self._checkin(conn)
+        finally:
+            self._slots.release()
+    
+    def _checkin(self, conn: PooledConnection):
+        conn.last_used = time.monotonic()
+        if self._closed.is_set():
+            conn.close()
+            return
+        with self._lock:
+            self._idle.append(conn)
+    
+    def send_message(self, msg, max_wait: float = None):
+        """
+        Send one message on a pooled connection. If a reused connection turns
+        out to have been dropped by the server before the send, retry once on
+        a fresh one. max_wait overrides the rate limiter's longest wait.
+        """
+        get_rate_limiter(self.settings).acquire(max_wait=max_wait)
+        for attempt in (1, 2):
+            reused = False
+            try:
+                with self.connection() as conn:
+                    reused = conn.messages_sent > 0 or conn.last_used != conn.created_at
+                    transmit(conn.server, msg, self.settings)
+                    conn.messages_sent += 1
+            except DISCONNECT_ERRORS:
+                if attempt == 2 or not reused:
+                    raise
+                continue
+            with self._lock:
+                self.stats['sent'] += 1
+            return
+    
+    def send_many(self, messages: Sequence, max_wait: float = None) -> List[Optional[Exception]]:
+        """
+        Send messages in order over as few sessions as possible. Returns one
+        entry per message: None if the server accepted it, else the error.
+        
+        - Refused recipient/sender, rejected data, or a message that cannot
+          be built (CR/LF in a header, non-ASCII address without SMTPUTF8):
+          recorded, and the same session carries on with the next message.
+        - Any other SMTP error reply: recorded for that message, and the
+          batch continues on a fresh session.
+        - Disconnect: the unacknowledged message is retried once on a fresh
+          session, then the batch continues from there. Messages before it
+          are already accepted and are never resent.
+        - Connect/login failure, or the rate limiter's wait exceeding its
+          maximum: the remaining messages fail with that error.
+        
+        A message's rate limiter token is reserved before it is sent; when
+        the limiter says to wait, the session goes back to the pool for the
+        wait instead of being held idle. max_wait overrides the limiter's
+        longest wait (PACED_MAX_WAIT_SECONDS for batch senders).
+        """
+        limiter = get_rate_limiter(self.settings)
+        results: List[Optional[Exception]] = [None] * len(messages)
+        index, retried, reserved, wait = 0, -1, -1, 0.0
+        while index < len(messages):
+            try:
+                if index > reserved:
+                    wait = limiter.reserve(max_wait=max_wait)   # a retried message keeps its token
+                    reserved = index
+                if wait > 0:
+                    time.sleep(wait)
+                    wait = 0.0
+                with self.connection() as conn:
+                    # Stay on this session until the batch or its message cap runs out
+                    while index < len(messages) and conn.messages_sent < SMTP_MAX_MESSAGES_PER_CONNECTION:
+                        if index > reserved:
+                            wait = limiter.reserve(max_wait=max_wait)
+                            reserved = index
+                            if wait > 0:
+                                break   # wait for this token without holding the session
+                        try:
+                            refused = transmit(conn.server, messages[index], self.settings)
+                            conn.messages_sent += 1
+                            if refused:
+                                results[index] = smtplib.SMTPRecipientsRefused(refused)
+                        except MESSAGE_ERRORS + BUILD_ERRORS as e:
+                            results[index] = e
+                        except DISCONNECT_ERRORS:
+                            raise
+                        except smtplib.SMTPException as e:
+                            results[index] = e
+                            index += 1
+                            raise _SessionSpoiled() from e
+                        index += 1
+            except _SessionSpoiled:
+                continue
+            except DISCONNECT_ERRORS as e:
+                if retried == index:
+                    results[index] = e
+                    index += 1
+                else:
+                    retried = index
+            except Exception as e:
+                for remaining in range(index, len(messages)):
+                    results[remaining] = e
+                break
+        
+        with self._lock:
+            self.stats['sent'] += sum(1 for r in results if r is None)
+        return results
+    
+    def _reap_idle(self):
+        while not self._closed.wait(max(1.0, self.idle_timeout / 2)):
+            cutoff = time.monotonic() - self.idle_timeout
+            with self._lock:
+                expired = [c for c in self._idle if c.last_used < cutoff]
+                self._idle = [c for c in self._idle if c.last_used >= cutoff]
+            for conn in expired:
+                conn.close()
+    
+    def close(self):
+        """Close every idle connection; in-use ones close when returned."""
+        self._closed.set()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools: Dict[tuple, SMTPPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(settings: dict = None) -> SMTPPool:
+    """This process's pool for the given SMTP settings (rebuilt after a fork)."""
+    settings = settings or get_smtp_settings()
+    key = (os.getpid(),) + settings_key(settings)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = SMTPPool(settings)
+    return pool
+
+
+@atexit.register
+def close_smtp_pools():
+    """QUIT every pooled connection owned by this process."""
+    for (pid, *_), pool in list(_pools.items()):
+        if pid == os.getpid():
+            pool.close()
+
+
+def _log_unconfigured(to_email: str, subject: str, body: str):
+    print("Warning: SMTP credentials not configured. Email not sent.")
+    print(f"Would have sent to: {to_email}")
+    print(f"Subject: {subject}")
+    print(f"Body: {body[:200]}...")
+
+
 def send_email(to_email: str, subject: str, body: str, html_body: str = None) -> bool:
     """
     Send an email via SMTP.
@@ -31,39 +417,17 @@ def send_email(to_email: str, subject: str, body: str, html_body: str = None) ->
     Returns:
         True if email was sent successfully, False otherwise
     """
-    smtp_host = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
-    smtp_port = int(os.environ.get('SMTP_PORT', 587))
-    smtp_user = os.environ.get('SMTP_USER')
-    smtp_password = os.environ.get('SMTP_PASSWORD')
-    from_email = os.environ.get('FROM_EMAIL', smtp_user)
-    from_name = os.environ.get('FROM_NAME', 'PlanWell Financial Planning')
-    
-    if not smtp_user or not smtp_password:
-        print("Warning: SMTP credentials not configured. Email not sent.")
-        print(f"Would have sent to: {to_email}")
-        print(f"Subject: {subject}")
-        print(f"Body: {body[:200]}...")
+    settings = get_smtp_settings()
+    
+    if not smtp_configured(settings):
+        _log_unconfigured(to_email, subject, body)
         return False
     
     try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"{from_name} <{from_email}>"
-        msg['To'] = to_email
+        msg = build_message(to_email, subject, body, html_body, settings)
         
-        # Attach plain text version
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Attach HTML version if provided
-        if html_body:
-            msg.attach(MIMEText(html_body, 'html'))
-        
-        # Connect and send
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
+        # Send on a pooled, already logged-in connection
+        get_smtp_pool(settings).send_message(msg)
         
         print(f"Email sent successfully to {to_email}")
         return True
@@ -73,24 +437,188 @@ def send_email(to_email: str, subject: str, body: str, html_body: str = None) ->
         return False
 
 
-def send_confirmation_html(to_email: str, prospect_name: str, advisor: dict) -> bool:
+def deliver(rendered: RenderedEmail, max_wait: float = None):
     """
-    Send a nicely formatted HTML confirmation email.
+    Send a rendered message, raising on failure (SMTPNotConfigured, SMTP
+    errors, RateLimitExceeded) so the caller can decide whether to retry.
+    max_wait overrides the rate limiter's longest wait.
+    """
+    settings = get_smtp_settings()
+    if not smtp_configured(settings):
+        _log_unconfigured(rendered.to_email, *rendered.as_text()[:2])
+        raise SMTPNotConfigured('SMTP credentials not configured')
+    get_smtp_pool(settings).send_message(rendered, max_wait=max_wait)
+
+
+def send_rendered(rendered: RenderedEmail) -> bool:
+    """
+    Send a message rendered from a precompiled EmailTemplate.
+    Same return value as send_email.
+    """
+    try:
+        deliver(rendered)
+        print(f"Email sent successfully to {rendered.to_email}")
+        return True
+        
+    except SMTPNotConfigured:
+        return False
+    except Exception as e:
+        print(f"Failed to send email: {e}")
+        return False
+
+
+def _as_sendable(message, settings: dict):
+    """(to_email, subject, sendable) for a send_bulk item: a tuple or a RenderedEmail."""
+    if isinstance(message, RenderedEmail):
+        return message.to_email, message.subject, message
+    to_email, subject, body, *html = message
+    return to_email, subject, build_message(to_email, subject, body, html[0] if html else None, settings)
+
+
+def _unconfigured_results(messages: list) -> List[SendResult]:
+    results = []
+    for message in messages:
+        if isinstance(message, RenderedEmail):
+            to_email, (subject, body, _) = message.to_email, message.as_text()
+        else:
+            to_email, subject, body = message[:3]
+        _log_unconfigured(to_email, subject, body)
+        results.append(SendResult(to_email, subject, False, 'SMTP credentials not configured'))
+    return results
+
+
+def send_bulk(messages: Iterable[Sequence[str]]) -> List[SendResult]:
+    """
+    Send a batch of emails through as few SMTP sessions as possible.
     
     Args:
-        to_email: Prospect's email
-        prospect_name: Prospect's name
-        advisor: Dict with advisor info (name, title, bio, email)
+        messages: (to_email, subject, body) or (to_email, subject, body, html_body)
+            tuples - the same arguments as send_email - and/or RenderedEmails
+    
+    Returns:
+        One SendResult per message, in order. Rejected recipients and
+        mid-batch disconnects fail only the affected message; everything
+        reported ok was accepted by the server exactly once.
     """
-    subject = f"Your Call with {advisor['name']} at PlanWell"
+    messages = [m if isinstance(m, RenderedEmail) else tuple(m) for m in messages]
+    if not messages:
+        return []
+    settings = get_smtp_settings()
     
-    plain_body = f"""Hi {prospect_name},
+    if not smtp_configured(settings):
+        return _unconfigured_results(messages)
+    
+    results: List[Optional[SendResult]] = [None] * len(messages)
+    built, positions = [], []
+    for position, message in enumerate(messages):
+        try:
+            to_email, subject, sendable = _as_sendable(message, settings)
+            built.append((to_email, subject, sendable))
+            positions.append(position)
+        except Exception as e:
+            to_email, subject = (message.to_email, None) if isinstance(message, RenderedEmail) else message[:2]
+            results[position] = SendResult(to_email, subject, False, str(e))
+    
+    errors = get_smtp_pool(settings).send_many([sendable for _, _, sendable in built])
+    for position, (to_email, subject, _), error in zip(positions, built, errors):
+        results[position] = SendResult(to_email, subject, error is None, None if error is None else str(error))
+    
+    sent = sum(1 for r in results if r.ok)
+    print(f"Bulk send: {sent}/{len(results)} emails sent")
+    for result in results:
+        if not result.ok:
+            print(f"  Failed to send to {result.to_email}: {result.error}")
+    return results
 
-You're all set! {advisor['name']} will be reaching out within 1 business day to schedule your call.
 
-About {advisor['name']}:
-{advisor['name']}, {advisor['title']}
-{advisor['bio']}
+async def send_email_async(to_email: str, subject: str, body: str, html_body: str = None) -> bool:
+    """
+    Send an email via SMTP without blocking the event loop.
+    
+    Same arguments and return value as send_email. Connections come from a
+    pool owned by the running event loop (async_smtp_client), so many sends
+    can be in flight at once. Requires aiosmtplib.
+    """
+    from async_smtp_client import get_async_smtp_pool
+    
+    settings = get_smtp_settings()
+    
+    if not smtp_configured(settings):
+        _log_unconfigured(to_email, subject, body)
+        return False
+    
+    try:
+        msg = build_message(to_email, subject, body, html_body, settings)
+        await get_async_smtp_pool(settings).send_message(msg)
+        
+        print(f"Email sent successfully to {to_email}")
+        return True
+        
+    except Exception as e:
+        print(f"Failed to send email: {e}")
+        return False
+
+
+async def send_rendered_async(rendered: RenderedEmail) -> bool:
+    """Async send_rendered, over the event loop's connection pool."""
+    from async_smtp_client import get_async_smtp_pool
+    
+    settings = get_smtp_settings()
+    
+    if not smtp_configured(settings):
+        _log_unconfigured(rendered.to_email, *rendered.as_text()[:2])
+        return False
+    
+    try:
+        await get_async_smtp_pool(settings).send_message(rendered)
+        print(f"Email sent successfully to {rendered.to_email}")
+        return True
+        
+    except Exception as e:
+        print(f"Failed to send email: {e}")
+        return False
+
+
+async def send_bulk_async(messages: Iterable[Sequence[str]]) -> List[SendResult]:
+    """
+    Async send_bulk: send every message concurrently over the event loop's
+    connection pool (at most SMTP_POOL_SIZE sessions) and return one
+    SendResult per message, in order.
+    """
+    from async_smtp_client import get_async_smtp_pool
+    
+    messages = [m if isinstance(m, RenderedEmail) else tuple(m) for m in messages]
+    settings = get_smtp_settings()
+    
+    if not smtp_configured(settings):
+        return _unconfigured_results(messages)
+    
+    pool = get_async_smtp_pool(settings)
+    
+    async def send_one(message) -> SendResult:
+        to_email, subject = (message.to_email, None) if isinstance(message, RenderedEmail) else message[:2]
+        try:
+            to_email, subject, sendable = _as_sendable(message, settings)
+            await pool.send_message(sendable)
+            return SendResult(to_email, subject, True, None)
+        except Exception as e:
+            return SendResult(to_email, subject, False, str(e))
+    
+    results = await asyncio.gather(*(send_one(m) for m in messages))
+    print(f"Bulk send: {sum(1 for r in results if r.ok)}/{len(results)} emails sent")
+    return list(results)
+
+
+CALL_CONFIRMATION_HTML = EmailTemplate(
+    'call_confirmation_html',
+    subject="Your Call with {advisor_name} at PlanWell",
+    plain="""Hi {prospect_name},
+
+You're all set! {advisor_name} will be reaching out within 1 business day to schedule your call.
+
+About {advisor_name}:
+{advisor_name}, {advisor_title}
+{advisor_bio}
 
 In the meantime, you can prepare by:
 • Gathering your latest SF-50
@@ -100,9 +628,8 @@ In the meantime, you can prepare by:
 We look forward to speaking with you!
 
 — The PlanWell Team
-"""
-    
-    html_body = f"""
+""",
+    html="""
 <!DOCTYPE html>
 <html>
 <head>
@@ -126,12 +653,12 @@ We look forward to speaking with you!
         </div>
         <div class="content">
             <p>Hi {prospect_name},</p>
-            <p><strong>{advisor['name']}</strong> will be reaching out within 1 business day to schedule your call.</p>
+            <p><strong>{advisor_name}</strong> will be reaching out within 1 business day to schedule your call.</p>
             
             <div class="advisor-card">
-                <div class="advisor-name">{advisor['name']}</div>
-                <div class="advisor-title">{advisor['title']}</div>
-                <p>{advisor['bio']}</p>
+                <div class="advisor-name">{advisor_name}</div>
+                <div class="advisor-title">{advisor_title}</div>
+                <p>{advisor_bio}</p>
             </div>
             
             <div class="checklist">
@@ -152,9 +679,23 @@ We look forward to speaking with you!
     </div>
 </body>
 </html>
-"""
+""",
+)
+
+
+def send_confirmation_html(to_email: str, prospect_name: str, advisor: dict) -> bool:
+    """
+    Send a nicely formatted HTML confirmation email.
     
-    return send_email(to_email, subject, plain_body, html_body)
+    Args:
+        to_email: Prospect's email
+        prospect_name: Prospect's name
+        advisor: Dict with advisor info (name, title, bio, email)
+    """
+    return send_rendered(CALL_CONFIRMATION_HTML.render(
+        to_email, prospect_name=prospect_name,
+        advisor_name=advisor['name'], advisor_title=advisor['title'], advisor_bio=advisor['bio']
+    ))
 
 
 if __name__ == '__main__':
@@ -9,19 +9,42 @@ Usage:
     client = SheetsClient()
     rows = client.get_all_registrants()
     client.update_email_sent(row_index, 'Email_Confirmation_Sent')
+
+    # Large sheets: page through row ranges, one compact record at a time
+    for reg in client.iter_registrants():
+        print(reg.row_number, reg.email)
+
+Long-running servers should use the per-process shared client instead,
+which is built once and is safe to call from any request thread:
+    client = SheetsClient.shared()
 """
 
+import fcntl
+import hashlib
+import json
 import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+import httplib2
 from dotenv import load_dotenv
 
+from sheets_discovery import load_discovery_document
+
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent / '.env')
 
@@ -44,53 +67,411 @@ COLUMNS = {
     'Email_DayOf_Sent': 12,
 }
 
+# Registrant dict keys (as returned by get_all_registrants) -> sheet column
+REGISTRANT_FIELDS = {
+    'first_name': 'First Name',
+    'last_name': 'Last Name',
+    'email': 'Email',
+    'agency': 'Agency',
+    'webinar_id': 'Webinar_ID',
+    'webinar_date': 'Webinar_Date',
+    'email_confirmation_sent': 'Email_Confirmation_Sent',
+    'email_7day_sent': 'Email_7Day_Sent',
+    'email_3day_sent': 'Email_3Day_Sent',
+    'email_1day_sent': 'Email_1Day_Sent',
+    'email_dayof_sent': 'Email_DayOf_Sent',
+}
+
+# Compact registrant record for streaming reads: a tuple with named fields,
+# no per-record dict. Same names as the get_all_registrants() dict keys.
+Registrant = namedtuple('Registrant', ['row_number'] + list(REGISTRANT_FIELDS))
+REGISTRANT_INDEXES = [COLUMNS[column] for column in REGISTRANT_FIELDS.values()]
+
+_projection_types: Dict[Tuple[str, ...], type] = {tuple(REGISTRANT_FIELDS): Registrant}
+
+# Rows fetched per values.get when paging through the sheet
+READ_PAGE_ROWS = int(os.environ.get('SHEETS_READ_PAGE_ROWS', 2000))
+
+# Changes whenever COLUMNS changes, forcing every worker to re-check row 1
+HEADERS_VERSION = hashlib.sha1('|'.join(COLUMNS).encode()).hexdigest()[:12]
+
+# Header verification stamps shared by all processes on this host
+HEADER_STAMP_PATH = Path(__file__).parent / '.tmp' / 'sheet_headers.json'
+
+# Append coalescing: flush after this many rows or this many ms, whichever first
+APPEND_BATCH_ROWS = int(os.environ.get('SHEETS_APPEND_BATCH_ROWS', 50))
+APPEND_BATCH_MS = float(os.environ.get('SHEETS_APPEND_BATCH_MS', 20))
+
+# Buffered cell updates: flush in one values.batchUpdate per this many cells
+UPDATE_CHUNK_SIZE = int(os.environ.get('SHEETS_UPDATE_CHUNK', 200))
+# Buffered-but-unflushed updates are journaled here so a crash cannot lose them,
+# one locked file per client instance: <sheet_id>.<pid>.<random>.jsonl
+PENDING_UPDATES_DIR = Path(__file__).parent / '.tmp' / 'pending_updates'
+
+
 def get_column_letter(index: int) -> str:
     """Convert 0-indexed column to letter (A, B, C, ...)"""
     return chr(ord('A') + index)
 
 
+def get_token_paths():
+    """Return (token_path, credentials_path) for the OAuth client files."""
+    token_path = Path(__file__).parent.parent / 'n8n-workflows' / 'token.json'
+    creds_path = Path(__file__).parent.parent / 'n8n-workflows' / 'credentials.json'
+    
+    # Try parent directory as fallback
+    if not creds_path.exists():
+        creds_path = Path(__file__).parent.parent.parent / 'credentials.json'
+        token_path = Path(__file__).parent.parent.parent / 'token.json'
+    
+    return token_path, creds_path
+
+
+def load_credentials() -> Credentials:
+    """Get or refresh Google OAuth credentials from token.json."""
+    creds = None
+    token_path, creds_path = get_token_paths()
+    
+    if token_path.exists():
+        creds = Credentials.from_authorized_user_file(str(token_path), SCOPES)
+    
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            if not creds_path.exists():
+                raise FileNotFoundError(f"credentials.json not found at {creds_path}")
+            flow = InstalledAppFlow.from_client_secrets_file(str(creds_path), SCOPES)
+            creds = flow.run_local_server(port=0)
+        
+        with open(token_path, 'w') as token:
+            token.write(creds.to_json())
+    
+    return creds
+
+
+class SharedCredentials:
+    """
+    Process-wide OAuth credentials with proactive background refresh.
+    
+    A daemon thread refreshes the access token shortly before it expires,
+    so request threads never pay for a token refresh inline.
+    """
+    
+    REFRESH_MARGIN_SECONDS = 300
+    RETRY_SECONDS = 60
+    
+    def __init__(self):
+        self.creds = load_credentials()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._refresh_loop, name='sheets-token-refresh', daemon=True)
+        self.thread.start()
+    
+    def seconds_until_refresh(self) -> float:
+        if not self.creds.expiry:
+            return 3000
+        # google-auth stores expiry as naive UTC
+        remaining = (self.creds.expiry - datetime.utcnow()).total_seconds()
+        return remaining - self.REFRESH_MARGIN_SECONDS
+    
+    def refresh(self):
+        with self.lock:
+            self.creds.refresh(Request())
+            token_path, _ = get_token_paths()
+            with open(token_path, 'w') as token:
+                token.write(self.creds.to_json())
+    
+    def _refresh_loop(self):
+        while True:
+            wait = self.seconds_until_refresh()
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Sheets token refresh failed, retrying in {self.RETRY_SECONDS}s: {e}")
+                time.sleep(self.RETRY_SECONDS)
+
+
+_shared_credentials: Optional[SharedCredentials] = None
+_shared_credentials_pid: Optional[int] = None
+_shared_lock = threading.RLock()
+
+
+def get_shared_credentials() -> SharedCredentials:
+    """Load credentials once per process (re-loaded after a fork)."""
+    global _shared_credentials, _shared_credentials_pid
+    if _shared_credentials is None or _shared_credentials_pid != os.getpid():
+        with _shared_lock:
+            if _shared_credentials is None or _shared_credentials_pid != os.getpid():
+                _shared_credentials = SharedCredentials()
+                _shared_credentials_pid = os.getpid()
+    return _shared_credentials
+
+
+def row_to_registrant(row_number: int, row: List[str]) -> Dict[str, Any]:
+    """Convert a raw sheet row into the registrant dict shape."""
+    # Pad row to ensure we have all columns
+    row = row + [''] * (len(COLUMNS) - len(row))
+    registrant = {'row_number': row_number}
+    for field, column in REGISTRANT_FIELDS.items():
+        registrant[field] = row[COLUMNS[column]]
+    return registrant
+
+
+def row_to_record(row_number: int, row: List[str]) -> Registrant:
+    """Convert a raw sheet row into a compact Registrant record."""
+    width = len(row)
+    return Registrant(row_number, *[row[i] if i < width else '' for i in REGISTRANT_INDEXES])
+
+
+def projection_type(fields: Sequence[str]) -> type:
+    """Record type (row_number + fields) for a projection; Registrant for all fields."""
+    key = tuple(fields)
+    if key not in _projection_types:
+        unknown = set(key) - set(REGISTRANT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown registrant fields: {sorted(unknown)}")
+        _projection_types[key] = namedtuple('RegistrantProjection', ('row_number',) + key)
+    return _projection_types[key]
+
+
+def column_groups(fields: Sequence[str]) -> List[Tuple[int, int]]:
+    """
+    Contiguous (first, last) column index spans covering the fields,
+    e.g. first_name, email, webinar_id, webinar_date -> [(0, 0), (2, 2), (6, 7)].
+    """
+    indexes = sorted({COLUMNS[REGISTRANT_FIELDS[field]] for field in fields})
+    groups = []
+    for index in indexes:
+        if groups and index == groups[-1][1] + 1:
+            groups[-1] = (groups[-1][0], index)
+        else:
+            groups.append((index, index))
+    return groups
+
+
+def build_registrant_row(data: Dict[str, Any]) -> List[str]:
+    """Build a sheet row (ordered by COLUMNS) for a new registrant."""
+    row = [''] * len(COLUMNS)
+    row[COLUMNS['First Name']] = data.get('name', '').split()[0] if data.get('name') else ''
+    row[COLUMNS['Last Name']] = ' '.join(data.get('name', '').split()[1:]) if data.get('name') else ''
+    row[COLUMNS['Email']] = data.get('email', '')
+    row[COLUMNS['Agency']] = data.get('agency', '')
+
+    row[COLUMNS['Submitted At']] = data.get('submitted_at') or datetime.now().isoformat()
+    row[COLUMNS['Source']] = data.get('source', 'webinar_registration')
+    row[COLUMNS['Webinar_ID']] = data.get('webinar_id', '')
+    row[COLUMNS['Webinar_Date']] = data.get('webinar_date', '')
+    return row
+
+
+def parse_updated_row(result: Dict[str, Any]) -> int:
+    """Row number of the first row written by a values().append call, or -1."""
+    updated_range = result.get('updates', {}).get('updatedRange', '')
+    # Format: Sheet1!A2:N2
+    if updated_range:
+        return int(updated_range.split('!')[1].split(':')[0].lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    return -1
+
+
+class AppendBatcher:
+    """
+    Coalesces concurrent single-row appends into one values().append call.
+    
+    Callers block in append() until their batch is written and get back
+    their own row number, mapped from the batch's updatedRange. Rows are
+    flushed after APPEND_BATCH_MS or once APPEND_BATCH_ROWS are waiting,
+    which keeps bursts well under the per-minute write quota.
+    """
+    
+    def __init__(self, client: 'SheetsClient', cell_range: str,
+                 max_rows: int = None, max_delay_ms: float = None, on_result=None):
+        self.client = client
+        self.cell_range = cell_range
+        self.max_rows = max_rows or APPEND_BATCH_ROWS
+        self.max_delay = (APPEND_BATCH_MS if max_delay_ms is None else max_delay_ms) / 1000
+        self.on_result = on_result
+        self.pending = []  # [(row, Future)]
+        self.cond = threading.Condition()
+        self.thread = None
+    
+    def append(self, row: List[str]) -> int:
+        """Queue a row and wait for its sheet row number (-1 if unknown)."""
+        future = Future()
+        with self.cond:
+            self.pending.append((row, future))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='sheets-append-batcher', daemon=True)
+                self.thread.start()
+            self.cond.notify()
+        return future.result()
+    
+    def _next_batch(self):
+        with self.cond:
+            while not self.pending:
+                self.cond.wait()
+            deadline = time.monotonic() + self.max_delay
+            while len(self.pending) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            batch = self.pending[:self.max_rows]
+            del self.pending[:self.max_rows]
+            return batch
+    
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                result = self.client.sheet.values().append(
+                    spreadsheetId=self.client.sheet_id,
+                    range=self.cell_range,
+                    valueInputOption='RAW',
+                    insertDataOption='INSERT_ROWS',
+                    body={'values': [row for row, _ in batch]}
+                ).execute()
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            # The rows are written: callers get their row numbers whatever happens
+            # below, so none of them retries (and duplicates) a successful append
+            try:
+                first_row = parse_updated_row(result)
+            except Exception as e:
+                print(f"Could not read appended row numbers: {e}")
+                first_row = -1
+            for offset, (_, future) in enumerate(batch):
+                future.set_result(first_row + offset if first_row > 0 else -1)
+            if self.on_result:
+                try:
+                    self.on_result(result)
+                except Exception as e:
+                    print(f"Append result callback failed: {e}")
+
+
 class SheetsClient:
     """Google Sheets client for webinar registrations."""
     
+    # (class, sheet_id, pid) -> client, see shared()
+    _shared_clients = {}
+    # sheet_id -> HEADERS_VERSION verified by this process
+    _verified_headers = {}
+    
     def __init__(self, sheet_id: str = None):
         self.sheet_id = sheet_id or os.environ.get('GOOGLE_SHEET_ID')
         if not self.sheet_id:
             raise ValueError("GOOGLE_SHEET_ID not set in environment")
         
         self.creds = self._get_credentials()
-        self.service = build('sheets', 'v4', credentials=self.creds)
+        self._thread_http = threading.local()
+        self._batchers = {}
+        self._updates_lock = threading.RLock()
+        self._pending_updates: List[Dict[str, Any]] = []
+        self._journal_path = PENDING_UPDATES_DIR / f'{self.sheet_id}.{os.getpid()}.{uuid.uuid4().hex[:8]}.jsonl'
+        self._journal = None   # opened and locked on the first buffered update
+        
+        # Pruned, disk-cached discovery document: no network, little parsing
+        discovery_doc = load_discovery_document()
+        if discovery_doc is not None:
+            self.service = build_from_document(discovery_doc, credentials=self.creds,
+                                               requestBuilder=self._build_request)
+        else:
+            self.service = build('sheets', 'v4', credentials=self.creds,
+                                 requestBuilder=self._build_request)
         self.sheet = self.service.spreadsheets()
     
+    @classmethod
+    def shared(cls, sheet_id: str = None) -> 'SheetsClient':
+        """
+        Return this process's shared client, building it on first use.
+        
+        The discovery-built service and credentials are reused by every
+        request; each thread gets its own HTTP connection.
+        """
+        key = (cls, sheet_id, os.getpid())
+        client = cls._shared_clients.get(key)
+        if client is None:
+            with _shared_lock:
+                client = cls._shared_clients.get(key)
+                if client is None:
+                    client = cls(sheet_id=sheet_id) if sheet_id else cls()
+                    cls._shared_clients[key] = client
+        return client
+    
     def _get_credentials(self) -> Credentials:
         """Get or refresh Google OAuth credentials."""
-        creds = None
-        token_path = Path(__file__).parent.parent / 'n8n-workflows' / 'token.json'
-        creds_path = Path(__file__).parent.parent / 'n8n-workflows' / 'credentials.json'
-        
-        # Try parent directory as fallback
-        if not creds_path.exists():
-            creds_path = Path(__file__).parent.parent.parent / 'credentials.json'
-            token_path = Path(__file__).parent.parent.parent / 'token.json'
-        
-        if token_path.exists():
-            creds = Credentials.from_authorized_user_file(str(token_path), SCOPES)
-        
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                if not creds_path.exists():
-                    raise FileNotFoundError(f"credentials.json not found at {creds_path}")
-                flow = InstalledAppFlow.from_client_secrets_file(str(creds_path), SCOPES)
-                creds = flow.run_local_server(port=0)
-            
-            with open(token_path, 'w') as token:
-                token.write(creds.to_json())
-        
-        return creds
+        return get_shared_credentials().creds
+    
+    def _build_request(self, http, *args, **kwargs) -> HttpRequest:
+        """httplib2 is not thread-safe: give each thread its own authorized connection."""
+        thread_http = getattr(self._thread_http, 'http', None)
+        if thread_http is None:
+            thread_http = AuthorizedHttp(self.creds, http=httplib2.Http(timeout=30))
+            self._thread_http.http = thread_http
+        return HttpRequest(thread_http, *args, **kwargs)
+    
+    def append_batcher(self, cell_range: str, on_result=None) -> AppendBatcher:
+        """The shared AppendBatcher for appends to this range."""
+        batcher = self._batchers.get(cell_range)
+        if batcher is None:
+            with _shared_lock:
+                batcher = self._batchers.get(cell_range)
+                if batcher is None:
+                    batcher = AppendBatcher(self, cell_range, on_result=on_result)
+                    self._batchers[cell_range] = batcher
+        return batcher
+    
+    def _read_header_stamps(self) -> Dict[str, str]:
+        try:
+            with open(HEADER_STAMP_PATH) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _write_header_stamp(self, version: Optional[str]):
+        stamps = self._read_header_stamps()
+        if version is None:
+            stamps.pop(self.sheet_id, None)
+        else:
+            stamps[self.sheet_id] = version
+        try:
+            HEADER_STAMP_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = HEADER_STAMP_PATH.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(stamps, f)
+            os.replace(tmp_path, HEADER_STAMP_PATH)
+        except OSError as e:
+            print(f"Could not write header stamp: {e}")
+    
+    def headers_verified(self) -> bool:
+        """True if row 1 was already checked against the current COLUMNS."""
+        if self._verified_headers.get(self.sheet_id) == HEADERS_VERSION:
+            return True
+        if self._read_header_stamps().get(self.sheet_id) == HEADERS_VERSION:
+            self._verified_headers[self.sheet_id] = HEADERS_VERSION
+            return True
+        return False
+    
+    def invalidate_headers(self):
+        """Forget the header check, e.g. after a write that suggests schema drift."""
+        self._verified_headers.pop(self.sheet_id, None)
+        self._write_header_stamp(None)
     
-    def ensure_headers(self):
-        """Ensure the sheet has all required headers."""
+    def ensure_headers(self, force: bool = False):
+        """
+        Ensure the sheet has all required headers.
+        
+        Runs once per COLUMNS version per sheet (stamped in .tmp/ and shared
+        by all workers) unless forced or invalidated after a write error.
+        """
+        if not force and self.headers_verified():
+            return
+        
         headers = list(COLUMNS.keys())
         
         # Get current headers
@@ -110,73 +491,142 @@ class SheetsClient:
                 body={'values': [headers]}
             ).execute()
             print(f"Updated headers to include all {len(headers)} columns")
+        
+        self._verified_headers[self.sheet_id] = HEADERS_VERSION
+        self._write_header_stamp(HEADERS_VERSION)
+    
+    def _check_append_columns(self, result: Dict[str, Any]):
+        """An append that did not land in A:M means the sheet layout drifted."""
+        updated_range = result.get('updates', {}).get('updatedRange', '')
+        last_column = get_column_letter(len(COLUMNS) - 1)
+        if updated_range:
+            start, _, end = updated_range.split('!')[1].partition(':')
+            if not start.startswith('A') or not end.startswith(last_column):
+                print(f"Append landed at {updated_range}, expected columns A:{last_column}; re-checking headers")
+                self.invalidate_headers()
     
     def add_registrant(self, data: Dict[str, Any]) -> int:
         """
         Add a new registrant to the sheet.
         Returns the row number of the new entry.
         """
-        # Prepare row data
-        row = [''] * len(COLUMNS)
-        row[COLUMNS['First Name']] = data.get('name', '').split()[0] if data.get('name') else ''
-        row[COLUMNS['Last Name']] = ' '.join(data.get('name', '').split()[1:]) if data.get('name') else ''
-        row[COLUMNS['Email']] = data.get('email', '')
-        row[COLUMNS['Agency']] = data.get('agency', '')
-
-        row[COLUMNS['Submitted At']] = datetime.now().isoformat()
-        row[COLUMNS['Source']] = data.get('source', 'webinar_registration')
-        row[COLUMNS['Webinar_ID']] = data.get('webinar_id', '')
-        row[COLUMNS['Webinar_Date']] = data.get('webinar_date', '')
+        row = build_registrant_row(data)
+        
+        # Append row, coalesced with any concurrent registrations
+        try:
+            return self.append_batcher('Sheet1!A:M', self._check_append_columns).append(row)
+        except HttpError as e:
+            if e.resp.status == 400:
+                self.invalidate_headers()
+            raise
+    
+    def update_cells(self, row_number: int, values: Dict[str, str]):
+        """Overwrite named columns of one row in a single values.batchUpdate."""
+        unknown = set(values) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
         
-        # Append row
-        result = self.sheet.values().append(
+        self.sheet.values().batchUpdate(
             spreadsheetId=self.sheet_id,
-            range='Sheet1!A:M',
-            valueInputOption='RAW',
-            insertDataOption='INSERT_ROWS',
-            body={'values': [row]}
+            body={
+                'valueInputOption': 'RAW',
+                'data': [
+                    {'range': f'Sheet1!{get_column_letter(COLUMNS[column])}{row_number}', 'values': [[value]]}
+                    for column, value in values.items()
+                ],
+            }
         ).execute()
-        
-        # Parse the updated range to get row number
-        updated_range = result.get('updates', {}).get('updatedRange', '')
-        # Format: Sheet1!A2:N2
-        if updated_range:
-            row_num = int(updated_range.split('!')[1].split(':')[0][1:])
-            return row_num
-        return -1
     
     def get_all_registrants(self) -> List[Dict[str, Any]]:
-        """Get all registrants with their data."""
-        result = self.sheet.values().get(
+        """
+        Get all registrants with their data.
+        Downloads only the registrant columns (not Submitted At / Source).
+        """
+        return [registrant._asdict() for registrant in self.get_projection(list(REGISTRANT_FIELDS))]
+    
+    def iter_row_pages(self, first_row: int = 2, last_row: int = None, first_column: str = 'A',
+                       last_column: str = None, page_size: int = READ_PAGE_ROWS):
+        """
+        Page through rows first_row..last_row (or to the end of the data),
+        yielding (row_number_of_first_row, rows) per values.get call.
+        Only one page is held in memory at a time. Sheets omits trailing
+        empty rows, so a page can be shorter than the range it covers.
+        """
+        last_column = last_column or get_column_letter(len(COLUMNS) - 1)
+        start = first_row
+        while last_row is None or start <= last_row:
+            end = start + page_size - 1 if last_row is None else min(start + page_size - 1, last_row)
+            rows = self.get_values(f'Sheet1!{first_column}{start}:{last_column}{end}')
+            if rows:
+                yield start, rows
+            elif last_row is None:
+                return  # past the last row with data
+            start = end + 1
+    
+    def get_projection(self, fields: Sequence[str], first_row: int = 2,
+                       last_row: int = None) -> list:
+        """
+        Read only the columns behind `fields` (registrant field names) for
+        rows first_row..last_row (open-ended if None), in one values.batchGet
+        with one range per contiguous column span and majorDimension=COLUMNS.
+        
+        Returns records of projection_type(fields) in row order. Rows where
+        every projected cell is empty at the end of the range are omitted.
+        """
+        record_type = projection_type(fields)
+        groups = column_groups(fields)
+        end = last_row if last_row is not None else ''
+        result = self.sheet.values().batchGet(
             spreadsheetId=self.sheet_id,
-            range='Sheet1!A:M'
+            ranges=[f'Sheet1!{get_column_letter(a)}{first_row}:{get_column_letter(b)}{end}' for a, b in groups],
+            majorDimension='COLUMNS'
         ).execute()
         
-        rows = result.get('values', [])
-        if len(rows) <= 1:
-            return []  # Only header or empty
+        columns: Dict[int, List[str]] = {}
+        for (first_column, _), value_range in zip(groups, result.get('valueRanges', [])):
+            for offset, values in enumerate(value_range.get('values', [])):
+                columns[first_column + offset] = values
         
-        registrants = []
-        for i, row in enumerate(rows[1:], start=2):  # Skip header, 1-indexed
-            # Pad row to ensure we have all columns
-            row = row + [''] * (len(COLUMNS) - len(row))
-            
-            registrants.append({
-                'row_number': i,
-                'first_name': row[COLUMNS['First Name']],
-                'last_name': row[COLUMNS['Last Name']],
-                'email': row[COLUMNS['Email']],
-                'agency': row[COLUMNS['Agency']],
-                'webinar_id': row[COLUMNS['Webinar_ID']],
-                'webinar_date': row[COLUMNS['Webinar_Date']],
-                'email_confirmation_sent': row[COLUMNS['Email_Confirmation_Sent']],
-                'email_7day_sent': row[COLUMNS['Email_7Day_Sent']],
-                'email_3day_sent': row[COLUMNS['Email_3Day_Sent']],
-                'email_1day_sent': row[COLUMNS['Email_1Day_Sent']],
-                'email_dayof_sent': row[COLUMNS['Email_DayOf_Sent']],
-            })
-        
-        return registrants
+        height = max((len(values) for values in columns.values()), default=0)
+        empty: List[str] = []
+        field_columns = [columns.get(COLUMNS[REGISTRANT_FIELDS[field]], empty) for field in fields]
+        return [
+            record_type(first_row + i, *[values[i] if i < len(values) else '' for values in field_columns])
+            for i in range(height)
+        ]
+    
+    def iter_projected_pages(self, fields: Sequence[str], first_row: int = 2,
+                             last_row: int = None, page_size: int = READ_PAGE_ROWS):
+        """Page through a projection, yielding one list of records per batchGet."""
+        start = first_row
+        while last_row is None or start <= last_row:
+            end = start + page_size - 1 if last_row is None else min(start + page_size - 1, last_row)
+            records = self.get_projection(fields, start, end)
+            if records:
+                yield records
+            elif last_row is None:
+                return  # past the last row with data
+            start = end + 1
+    
+    def iter_registrants(self, fields: Sequence[str] = None, first_row: int = 2,
+                         page_size: int = READ_PAGE_ROWS):
+        """
+        Stream registrants as compact records, paging through the sheet.
+        Only the columns behind `fields` are downloaded (default: every
+        registrant field, as Registrant records). Memory use stays flat
+        regardless of sheet size.
+        """
+        for records in self.iter_projected_pages(fields or list(REGISTRANT_FIELDS), first_row,
+                                                 page_size=page_size):
+            yield from records
+    
+    def get_values(self, cell_range: str) -> List[List[str]]:
+        """Read a range and return its rows (trailing empty cells omitted)."""
+        result = self.sheet.values().get(
+            spreadsheetId=self.sheet_id,
+            range=cell_range
+        ).execute()
+        return result.get('values', [])
     
     def update_email_sent(self, row_number: int, column_name: str) -> bool:
         """Update a specific email sent timestamp."""
@@ -195,6 +645,131 @@ class SheetsClient:
         
         return True
 
+    
+    @staticmethod
+    def _lock_journal(path: Path):
+        """
+        Open a journal file and take its exclusive lock without waiting.
+        None if a live instance holds it or it was just unlinked.
+        """
+        f = open(path, 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                return f
+        except OSError:
+            pass
+        f.close()
+        return None
+    
+    def _open_update_journal(self):
+        """Create and lock this instance's journal; the lock is held for the instance's lifetime."""
+        if self._journal is None:
+            PENDING_UPDATES_DIR.mkdir(parents=True, exist_ok=True)
+            self._journal = self._lock_journal(self._journal_path)
+    
+    def _adopt_orphaned_updates(self) -> int:
+        """
+        Take over the updates of instances that died before flushing: their
+        journals are the ones nobody holds a lock on. Only flush_updates()
+        calls this, so orphaned updates move only into a journal that is
+        about to be written to the sheet, never into one of a client that
+        does not buffer (e.g. a web worker's shared client).
+        """
+        updates, adopted = [], []
+        for path in PENDING_UPDATES_DIR.glob(f'{self.sheet_id}.*jsonl'):
+            if path == self._journal_path:
+                continue
+            orphan = self._lock_journal(path)
+            if orphan is None:
+                continue
+            try:
+                with open(path) as f:
+                    updates.extend(json.loads(line) for line in f if line.strip())
+            except (OSError, ValueError) as e:
+                print(f"Could not read pending update journal {path.name}: {e}")
+                orphan.close()
+                continue
+            adopted.append((path, orphan))
+        
+        if updates:
+            self._open_update_journal()
+            self._pending_updates[:0] = updates
+            self._rewrite_update_journal()
+        for path, orphan in adopted:
+            path.unlink(missing_ok=True)
+            orphan.close()
+        return len(updates)
+    
+    def _rewrite_update_journal(self):
+        """Replace this instance's journal with the buffer, holding its lock throughout."""
+        if self._journal is None:
+            return
+        tmp_path = self._journal_path.with_suffix('.tmp')
+        tmp = open(tmp_path, 'w')
+        fcntl.flock(tmp, fcntl.LOCK_EX)
+        for update in self._pending_updates:
+            tmp.write(json.dumps(update) + '\n')
+        tmp.flush()
+        os.replace(tmp_path, self._journal_path)
+        self._journal.close()
+        self._journal = tmp
+    
+    def buffer_email_sent(self, row_number: int, column_name: str, timestamp: str = None) -> str:
+        """
+        Queue an email-sent timestamp for the next batched flush.
+        
+        The update is journaled to disk before returning, and the buffer is
+        flushed automatically every UPDATE_CHUNK_SIZE cells.
+        Returns the timestamp that will be written.
+        """
+        if column_name not in COLUMNS:
+            raise ValueError(f"Unknown column: {column_name}")
+        
+        update = {
+            'range': f'Sheet1!{get_column_letter(COLUMNS[column_name])}{row_number}',
+            'value': timestamp or datetime.now().isoformat(),
+        }
+        with self._updates_lock:
+            self._pending_updates.append(update)
+            self._open_update_journal()
+            self._journal.write(json.dumps(update) + '\n')
+            self._journal.flush()
+            
+            if len(self._pending_updates) >= UPDATE_CHUNK_SIZE:
+                self.flush_updates()
+        
+        return update['value']
+    
+    def flush_updates(self) -> int:
+        """
+        Write all buffered cell updates with one values.batchUpdate per
+        chunk, along with any left in the journals of dead instances.
+        """
+        flushed = 0
+        with self._updates_lock:
+            self._adopt_orphaned_updates()
+            while self._pending_updates:
+                chunk = self._pending_updates[:UPDATE_CHUNK_SIZE]
+                self.sheet.values().batchUpdate(
+                    spreadsheetId=self.sheet_id,
+                    body={
+                        'valueInputOption': 'RAW',
+                        'data': [{'range': u['range'], 'values': [[u['value']]]} for u in chunk],
+                    }
+                ).execute()
+                del self._pending_updates[:len(chunk)]
+                self._rewrite_update_journal()
+                flushed += len(chunk)
+        return flushed
+    
+    @contextmanager
+    def batched_updates(self):
+        """Flush buffered updates on exit, including when the body raises."""
+        try:
+            yield self
+        finally:
+            self.flush_updates()
 
 if __name__ == '__main__':
     # Test the client
@@ -0,0 +1,387 @@
+"""
+Form Submission Outbox
+======================
+Write-ahead outbox for webhook submissions, backed by a local SQLite file
+in WAL mode. Handlers validate, enqueue and return 202; a background
+dispatcher drains the outbox to Google Sheets and SMTP with retries, so a
+Sheets or SMTP outage delays work instead of losing it.
+
+Usage:
+    from outbox import register_job, enqueue
+
+    def process_thing(job):
+        ...                                  # raise to retry later
+        job.checkpoint(row_num=12)           # persist progress between retries
+
+    register_job('thing', process_thing)
+    enqueue('thing', {'email': 'john@example.com'})
+
+    raise PermanentJobError('...')           # dead-letter now, no retries
+
+CLI:
+    python outbox.py stats              # counts by status
+    python outbox.py dispatch           # run a dispatcher in the foreground
+    python outbox.py dead               # list dead-lettered jobs
+    python outbox.py retry <id>         # move a dead job back to pending
+"""
+
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlite_store import ProcessRegistry, ThreadConnections
+
+OUTBOX_PATH = Path(os.environ.get('OUTBOX_DB', Path(__file__).parent / '.tmp' / 'outbox.db'))
+
+MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+BASE_BACKOFF_SECONDS = 5
+MAX_BACKOFF_SECONDS = 900
+# A claimed job whose worker died (no claim heartbeat) is handed out again
+# after this long; the dispatcher renews the claim of running jobs every third of it
+CLAIM_TIMEOUT_SECONDS = int(os.environ.get('OUTBOX_CLAIM_TIMEOUT', 300))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    claim_token TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    completed_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+# kind -> callable(OutboxJob); filled in by the handler modules at import
+JOB_HANDLERS: Dict[str, Callable[['OutboxJob'], Any]] = {}
+
+
+def register_job(kind: str, handler: Callable[['OutboxJob'], Any]):
+    """Register the function that processes outbox jobs of this kind."""
+    JOB_HANDLERS[kind] = handler
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler when retrying cannot help; the job is dead-lettered at once."""
+
+
+class OutboxJob:
+    """One claimed outbox row handed to a job handler."""
+
+    def __init__(self, outbox: 'Outbox', row: sqlite3.Row, attempts: int, claim_token: str):
+        self.outbox = outbox
+        self.id = row['id']
+        self.kind = row['kind']
+        self.attempts = attempts
+        self.claim_token = claim_token
+        self.payload = json.loads(row['payload'])
+
+    def checkpoint(self, **fields):
+        """Merge fields into the payload and persist them, so a retry resumes here."""
+        self.payload.update(fields)
+        self.outbox.save_payload(self, self.payload)
+
+
+class Outbox:
+    """SQLite-backed job queue shared by every process on this host."""
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or OUTBOX_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = ThreadConnections(self.path, synchronous='FULL')
+        with self._db.connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(outbox)')}
+            if 'claim_token' not in columns:  # outbox created before claim tokens
+                conn.execute('ALTER TABLE outbox ADD COLUMN claim_token TEXT')
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], delay: float = 0,
+                status: str = 'pending', error: str = None) -> int:
+        """
+        Durably record a job, due after `delay` seconds. Returns its id once
+        the write is on disk. status='dead' files it straight into the
+        dead-letter list (with its error) for inspection and manual retry.
+        """
+        now = time.time()
+        cursor = self._db.connect().execute(
+            """INSERT INTO outbox (kind, payload, status, next_attempt_at, last_error, created_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (kind, json.dumps(payload), status, now + delay, error and error[:2000], now)
+        )
+        return cursor.lastrowid
+
+    def claim(self, limit: int = 10, kinds: List[str] = None) -> List[OutboxJob]:
+        """
+        Atomically claim up to `limit` due jobs (of the given kinds) for this
+        worker. A job whose claim expired (its worker died mid-job) counts
+        that as a failed attempt, and is dead-lettered once out of attempts,
+        so a job that kills its worker cannot loop forever.
+        """
+        now = time.time()
+        kind_filter, kind_params = self._kind_filter(kinds)
+        conn = self._db.connect()
+        jobs = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                f"""SELECT * FROM outbox
+                    WHERE ((status = 'pending' AND next_attempt_at <= ?)
+                       OR (status = 'processing' AND claimed_at <= ?)){kind_filter}
+                    ORDER BY next_attempt_at LIMIT ?""",
+                (now, now - CLAIM_TIMEOUT_SECONDS, *kind_params, limit)
+            ).fetchall()
+            for row in rows:
+                attempts = row['attempts']
+                if row['status'] == 'processing':
+                    attempts += 1
+                    if attempts >= MAX_ATTEMPTS:
+                        conn.execute(
+                            """UPDATE outbox SET status = 'dead', attempts = ?, claimed_at = NULL,
+                                                 claim_token = NULL, last_error = ? WHERE id = ?""",
+                            (attempts, f'Claim expired (worker died or hung mid-job); {attempts} attempts', row['id'])
+                        )
+                        continue
+                token = uuid.uuid4().hex
+                conn.execute(
+                    """UPDATE outbox SET status = 'processing', attempts = ?, claimed_at = ?,
+                                         claim_token = ? WHERE id = ?""",
+                    (attempts, now, token, row['id'])
+                )
+                jobs.append(OutboxJob(self, row, attempts, token))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return jobs
+
+    def renew_claims(self, jobs: List[OutboxJob]):
+        """Heartbeat: keep running jobs' claims from expiring while they work."""
+        now = time.time()
+        self._db.connect().executemany(
+            "UPDATE outbox SET claimed_at = ? WHERE id = ? AND status = 'processing' AND claim_token = ?",
+            [(now, job.id, job.claim_token) for job in jobs]
+        )
+
+    @staticmethod
+    def _kind_filter(kinds: Optional[List[str]]):
+        if kinds is None:
+            return '', ()
+        kinds = list(kinds)
+        return f" AND kind IN ({', '.join('?' * len(kinds)) or 'NULL'})", tuple(kinds)
+
+    def next_attempt_at(self, kinds: List[str] = None) -> Optional[float]:
+        """When the earliest pending job (of the given kinds) becomes due, or None."""
+        kind_filter, kind_params = self._kind_filter(kinds)
+        row = self._db.connect().execute(
+            f"SELECT MIN(next_attempt_at) AS due FROM outbox WHERE status = 'pending'{kind_filter}",
+            kind_params
+        ).fetchone()
+        return row['due']
+
+    # Writes for a claimed job only land while the caller still holds the
+    # claim; a worker whose claim expired and was handed out again is ignored
+
+    def save_payload(self, job: OutboxJob, payload: Dict[str, Any]) -> bool:
+        cursor = self._db.connect().execute(
+            "UPDATE outbox SET payload = ? WHERE id = ? AND status = 'processing' AND claim_token = ?",
+            (json.dumps(payload), job.id, job.claim_token)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job: OutboxJob) -> bool:
+        cursor = self._db.connect().execute(
+            """UPDATE outbox SET status = 'done', completed_at = ?, claimed_at = NULL, claim_token = NULL,
+                                 last_error = NULL WHERE id = ? AND status = 'processing' AND claim_token = ?""",
+            (time.time(), job.id, job.claim_token)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job: OutboxJob, error: str, permanent: bool = False) -> Optional[str]:
+        """Schedule a retry with exponential backoff, or dead-letter the job. None if the claim was lost."""
+        attempts = job.attempts + 1
+        if permanent or attempts >= MAX_ATTEMPTS:
+            status, next_attempt = 'dead', time.time()
+        else:
+            delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** (attempts - 1))
+            status, next_attempt = 'pending', time.time() + delay * random.uniform(0.8, 1.2)
+        cursor = self._db.connect().execute(
+            """UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, claimed_at = NULL,
+                                 claim_token = NULL, last_error = ?
+               WHERE id = ? AND status = 'processing' AND claim_token = ?""",
+            (status, attempts, next_attempt, error[:2000], job.id, job.claim_token)
+        )
+        return status if cursor.rowcount == 1 else None
+
+    def retry(self, job_id: int) -> bool:
+        """Move a dead job back to pending with a fresh attempt budget."""
+        cursor = self._db.connect().execute(
+            """UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ?
+               WHERE id = ? AND status = 'dead'""",
+            (time.time(), job_id)
+        )
+        return cursor.rowcount == 1
+
+    def stats(self, kinds: List[str] = None) -> Dict[str, int]:
+        kind_filter, kind_params = self._kind_filter(kinds)
+        rows = self._db.connect().execute(
+            f'SELECT status, COUNT(*) AS n FROM outbox WHERE 1{kind_filter} GROUP BY status', kind_params
+        )
+        return {row['status']: row['n'] for row in rows}
+
+    def jobs(self, statuses: List[str], kinds: List[str] = None) -> List[sqlite3.Row]:
+        kind_filter, kind_params = self._kind_filter(kinds)
+        return self._db.connect().execute(
+            f"SELECT * FROM outbox WHERE status IN ({', '.join('?' * len(statuses))}){kind_filter} ORDER BY id",
+            (*statuses, *kind_params)
+        ).fetchall()
+
+    def dead_jobs(self, kinds: List[str] = None) -> List[sqlite3.Row]:
+        return self.jobs(['dead'], kinds)
+
+    def purge_done(self, older_than_seconds: int = 7 * 86400):
+        self._db.connect().execute(
+            "DELETE FROM outbox WHERE status = 'done' AND completed_at < ?",
+            (time.time() - older_than_seconds,)
+        )
+
+
+class OutboxDispatcher(threading.Thread):
+    """Background thread that drains due jobs through a small worker pool."""
+
+    def __init__(self, outbox: Outbox, concurrency: int = None, poll_interval: float = 2.0,
+                 kinds: List[str] = None):
+        super().__init__(name='outbox-dispatcher', daemon=True)
+        self.outbox = outbox
+        # Only claim jobs this process has handlers for (default: every registered kind)
+        self.kinds = kinds
+        self.concurrency = concurrency or int(os.environ.get('OUTBOX_CONCURRENCY', 4))
+        self.poll_interval = poll_interval
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.running: Dict[int, OutboxJob] = {}   # id -> job, for the claim heartbeat
+        self.running_lock = threading.Lock()
+
+    def run_job(self, job: OutboxJob):
+        handler = JOB_HANDLERS.get(job.kind)
+        with self.running_lock:
+            self.running[job.id] = job
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for outbox job kind '{job.kind}'")
+            handler(job)
+            if not self.outbox.complete(job):
+                print(f"Outbox job {job.id} ({job.kind}) finished after its claim was lost")
+        except Exception as e:
+            status = self.outbox.fail(job, f"{type(e).__name__}: {e}", permanent=isinstance(e, PermanentJobError))
+            print(f"Outbox job {job.id} ({job.kind}) failed, attempt {job.attempts + 1}: {e} -> "
+                  f"{status or 'claim lost, not rescheduled'}")
+        finally:
+            with self.running_lock:
+                del self.running[job.id]
+
+    def heartbeat(self):
+        """Renew the claims of running jobs so a slow job is not handed to another worker."""
+        while not self.stopping.wait(CLAIM_TIMEOUT_SECONDS / 3):
+            with self.running_lock:
+                jobs = list(self.running.values())
+            if jobs:
+                try:
+                    self.outbox.renew_claims(jobs)
+                except Exception as e:
+                    print(f"Outbox claim heartbeat failed: {e}")
+
+    def drain_once(self, executor: ThreadPoolExecutor) -> int:
+        jobs = self.outbox.claim(limit=self.concurrency * 2, kinds=self.kinds or list(JOB_HANDLERS))
+        for _ in executor.map(self.run_job, jobs):
+            pass
+        return len(jobs)
+
+    def run(self):
+        threading.Thread(target=self.heartbeat, name='outbox-heartbeat', daemon=True).start()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='outbox') as executor:
+            while not self.stopping.is_set():
+                try:
+                    if self.drain_once(executor):
+                        continue
+                except Exception as e:
+                    print(f"Outbox dispatcher error: {e}")
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+
+_outboxes = ProcessRegistry()
+_dispatcher: Optional[OutboxDispatcher] = None
+_dispatcher_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    """This process's outbox (OUTBOX_PATH)."""
+    return _outboxes.get(None, Outbox)
+
+
+def ensure_dispatcher() -> OutboxDispatcher:
+    """Start this process's dispatcher once (re-started after a fork)."""
+    global _dispatcher, _dispatcher_pid
+    if _dispatcher is None or _dispatcher_pid != os.getpid():
+        outbox = get_outbox()
+        with _lock:
+            if _dispatcher is None or _dispatcher_pid != os.getpid():
+                _dispatcher = OutboxDispatcher(outbox)
+                _dispatcher_pid = os.getpid()
+                _dispatcher.start()
+    return _dispatcher
+
+
+def enqueue(kind: str, payload: Dict[str, Any]) -> int:
+    """Record a job and nudge this process's dispatcher to pick it up now."""
+    job_id = get_outbox().enqueue(kind, payload)
+    ensure_dispatcher().wakeup.set()
+    return job_id
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    outbox = get_outbox()
+
+    if command == 'stats':
+        print(json.dumps(outbox.stats(), indent=2))
+    elif command == 'dead':
+        for row in outbox.dead_jobs():
+            print(f"{row['id']:>6}  {row['kind']:<22} attempts={row['attempts']}  {row['last_error']}")
+    elif command == 'retry' and len(sys.argv) > 2:
+        print('Requeued' if outbox.retry(int(sys.argv[2])) else 'Not a dead job')
+    elif command == 'dispatch':
+        # Importing the handlers registers their job kinds
+        import webinar_nurture_handler  # noqa: F401
+        import contact_form_handler  # noqa: F401
+        import call_booking_handler  # noqa: F401
+        import email_retry  # noqa: F401
+
+        print(f"Draining outbox at {outbox.path} (Ctrl+C to stop)")
+        dispatcher = OutboxDispatcher(outbox)
+        dispatcher.start()
+        try:
+            while dispatcher.is_alive():
+                dispatcher.join(1)
+        except KeyboardInterrupt:
+            dispatcher.stop()
+    else:
+        print(__doc__)
@@ -0,0 +1,474 @@
+"""
+Registrant Mirror
+=================
+Local SQLite replica of the webinar registrant sheet (Sheet1!A:M).
+
+The sheet is append-only in practice, so sync is incremental: it fetches
+only rows past the last synced row, plus the email-sent flag columns
+(I:M) of rows it already has, and writes back only flags that changed.
+All reads are column projections (values.batchGet), so the Submitted At
+and Source columns are never downloaded.
+A full resync runs when forced or once a day, which picks up manual edits
+and deleted rows.
+
+Reads are local queries: iter_registrants() streams compact Registrant
+records page by page, get_all_registrants() returns the same dict shape as
+SheetsClient.get_all_registrants().
+
+An in-memory hash index keyed by (email, webinar_id) answers "is this
+person already registered for this webinar?" in O(1). It is built from the
+mirror on first use and caught up from rows added since (by any process on
+this host) before each lookup. When a key has several rows, the first row
+is canonical; later rows are duplicates that the scheduler skips.
+
+Each row also stores webinar_day (the webinar's calendar date, from the
+ISO webinar_date) under an SQLite index, maintained as rows are synced,
+recorded or edited. iter_by_webinar_day() reads only registrants whose
+webinar falls in a date range, so the scheduler's cost follows upcoming
+registrations rather than the whole registration history.
+
+Usage:
+    from registrant_mirror import get_mirror
+    mirror = get_mirror(sheets.sheet_id)
+    mirror.sync(sheets)
+    for reg in mirror.iter_registrants():     # compact records, flat memory
+        ...
+
+    python registrant_mirror.py sync [--full]
+    python registrant_mirror.py stats
+    python registrant_mirror.py duplicates
+    python registrant_mirror.py upcoming [days]   # registrants per webinar day ahead
+"""
+
+import fcntl
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from google_sheets_client import (
+    REGISTRANT_FIELDS,
+    SheetsClient,
+    READ_PAGE_ROWS,
+    Registrant,
+    projection_type,
+    row_to_record,
+)
+from sqlite_store import ProcessRegistry, ThreadConnections
+
+MIRROR_DIR = Path(os.environ.get('REGISTRANT_MIRROR_DIR', Path(__file__).parent / '.tmp'))
+FULL_SYNC_INTERVAL_SECONDS = 24 * 3600
+# Duplicate checks sync first if the mirror is older than this
+DEDUP_SYNC_MAX_AGE_SECONDS = int(os.environ.get('REGISTRANT_DEDUP_SYNC_SECONDS', 300))
+
+FIELDS = list(REGISTRANT_FIELDS)
+FLAG_FIELDS = [field for field in FIELDS if field.startswith('email_') and field.endswith('_sent')]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS registrants (
+    row_number INTEGER PRIMARY KEY,
+    {', '.join(f'{field} TEXT NOT NULL DEFAULT ""' for field in FIELDS)},
+    webinar_day TEXT NOT NULL DEFAULT ""
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def webinar_day(iso_date: str) -> str:
+    """YYYY-MM-DD calendar date of an ISO webinar date ('' if unparseable)."""
+    try:
+        return datetime.fromisoformat((iso_date or '').replace('Z', '+00:00')).date().isoformat()
+    except ValueError:
+        return ''
+
+
+def registration_key(email: str, webinar_id: str) -> Tuple[str, str]:
+    """Normalized (email, webinar_id) key used for duplicate detection."""
+    return ((email or '').strip().lower(), (webinar_id or '').strip())
+
+
+class RegistrantMirror:
+    """SQLite copy of one registrant sheet, kept current by incremental sync."""
+
+    def __init__(self, sheet_id: str = None, path: Path = None):
+        self.sheet_id = sheet_id or os.environ.get('GOOGLE_SHEET_ID')
+        if not self.sheet_id:
+            raise ValueError("GOOGLE_SHEET_ID not set in environment")
+        self.path = Path(path or MIRROR_DIR / f'registrants-{self.sheet_id}.db')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = ThreadConnections(self.path)
+        self._db.connect().executescript(SCHEMA)
+        self._ensure_day_index()
+        
+        # (email, webinar_id) -> canonical row_number
+        self._index: Dict[Tuple[str, str], int] = {}
+        self._index_through = 0          # highest row_number folded into the index
+        self._index_generation = None    # full-sync generation the index was built from
+        self._index_lock = threading.Lock()
+        self._key_locks = defaultdict(threading.Lock)
+        # Byte-range locks on this file extend key_lock() to the other processes on this host
+        self._key_lock_file = open(self.path.with_suffix('.locks'), 'a')
+
+    def _ensure_day_index(self):
+        """Add and backfill webinar_day on mirrors created before it existed, then index it."""
+        conn = self._db.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(registrants)')}
+            if 'webinar_day' not in columns:
+                conn.execute("ALTER TABLE registrants ADD COLUMN webinar_day TEXT NOT NULL DEFAULT ''")
+                conn.executemany(
+                    'UPDATE registrants SET webinar_day = ? WHERE row_number = ?',
+                    [(webinar_day(row['webinar_date']), row['row_number'])
+                     for row in conn.execute('SELECT row_number, webinar_date FROM registrants').fetchall()]
+                )
+            conn.execute('CREATE INDEX IF NOT EXISTS registrants_by_day ON registrants (webinar_day, row_number)')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _get_meta(self, key: str, default: str = None) -> Optional[str]:
+        row = self._db.connect().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else default
+
+    def _set_meta(self, conn: sqlite3.Connection, key: str, value):
+        conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    @property
+    def generation(self) -> str:
+        """Changes whenever row numbers may have shifted (full sync, rows filled in below the top)."""
+        return self._get_meta('generation', '0')
+
+    @property
+    def synced_through(self) -> int:
+        """Last sheet row number fetched from Sheets (1 = header only)."""
+        return int(self._get_meta('synced_through', 1))
+
+    def _upsert_records(self, conn: sqlite3.Connection, records: List[Registrant]) -> int:
+        records = [r for r in records if any(r[1:])]  # skip blank sheet rows
+        if not records:
+            return 0
+        
+        # Rows landing below the highest row we hold (gaps filled by sync after
+        # a locally recorded append) are invisible to the incremental index
+        # catch-up, so they force a rebuild
+        max_row = conn.execute('SELECT MAX(row_number) FROM registrants').fetchone()[0] or 0
+        if records[0].row_number < max_row:
+            present = {row[0] for row in conn.execute(
+                'SELECT row_number FROM registrants WHERE row_number BETWEEN ? AND ?',
+                (records[0].row_number, max_row)
+            )}
+            if any(r.row_number < max_row and r.row_number not in present for r in records):
+                self._set_meta(conn, 'generation', int(self._get_meta('generation', 0)) + 1)
+        
+        conn.executemany(
+            f"INSERT OR REPLACE INTO registrants (row_number, {', '.join(FIELDS)}, webinar_day) "
+            f"VALUES ({', '.join('?' * (len(FIELDS) + 2))})",
+            [(*record, webinar_day(record.webinar_date)) for record in records]
+        )
+        return len(records)
+
+    def sync(self, sheets: SheetsClient = None, full: bool = None) -> Dict[str, int]:
+        """
+        Pull new rows and changed flags from the sheet.
+        Returns counts of new rows and rows whose flags changed.
+        """
+        sheets = sheets or SheetsClient.shared(self.sheet_id)
+        last_full = float(self._get_meta('last_full_sync', 0))
+        if full is None:
+            full = time.time() - last_full > FULL_SYNC_INTERVAL_SECONDS
+
+        if full:
+            return self._full_sync(sheets)
+
+        synced_through = self.synced_through
+        stats = {'new_rows': 0, 'updated_rows': 0}
+
+        # 1. Flags of rows we already have (I:M only, not the whole row)
+        if synced_through >= 2:
+            for records in sheets.iter_projected_pages(FLAG_FIELDS, 2, synced_through):
+                stats['updated_rows'] += self._apply_flags(records)
+
+        # 2. Rows appended since the last sync, a page at a time, registrant
+        #    columns only (Submitted At and Source are never downloaded).
+        #    Every page is fetched before the write transaction starts, so
+        #    handlers and the scheduler are never blocked on Sheets latency.
+        pages = list(sheets.iter_projected_pages(FIELDS, synced_through + 1))
+        conn = self._db.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for records in pages:
+                stats['new_rows'] += self._upsert_records(conn, records)
+                synced_through = records[-1].row_number
+            self._set_meta(conn, 'synced_through', synced_through)
+            self._set_meta(conn, 'last_sync', time.time())
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return stats
+
+    def _apply_flags(self, records: list) -> int:
+        """Write flag cells that differ from the mirror; returns rows changed."""
+        conn = self._db.connect()
+        current = {
+            row['row_number']: [row[field] for field in FLAG_FIELDS]
+            for row in conn.execute(
+                f"SELECT row_number, {', '.join(FLAG_FIELDS)} FROM registrants "
+                f"WHERE row_number BETWEEN ? AND ?",
+                (records[0].row_number, records[-1].row_number)
+            )
+        }
+        changes = []
+        for record in records:
+            flags = list(record[1:])
+            existing = current.get(record.row_number)
+            if existing is not None and existing != flags:
+                changes.append(flags + [record.row_number])
+
+        if changes:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    f"UPDATE registrants SET {', '.join(f'{field} = ?' for field in FLAG_FIELDS)} "
+                    f"WHERE row_number = ?",
+                    changes
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return len(changes)
+
+    def _full_sync(self, sheets: SheetsClient) -> Dict[str, int]:
+        # Fetch the whole sheet first; the write transaction only replaces rows
+        conn = self._db.connect()
+        held_through = conn.execute('SELECT MAX(row_number) FROM registrants').fetchone()[0] or 0
+        pages = list(sheets.iter_projected_pages(FIELDS, 2))
+        synced_through = pages[-1][-1].row_number if pages else 1
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Rows past both the fetch and what was held before it were
+            # recorded by appends during the fetch; keep them
+            conn.execute('DELETE FROM registrants WHERE row_number <= ?', (max(synced_through, held_through),))
+            count = 0
+            for records in pages:
+                count += self._upsert_records(conn, records)
+            self._set_meta(conn, 'synced_through', synced_through)
+            self._set_meta(conn, 'last_full_sync', time.time())
+            # Row numbers may have shifted; in-memory indexes must rebuild
+            self._set_meta(conn, 'generation', int(self._get_meta('generation', 0)) + 1)
+            self._set_meta(conn, 'last_sync', time.time())
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return {'new_rows': count, 'updated_rows': 0, 'full': 1}
+
+    def sync_if_stale(self, sheets: SheetsClient = None,
+                      max_age: float = DEDUP_SYNC_MAX_AGE_SECONDS) -> Optional[Dict[str, int]]:
+        """Incremental sync, only if the last one is older than max_age seconds."""
+        if time.time() - float(self._get_meta('last_sync', 0)) <= max_age:
+            return None
+        return self.sync(sheets, full=False)
+
+    def _refresh_index(self):
+        """Fold rows added since the last lookup into the index (rebuild after a full sync)."""
+        generation = self.generation
+        if generation != self._index_generation:
+            self._index, self._index_through = {}, 0
+            self._index_generation = generation
+        
+        rows = self._db.connect().execute(
+            'SELECT row_number, email, webinar_id FROM registrants '
+            'WHERE row_number > ? ORDER BY row_number',
+            (self._index_through,)
+        ).fetchall()
+        for row in rows:
+            self._index.setdefault(registration_key(row['email'], row['webinar_id']), row['row_number'])
+            self._index_through = row['row_number']
+
+    def find_registration(self, email: str, webinar_id: str) -> Optional[Dict[str, Any]]:
+        """The canonical registrant row for this email and webinar, or None."""
+        with self._index_lock:
+            self._refresh_index()
+            row_number = self._index.get(registration_key(email, webinar_id))
+        return self.get_registrant(row_number) if row_number else None
+
+    def canonical_row(self, email: str, webinar_id: str) -> Optional[int]:
+        """Row number of the first registration for this key (0 lookups against Sheets)."""
+        with self._index_lock:
+            self._refresh_index()
+            return self._index.get(registration_key(email, webinar_id))
+
+    @contextmanager
+    def key_lock(self, email: str, webinar_id: str):
+        """
+        Per-registration lock: hold it across find_registration(), the
+        append and the confirmation so concurrent repeat submissions neither
+        append twice nor confirm twice, whichever worker process on this
+        host dispatches them. A thread lock serializes this process's
+        threads, then an fcntl lock on one byte of the mirror's .locks file
+        (chosen by a hash of the key) serializes processes. The OS drops it
+        if the holder dies.
+        """
+        key = registration_key(email, webinar_id)
+        with self._index_lock:
+            thread_lock = self._key_locks[key]
+        offset = zlib.crc32('\0'.join(key).encode('utf-8')) & 0x7FFFFFFF
+        with thread_lock:
+            fcntl.lockf(self._key_lock_file, fcntl.LOCK_EX, 1, offset)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._key_lock_file, fcntl.LOCK_UN, 1, offset)
+
+    def duplicate_rows(self) -> List[Registrant]:
+        """Registrant rows that repeat an earlier (email, webinar_id)."""
+        with self._index_lock:
+            self._refresh_index()
+            canonical = set(self._index.values())
+        return [r for r in self.iter_registrants() if r.email and r.row_number not in canonical]
+
+    def record_row(self, row_number: int, row: List[str]):
+        """Store a row this process just appended, ahead of the next sync."""
+        if row_number > 0:
+            self._upsert_records(self._db.connect(), [row_to_record(row_number, row)])
+
+    def update_fields(self, row_number: int, fields: Dict[str, str]):
+        """Mirror in-place edits to an existing row (keys are registrant fields)."""
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown registrant fields: {sorted(unknown)}")
+        if 'webinar_date' in fields:
+            fields = dict(fields, webinar_day=webinar_day(fields['webinar_date']))
+        self._db.connect().execute(
+            f"UPDATE registrants SET {', '.join(f'{field} = ?' for field in fields)} WHERE row_number = ?",
+            list(fields.values()) + [row_number]
+        )
+
+    def mark_email_sent(self, row_number: int, column_name: str, timestamp: str):
+        """Mirror a sent-timestamp written (or buffered) to the sheet."""
+        field = next(f for f, c in REGISTRANT_FIELDS.items() if c == column_name)
+        self._db.connect().execute(
+            f'UPDATE registrants SET {field} = ? WHERE row_number = ?', (timestamp, row_number)
+        )
+
+    def iter_registrants(self, fields: List[str] = None, page_size: int = READ_PAGE_ROWS, after: int = 0):
+        """
+        Stream registrants in row order as Registrant records, or as
+        projection_type(fields) records selecting only `fields`, starting
+        past row `after`.
+        Pages by row_number, so only one page is in memory and the caller
+        may write to the mirror (mark_email_sent) while iterating.
+        """
+        fields = list(fields or FIELDS)
+        record_type = projection_type(fields)
+        query = (f"SELECT row_number, {', '.join(fields)} FROM registrants "
+                 f"WHERE row_number > ? ORDER BY row_number LIMIT ?")
+        while True:
+            rows = self._db.connect().execute(query, (after, page_size)).fetchall()
+            for row in rows:
+                yield record_type._make(row)
+            if len(rows) < page_size:
+                return
+            after = rows[-1]['row_number']
+
+    def iter_by_webinar_day(self, first_day: date, last_day: date, fields: List[str] = None,
+                            page_size: int = READ_PAGE_ROWS):
+        """
+        Stream registrants whose webinar falls on first_day..last_day
+        (inclusive), as iter_registrants() does, through the webinar_day
+        index: rows for past or far-off webinars are never read. Ordered by
+        webinar day, then row.
+        """
+        fields = list(fields or FIELDS)
+        record_type = projection_type(fields)
+        after = (first_day.isoformat(), 0)
+        query = (f"SELECT row_number, {', '.join(fields)}, webinar_day FROM registrants "
+                 f"WHERE (webinar_day, row_number) > (?, ?) AND webinar_day <= ? "
+                 f"ORDER BY webinar_day, row_number LIMIT ?")
+        while True:
+            rows = self._db.connect().execute(query, (*after, last_day.isoformat(), page_size)).fetchall()
+            for row in rows:
+                yield record_type._make(tuple(row)[:-1])
+            if len(rows) < page_size:
+                return
+            after = (rows[-1]['webinar_day'], rows[-1]['row_number'])
+
+    def count_by_webinar_day(self, first_day: date, last_day: date) -> Dict[str, int]:
+        """Registrant rows per webinar day in first_day..last_day."""
+        rows = self._db.connect().execute(
+            'SELECT webinar_day, COUNT(*) AS n FROM registrants '
+            'WHERE webinar_day BETWEEN ? AND ? GROUP BY webinar_day ORDER BY webinar_day',
+            (first_day.isoformat(), last_day.isoformat())
+        )
+        return {row['webinar_day']: row['n'] for row in rows}
+
+    def get_all_registrants(self) -> List[Dict[str, Any]]:
+        """All registrants, same shape as SheetsClient.get_all_registrants()."""
+        return [registrant._asdict() for registrant in self.iter_registrants()]
+
+    def last_row(self) -> int:
+        """Highest row number in the mirror (0 when empty)."""
+        return self._db.connect().execute('SELECT MAX(row_number) FROM registrants').fetchone()[0] or 0
+
+    def count(self) -> int:
+        return self._db.connect().execute('SELECT COUNT(*) FROM registrants').fetchone()[0]
+
+    def get_registrant(self, row_number: int) -> Optional[Dict[str, Any]]:
+        row = self._db.connect().execute(
+            f"SELECT row_number, {', '.join(FIELDS)} FROM registrants WHERE row_number = ?",
+            (row_number,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'registrants': self.count(),
+            'duplicates': len(self.duplicate_rows()),
+            'synced_through': self.synced_through,
+            'last_sync': self._get_meta('last_sync'),
+            'last_full_sync': self._get_meta('last_full_sync'),
+            'path': str(self.path),
+        }
+
+
+_mirrors = ProcessRegistry()
+
+
+def get_mirror(sheet_id: str = None) -> RegistrantMirror:
+    """This process's mirror for a sheet (default GOOGLE_SHEET_ID)."""
+    sheet_id = sheet_id or os.environ.get('GOOGLE_SHEET_ID')
+    return _mirrors.get(sheet_id, lambda: RegistrantMirror(sheet_id))
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    mirror = RegistrantMirror()
+
+    if command == 'sync':
+        started = time.perf_counter()
+        result = mirror.sync(SheetsClient(), full='--full' in sys.argv or None)
+        print(f"Synced in {(time.perf_counter() - started) * 1000:.0f} ms: {result}")
+    elif command == 'upcoming':
+        today = date.today()
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else 14
+        for day, count in mirror.count_by_webinar_day(today, today + timedelta(days=days)).items():
+            print(f"  {day}  {count:>6} registrants")
+    elif command == 'duplicates':
+        for reg in mirror.duplicate_rows():
+            first = mirror.canonical_row(reg.email, reg.webinar_id)
+            print(f"  row {reg.row_number:>5}  {reg.email:<40} {reg.webinar_id:<16} duplicate of row {first}")
+    print(mirror.stats())
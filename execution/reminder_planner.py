@@ -0,0 +1,189 @@
+"""
+Reminder Planner
+================
+Decides which nurture reminders are due for a batch of registrant records
+(SCHEDULER_FIELDS projections from the registrant mirror): for every
+stage (7-day, 3-day, 1-day, day-of), the registrants whose webinar is
+inside the stage's days-out window and whose flag is still empty.
+
+plan_vectorized() loads the columns into NumPy arrays once and builds
+every stage's send list from boolean masks. Registrants share a handful
+of webinar dates, so each distinct date string is parsed once (with the
+same parse_webinar_date / days_until_webinar as the scheduler always
+used) and its days-out value broadcast to every row.
+plan_loop() is the original per-row if/elif walk. plan_reminders() uses
+the vectorized planner when the batch is large enough to benefit
+(PLANNER_VECTORIZE_MIN_ROWS, default 1000), else the loop. NumPy is in
+requirements.txt; an environment without it still plans, with the loop.
+
+Duplicate rows and the retry queue are checked by the caller on the
+(small) due list, not here.
+
+Usage:
+    from reminder_planner import plan_reminders
+    plan = plan_reminders(records)
+    for due in plan:                     # DueReminder(stage, reg, days)
+        ...
+    for stage, webinar_id, webinar_date, group in plan.groups():
+        ...                              # one webinar's due list for one stage
+    plan.invalid                         # records with an unparseable webinar_date
+
+    python bench_reminder_planner.py     # loop vs vectorized at 10k/100k/1M rows
+"""
+
+import os
+from collections import namedtuple
+from datetime import datetime
+from operator import itemgetter
+from typing import Dict, List
+
+from webinar_emails import WEBINAR_7DAY, WEBINAR_3DAY, WEBINAR_1DAY, WEBINAR_DAYOF
+
+try:
+    import numpy as np
+except ImportError:  # plan_reminders() falls back to plan_loop()
+    np = None
+
+VECTORIZE_MIN_ROWS = int(os.environ.get('PLANNER_VECTORIZE_MIN_ROWS', 1000))
+
+# A reminder goes out while the webinar is min_days..max_days away (webinar
+# timezone) and its flag field is empty
+ReminderStage = namedtuple('ReminderStage', ['column', 'field', 'label', 'template', 'min_days', 'max_days'])
+
+REMINDER_STAGES = [
+    ReminderStage('Email_7Day_Sent', 'email_7day_sent', '7-day reminder', WEBINAR_7DAY, 6, 8),
+    ReminderStage('Email_3Day_Sent', 'email_3day_sent', '3-day reminder', WEBINAR_3DAY, 2, 4),
+    ReminderStage('Email_1Day_Sent', 'email_1day_sent', '1-day reminder', WEBINAR_1DAY, 1, 1),
+    ReminderStage('Email_DayOf_Sent', 'email_dayof_sent', 'day-of reminder', WEBINAR_DAYOF, 0, 0),
+]
+
+# One due reminder: reg is the registrant record, days how far out its webinar is
+DueReminder = namedtuple('DueReminder', ['stage', 'reg', 'days'])
+
+
+def parse_webinar_date(iso_date: str) -> datetime:
+    """Parse ISO date string to datetime."""
+    try:
+        return datetime.fromisoformat(iso_date.replace('Z', '+00:00'))
+    except:
+        return None
+
+
+def days_until_webinar(webinar_date: datetime) -> int:
+    """Calculate days until the webinar."""
+    if not webinar_date:
+        return -999
+    now = datetime.now(webinar_date.tzinfo) if webinar_date.tzinfo else datetime.now()
+    delta = webinar_date.date() - now.date()
+    return delta.days
+
+
+def is_morning() -> bool:
+    """Check if it's morning (before noon) for day-of emails."""
+    return datetime.now().hour < 12
+
+
+def stage_for_days(days: int):
+    """The reminder stage whose window contains `days`, or None."""
+    for stage in REMINDER_STAGES:
+        if stage.min_days <= days <= stage.max_days:
+            return stage
+    return None
+
+
+class ReminderPlan:
+    """Due reminders by stage column, plus records skipped for an invalid date."""
+
+    def __init__(self):
+        self.due: Dict[str, List[DueReminder]] = {stage.column: [] for stage in REMINDER_STAGES}
+        self.invalid = []
+
+    def __iter__(self):
+        for stage in REMINDER_STAGES:
+            yield from self.due[stage.column]
+
+    def __len__(self):
+        return sum(len(due) for due in self.due.values())
+
+    def groups(self):
+        """
+        (stage, webinar_id, webinar_date, [DueReminder]) per stage and
+        webinar, so each group's shared email content is built once.
+        """
+        for stage in REMINDER_STAGES:
+            by_webinar: Dict[tuple, List[DueReminder]] = {}
+            for due in self.due[stage.column]:
+                by_webinar.setdefault((due.reg.webinar_id, due.reg.webinar_date), []).append(due)
+            for (webinar_id, webinar_date), group in by_webinar.items():
+                yield stage, webinar_id, webinar_date, group
+
+    def counts(self) -> Dict[str, int]:
+        return {stage.label: len(self.due[stage.column]) for stage in REMINDER_STAGES}
+
+
+def plan_loop(records, morning: bool = None) -> ReminderPlan:
+    """Per-row planning: parse each date, then the stage if/elif chain."""
+    morning = is_morning() if morning is None else morning
+    plan = ReminderPlan()
+    for reg in records:
+        if not reg.email or not reg.webinar_date:
+            continue
+        webinar_date = parse_webinar_date(reg.webinar_date)
+        if not webinar_date:
+            plan.invalid.append(reg)
+            continue
+        days = days_until_webinar(webinar_date)
+        stage = stage_for_days(days)
+        if stage is None or getattr(reg, stage.field):
+            continue
+        if stage.max_days == 0 and not morning:
+            continue
+        plan.due[stage.column].append(DueReminder(stage, reg, days))
+    return plan
+
+
+def plan_vectorized(records, morning: bool = None) -> ReminderPlan:
+    """plan_loop() as column masks over NumPy arrays; same result, one pass per stage."""
+    morning = is_morning() if morning is None else morning
+    plan = ReminderPlan()
+    records = records if isinstance(records, list) else list(records)
+    if not records:
+        return plan
+    count = len(records)
+    positions = {field: i for i, field in enumerate(records[0]._fields)}
+
+    def column(field: str):
+        return map(itemgetter(positions[field]), records)
+
+    def is_set(field: str):
+        """Boolean array: the field is non-empty, per row."""
+        return np.fromiter(map(bool, column(field)), dtype=bool, count=count)
+
+    # Factorize webinar_date: parse each distinct string once, broadcast by code
+    codes: Dict[str, int] = {}
+    date_code = np.fromiter(map(lambda value: codes.setdefault(value, len(codes)), column('webinar_date')),
+                            dtype=np.int32, count=count)
+    parsed = [parse_webinar_date(value) if value else None for value in codes]
+    days = np.array([days_until_webinar(dt) for dt in parsed], dtype=np.int32)[date_code]
+    has_date = np.fromiter(map(bool, codes), dtype=bool, count=len(codes))[date_code]
+    parses = np.array([dt is not None for dt in parsed], dtype=bool)[date_code]
+
+    candidate = is_set('email') & has_date
+    plan.invalid = [records[i] for i in np.flatnonzero(candidate & ~parses).tolist()]
+    candidate &= parses
+
+    for stage in REMINDER_STAGES:
+        if stage.max_days == 0 and not morning:
+            continue
+        mask = candidate & (days >= stage.min_days) & (days <= stage.max_days) & ~is_set(stage.field)
+        plan.due[stage.column] = [DueReminder(stage, records[i], days_out)
+                                  for i, days_out in zip(np.flatnonzero(mask).tolist(), days[mask].tolist())]
+    return plan
+
+
+def plan_reminders(records, morning: bool = None) -> ReminderPlan:
+    """Vectorized planning when NumPy is installed and the batch is big enough, else the loop."""
+    records = records if isinstance(records, list) else list(records)
+    if np is not None and len(records) >= VECTORIZE_MIN_ROWS:
+        return plan_vectorized(records, morning)
+    return plan_loop(records, morning)
@@ -0,0 +1,437 @@
+"""
+Scheduler Leases
+================
+Time-limited named leases that keep nurture scheduler instances from
+sending the same reminders. An instance that holds a lease renews it from
+a heartbeat thread every ttl/3 seconds. If the instance dies or hangs,
+the lease expires after SCHEDULER_LEASE_TTL seconds and another instance
+takes it over.
+
+Two ways to coordinate (webinar_nurture_scheduler.py --mode):
+    leader   one lease, 'webinar-nurture': one instance sends, overlapping
+             cron runs and other hosts exit straight away. The resident
+             daemon (webinar_nurture_daemon.py) waits for the same lease,
+             so it also excludes the cron scheduler.
+    shard    SCHEDULER_SHARDS leases, one per shard. A webinar belongs to
+             shard crc32(webinar_id) % shards. Each instance takes the
+             free shards (up to --max-shards) and sends only those webinars'
+             reminders, so several instances split the work, and a dead
+             instance's shards go to whoever runs next.
+The modes exclude each other, so a leader (including the daemon) never
+runs alongside shard instances; use one mode and one shard count.
+
+Backends are pluggable (SCHEDULER_LEASE_BACKEND):
+    sqlite   default; a WAL SQLite file (SCHEDULER_LEASE_PATH, default .tmp/scheduler_leases.db)
+    file     one JSON file per lease under a directory, updated under an
+             fcntl lock; for a shared directory where SQLite locking is
+             unreliable
+register_backend(name, factory) adds another (e.g. a network lock
+service). Expiry compares wall clocks, so hosts sharing a backend need
+clock skew well under the TTL. Acquiring refuses to run on the default
+host-local path, which other hosts cannot see, unless
+SCHEDULER_LEASE_ALLOW_LOCAL=1 declares a single-host install.
+
+Usage:
+    from scheduler_lease import Lease, SchedulerLeases
+    with Lease('webinar-nurture') as lease:
+        if lease.held:
+            ...                      # check lease.held before each unit of work
+
+    leases = SchedulerLeases('shard', shards=4, max_shards=2)
+    if leases.acquire():
+        ...                          # send for webinars where leases.owns(webinar_id)
+        leases.release()
+
+CLI:
+    python scheduler_lease.py status          # current holders and expiry
+    python scheduler_lease.py release <name>  # drop a lease by force
+"""
+
+import fcntl
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sqlite_store import ProcessRegistry, ThreadConnections
+
+LEASE_BACKEND = os.environ.get('SCHEDULER_LEASE_BACKEND', 'sqlite')
+LEASE_PATH = os.environ.get('SCHEDULER_LEASE_PATH')
+LEASE_TTL_SECONDS = float(os.environ.get('SCHEDULER_LEASE_TTL', 60))
+LEASE_MODE = os.environ.get('SCHEDULER_MODE', 'leader')
+LEASE_SHARDS = int(os.environ.get('SCHEDULER_SHARDS', 4))
+# Set to 1 on a single-host install to run on the default host-local lease store
+LEASE_ALLOW_LOCAL = os.environ.get('SCHEDULER_LEASE_ALLOW_LOCAL', '') == '1'
+
+LEASE_MODES = ('leader', 'shard')
+LEADER_LEASE = 'webinar-nurture'
+SHARD_LEASE_PREFIX = f'{LEADER_LEASE}-shard-'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    acquired_at REAL NOT NULL,
+    renewed_at REAL NOT NULL
+);
+"""
+
+
+def instance_id() -> str:
+    """Owner token for this process: host, pid and a random suffix."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def shard_of(webinar_id: str, shards: int) -> int:
+    """Stable shard of a webinar (the same on every host and Python run)."""
+    return zlib.crc32((webinar_id or '').strip().encode('utf-8')) % shards
+
+
+def shard_lease_name(shard: int, shards: int) -> str:
+    return f"{SHARD_LEASE_PREFIX}{shard}-of-{shards}"
+
+
+def require_shared_store():
+    """
+    Refuse to coordinate through the default host-local lease file, which
+    another host's instances cannot see, unless SCHEDULER_LEASE_ALLOW_LOCAL=1
+    says this is a single-host install.
+    """
+    if LEASE_PATH is None and LEASE_BACKEND in ('sqlite', 'file') and not LEASE_ALLOW_LOCAL:
+        raise RuntimeError(
+            "SCHEDULER_LEASE_PATH is not set, so leases would live in this host's execution/.tmp and "
+            "not coordinate with other hosts. Point every host at one shared lease store, or set "
+            "SCHEDULER_LEASE_ALLOW_LOCAL=1 if the scheduler only ever runs on this host."
+        )
+
+
+class SQLiteLeaseBackend:
+    """Leases as rows of an SQLite table; every change is one short write transaction."""
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or Path(__file__).parent / '.tmp' / 'scheduler_leases.db')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = ThreadConnections(self.path)
+        self._db.connect().executescript(SCHEMA)
+
+    def acquire(self, name: str, owner: str, ttl: float) -> Optional[float]:
+        """Take the lease if it is free, expired or already ours. Returns its expiry, or None."""
+        now = time.time()
+        conn = self._db.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+            if row is not None and row['owner'] != owner and row['expires_at'] > now:
+                conn.execute('ROLLBACK')
+                return None
+            conn.execute(
+                'INSERT OR REPLACE INTO leases (name, owner, expires_at, acquired_at, renewed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (name, owner, now + ttl, now, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return now + ttl
+
+    def renew(self, name: str, owner: str, ttl: float) -> Optional[float]:
+        """Extend a lease we still own. Returns the new expiry, or None if it was taken."""
+        now = time.time()
+        cursor = self._db.connect().execute(
+            'UPDATE leases SET expires_at = ?, renewed_at = ? WHERE name = ? AND owner = ?',
+            (now + ttl, now, name, owner)
+        )
+        return now + ttl if cursor.rowcount == 1 else None
+
+    def release(self, name: str, owner: str = None):
+        """Drop a lease (only if ours, unless owner is None)."""
+        if owner is None:
+            self._db.connect().execute('DELETE FROM leases WHERE name = ?', (name,))
+        else:
+            self._db.connect().execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+
+    def holders(self) -> List[dict]:
+        return [dict(row) for row in self._db.connect().execute('SELECT * FROM leases ORDER BY name')]
+
+
+class FileLeaseBackend:
+    """Leases as JSON files in one directory, read and written under an exclusive fcntl lock."""
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or Path(__file__).parent / '.tmp' / 'scheduler_leases')
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock_path = self.path / '.lock'
+
+    def _locked(self, update: Callable[[Dict[str, dict]], object]):
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return update(self._read_all())
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_all(self) -> Dict[str, dict]:
+        leases = {}
+        for lease_file in self.path.glob('*.json'):
+            try:
+                leases[lease_file.stem] = json.loads(lease_file.read_text())
+            except (OSError, ValueError):
+                continue  # a torn or vanished file counts as free
+        return leases
+
+    def _write(self, name: str, lease: dict):
+        tmp_path = self.path / f'.{name}.tmp'
+        tmp_path.write_text(json.dumps(lease))
+        os.replace(tmp_path, self.path / f'{name}.json')
+
+    def acquire(self, name: str, owner: str, ttl: float) -> Optional[float]:
+        def update(leases):
+            now = time.time()
+            current = leases.get(name)
+            if current and current['owner'] != owner and current['expires_at'] > now:
+                return None
+            self._write(name, {'name': name, 'owner': owner, 'expires_at': now + ttl,
+                               'acquired_at': now, 'renewed_at': now})
+            return now + ttl
+        return self._locked(update)
+
+    def renew(self, name: str, owner: str, ttl: float) -> Optional[float]:
+        def update(leases):
+            current = leases.get(name)
+            if not current or current['owner'] != owner:
+                return None
+            now = time.time()
+            self._write(name, dict(current, expires_at=now + ttl, renewed_at=now))
+            return now + ttl
+        return self._locked(update)
+
+    def release(self, name: str, owner: str = None):
+        def update(leases):
+            current = leases.get(name)
+            if current and (owner is None or current['owner'] == owner):
+                (self.path / f'{name}.json').unlink(missing_ok=True)
+        self._locked(update)
+
+    def holders(self) -> List[dict]:
+        return sorted(self._locked(lambda leases: list(leases.values())), key=lambda lease: lease['name'])
+
+
+LEASE_BACKENDS: Dict[str, Callable] = {
+    'sqlite': SQLiteLeaseBackend,
+    'file': FileLeaseBackend,
+}
+
+
+def register_backend(name: str, factory: Callable):
+    """Make a lease backend selectable with SCHEDULER_LEASE_BACKEND=name."""
+    LEASE_BACKENDS[name] = factory
+
+
+_backends = ProcessRegistry()
+
+
+def get_lease_backend(name: str = None):
+    """This process's backend (default SCHEDULER_LEASE_BACKEND at SCHEDULER_LEASE_PATH)."""
+    name = name or LEASE_BACKEND
+    if name not in LEASE_BACKENDS:
+        raise ValueError(f"Unknown lease backend '{name}' (have: {', '.join(LEASE_BACKENDS)})")
+    return _backends.get(name, lambda: LEASE_BACKENDS[name](LEASE_PATH))
+
+
+class Lease:
+    """
+    One named lease for this process, renewed by a heartbeat thread while
+    held. `held` turns False once a renewal finds the lease taken, or once
+    it expires because renewals kept failing; stop working when it does.
+    """
+
+    def __init__(self, name: str, backend=None, ttl: float = LEASE_TTL_SECONDS, owner: str = None):
+        self.name = name
+        self.backend = backend or get_lease_backend()
+        self.ttl = ttl
+        self.owner = owner or instance_id()
+        self.expires_at = 0.0
+        self._acquired = False
+        self._lost = threading.Event()
+        self._stopping = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    @property
+    def held(self) -> bool:
+        return self._acquired and not self._lost.is_set() and time.time() < self.expires_at
+
+    def acquire(self) -> bool:
+        """Try once to take the lease; on success start the heartbeat."""
+        if self.held:
+            return True
+        self._stop_heartbeat()
+        expires_at = self.backend.acquire(self.name, self.owner, self.ttl)
+        if expires_at is None:
+            return False
+        self.expires_at = expires_at
+        self._acquired = True
+        self._lost.clear()
+        self._stopping.clear()
+        self._heartbeat = threading.Thread(target=self._renew_loop, name=f'lease-{self.name}', daemon=True)
+        self._heartbeat.start()
+        return True
+
+    def _renew_loop(self):
+        while not self._stopping.wait(self.ttl / 3):
+            try:
+                expires_at = self.backend.renew(self.name, self.owner, self.ttl)
+            except Exception as e:
+                print(f"Lease {self.name}: heartbeat failed: {e}")
+                if time.time() >= self.expires_at:
+                    self._lost.set()
+                    return
+                continue
+            if expires_at is None:
+                print(f"Lease {self.name}: taken over by another instance")
+                self._lost.set()
+                return
+            self.expires_at = expires_at
+
+    def _stop_heartbeat(self):
+        self._stopping.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+
+    def release(self):
+        self._stop_heartbeat()
+        if self._acquired and not self._lost.is_set():
+            self.backend.release(self.name, self.owner)
+        self._acquired = False
+
+    def holder(self) -> Optional[dict]:
+        """The backend's record of whoever holds this lease now."""
+        return next((lease for lease in self.backend.holders() if lease['name'] == self.name), None)
+
+    def __enter__(self) -> 'Lease':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class SchedulerLeases:
+    """
+    The leases one scheduler run works under: the leader lease, or the
+    shard leases it could take. owns() says whether a webinar's reminders
+    are this instance's to send; held turns False if any lease is lost.
+
+    The modes exclude each other: a leader does not run while any other
+    instance holds a shard lease, and shard instances do not run while the
+    leader lease (or a shard lease for a different shard count) is held.
+    Each side takes its leases and then checks for the other, so of two
+    instances starting together at least one sees the other and backs off.
+    """
+
+    def __init__(self, mode: str = LEASE_MODE, shards: int = LEASE_SHARDS, max_shards: int = None,
+                 ttl: float = LEASE_TTL_SECONDS):
+        if mode not in LEASE_MODES:
+            raise ValueError(f"Unknown lease mode '{mode}' (have: {', '.join(LEASE_MODES)})")
+        self.mode = mode
+        self.shards = shards
+        self.max_shards = max_shards
+        self.ttl = ttl
+        self.owner = instance_id()
+        self.backend = get_lease_backend()
+        self.leases: Dict[Optional[int], Lease] = {}
+        self.conflict: Optional[str] = None   # why the last acquire() took nothing
+
+    def _conflict(self) -> Optional[str]:
+        """Another instance's live lease that this mode must not run alongside, if any."""
+        now = time.time()
+        for lease in self.backend.holders():
+            if lease['owner'] == self.owner or lease['expires_at'] <= now:
+                continue
+            name = lease['name']
+            if name == LEADER_LEASE:
+                return "the leader lease"
+            if self.mode == 'leader' and name.startswith(SHARD_LEASE_PREFIX):
+                return f"shard lease '{name}'"
+            if name.startswith(SHARD_LEASE_PREFIX) and not name.endswith(f'-of-{self.shards}'):
+                return f"shard lease '{name}' (a different shard count)"
+        return None
+
+    def acquire(self) -> bool:
+        """
+        Take the leader lease, or up to max_shards free shards. True if
+        anything was taken; else `conflict` says what is in the way.
+        """
+        if self.leases and self.held:
+            return True
+        self.release()
+        require_shared_store()
+        self.conflict = self._conflict()
+        if self.conflict:
+            return False
+        if self.mode == 'leader':
+            lease = Lease(LEADER_LEASE, backend=self.backend, ttl=self.ttl, owner=self.owner)
+            if lease.acquire():
+                self.leases[None] = lease
+            else:
+                self.conflict = "the leader lease"
+        else:
+            for shard in range(self.shards):
+                if self.max_shards is not None and len(self.leases) >= self.max_shards:
+                    break
+                lease = Lease(shard_lease_name(shard, self.shards), backend=self.backend, ttl=self.ttl,
+                              owner=self.owner)
+                if lease.acquire():
+                    self.leases[shard] = lease
+            if not self.leases:
+                self.conflict = "every shard lease"
+        if self.leases:
+            # An instance of the other mode may have started at the same moment
+            self.conflict = self._conflict()
+            if self.conflict:
+                self.release()
+        return bool(self.leases)
+
+    def owns(self, webinar_id: str) -> bool:
+        if self.mode == 'leader':
+            return None in self.leases
+        return shard_of(webinar_id, self.shards) in self.leases
+
+    @property
+    def held(self) -> bool:
+        return bool(self.leases) and all(lease.held for lease in self.leases.values())
+
+    def describe(self) -> str:
+        if self.mode == 'leader':
+            return f"leader lease '{LEADER_LEASE}'"
+        return f"shards {', '.join(map(str, sorted(self.leases)))} of {self.shards}"
+
+    def release(self):
+        for lease in self.leases.values():
+            lease.release()
+        self.leases = {}
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    backend = get_lease_backend()
+
+    if command == 'status':
+        now = time.time()
+        for lease in backend.holders():
+            remaining = lease['expires_at'] - now
+            state = f"expires in {remaining:.0f}s" if remaining > 0 else f"expired {-remaining:.0f}s ago"
+            print(f"  {lease['name']:<40} {lease['owner']:<40} {state}")
+    elif command == 'release' and len(sys.argv) > 2:
+        backend.release(sys.argv[2])
+        print(f"Released {sys.argv[2]}")
+    else:
+        print(__doc__)
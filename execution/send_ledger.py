@@ -0,0 +1,313 @@
+"""
+Reminder Send Ledger
+====================
+Append-only local log of every nurture reminder send, in a SQLite file in
+WAL mode, keyed by (email, webinar_id, stage). Stage is the flag column
+the reminder sets (Email_7Day_Sent, ...).
+
+Each send appends events, never updates them:
+    attempt   written before the message is handed to SMTP
+    sent      SMTP accepted it (its timestamp is what the sheet flag gets)
+    failed    SMTP refused or errored; the email retry queue owns it now
+    synced    the sheet flag cell has been written
+The latest event is the key's state. A reminder whose state is attempt,
+sent or synced is never sent again by the scheduler, so a crash or a
+Sheets error after SMTP succeeds cannot cause a duplicate. An attempt
+with no outcome (the process died mid-send) stays "in doubt": it is not
+re-sent automatically, and the CLI lists it and can release it. Clearing
+a flag cell by hand no longer re-sends a ledgered reminder; release its
+latest event instead.
+
+Sheet flags are written in bulk from the ledger: sync_to_sheet() buffers
+every sent-but-unsynced timestamp into one values.batchUpdate per chunk
+and then appends their synced events. The scheduler calls it at the
+start of a run (recovering a crashed run) and at the end.
+
+A second table, latest, holds each key's latest event and is updated in
+the same transaction as every append; it is derived from sends and never
+edited otherwise. Memory holds only open keys (latest event not synced):
+a start loads just those, and refresh() folds in events appended since
+(by any process) by id, dropping keys once they are synced. Lookups of
+open keys are dict hits; any other key is one primary-key read of latest,
+so the cost follows upcoming sends rather than the whole history.
+
+Usage:
+    from send_ledger import get_ledger
+    ledger = get_ledger(sheet_id)
+    ledger.refresh()
+    if ledger.state(email, webinar_id, 'Email_7Day_Sent') is None:
+        ledger.record(email, webinar_id, 'Email_7Day_Sent', row_number, 'attempt')
+        ...
+
+CLI:
+    python send_ledger.py stats              # keys by state
+    python send_ledger.py in-doubt           # attempts with no outcome
+    python send_ledger.py release <id>       # let a reminder (e.g. in doubt) be sent again
+    python send_ledger.py history <email>    # every event for one address
+    python send_ledger.py sync               # write unsynced flags to the sheet now
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from registrant_mirror import registration_key
+from sqlite_store import ProcessRegistry, ThreadConnections
+
+LEDGER_DIR = Path(os.environ.get('SEND_LEDGER_DIR', Path(__file__).parent / '.tmp'))
+
+# Events that mean "do not send this reminder again"
+DONE_STATES = ('attempt', 'sent', 'synced')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sends (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT NOT NULL,
+    webinar_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    row_number INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    at TEXT NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS sends_by_key ON sends (email, webinar_id, stage, id);
+CREATE TABLE IF NOT EXISTS latest (
+    email TEXT NOT NULL,
+    webinar_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    row_number INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    at TEXT NOT NULL,
+    PRIMARY KEY (email, webinar_id, stage)
+);
+CREATE INDEX IF NOT EXISTS latest_by_event ON latest (event);
+"""
+
+# Latest event of one key
+LedgerEntry = namedtuple('LedgerEntry', ['id', 'row_number', 'event', 'at'])
+
+
+class SendLedger:
+    """Append-only send log for one registrant sheet, with an in-memory index of open keys."""
+
+    def __init__(self, sheet_id: str = None, path: Path = None):
+        self.sheet_id = sheet_id or os.environ.get('GOOGLE_SHEET_ID')
+        if not self.sheet_id:
+            raise ValueError("GOOGLE_SHEET_ID not set in environment")
+        self.path = Path(path or LEDGER_DIR / f'send_ledger-{self.sheet_id}.db')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = ThreadConnections(self.path, synchronous='NORMAL')
+        self._db.connect().executescript(SCHEMA)
+        self._backfill_latest()
+
+        # (email, webinar_id, stage) -> latest LedgerEntry, for keys not yet synced
+        self._index: Dict[Tuple[str, str, str], LedgerEntry] = {}
+        self._through = None         # highest event id folded into the index; None until loaded
+        self._unsynced = set()       # keys whose latest event is 'sent'
+        self._lock = threading.Lock()
+
+    def _backfill_latest(self):
+        """Build the latest table once for a ledger written before it existed."""
+        conn = self._db.connect()
+        if conn.execute('SELECT 1 FROM latest LIMIT 1').fetchone() is not None:
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('SELECT 1 FROM latest LIMIT 1').fetchone() is None:
+                conn.execute(
+                    'INSERT INTO latest (email, webinar_id, stage, id, row_number, event, at) '
+                    'SELECT email, webinar_id, stage, id, row_number, event, at FROM sends '
+                    'WHERE id IN (SELECT MAX(id) FROM sends GROUP BY email, webinar_id, stage)'
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _append(conn: sqlite3.Connection, key: Tuple[str, str, str], row_number: int, event: str,
+                at: str, error: str = None) -> LedgerEntry:
+        """Insert one event and make it the key's latest; the caller holds the write transaction."""
+        cursor = conn.execute(
+            'INSERT INTO sends (email, webinar_id, stage, row_number, event, at, error) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (*key, row_number, event, at, error)
+        )
+        conn.execute(
+            'INSERT OR REPLACE INTO latest (email, webinar_id, stage, id, row_number, event, at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (*key, cursor.lastrowid, row_number, event, at)
+        )
+        return LedgerEntry(cursor.lastrowid, row_number, event, at)
+
+    def _fold(self, key: Tuple[str, str, str], entry: LedgerEntry):
+        current = self._index.get(key)
+        if current is not None and current.id > entry.id:
+            return  # already holds a later event (appended by this process)
+        if entry.event == 'synced':
+            self._index.pop(key, None)
+        else:
+            self._index[key] = entry
+        if entry.event == 'sent':
+            self._unsynced.add(key)
+        else:
+            self._unsynced.discard(key)
+
+    def refresh(self):
+        """
+        Fold events appended since the last refresh (by any process) into
+        the index. The first call loads only the keys not yet synced.
+        """
+        with self._lock:
+            conn = self._db.connect()
+            if self._through is None:
+                conn.execute('BEGIN')   # one snapshot for the watermark and the open keys
+                try:
+                    self._through = conn.execute('SELECT COALESCE(MAX(id), 0) FROM sends').fetchone()[0]
+                    rows = conn.execute(
+                        "SELECT id, email, webinar_id, stage, row_number, event, at FROM latest "
+                        "WHERE event != 'synced' AND id <= ?", (self._through,)
+                    ).fetchall()
+                finally:
+                    conn.execute('COMMIT')
+            else:
+                rows = conn.execute(
+                    'SELECT id, email, webinar_id, stage, row_number, event, at FROM sends '
+                    'WHERE id > ? ORDER BY id', (self._through,)
+                ).fetchall()
+            for row in rows:
+                self._fold((row['email'], row['webinar_id'], row['stage']),
+                           LedgerEntry(row['id'], row['row_number'], row['event'], row['at']))
+                self._through = max(self._through, row['id'])
+
+    def _latest(self, key: Tuple[str, str, str]) -> Optional[LedgerEntry]:
+        entry = self._index.get(key)
+        if entry is not None:
+            return entry
+        row = self._db.connect().execute(
+            'SELECT id, row_number, event, at FROM latest WHERE email = ? AND webinar_id = ? AND stage = ?', key
+        ).fetchone()
+        return LedgerEntry(*row) if row else None
+
+    def state(self, email: str, webinar_id: str, stage: str) -> Optional[str]:
+        """Latest event for this reminder, or None if it was never attempted."""
+        entry = self._latest((*registration_key(email, webinar_id), stage))
+        return entry.event if entry else None
+
+    def is_done(self, email: str, webinar_id: str, stage: str) -> bool:
+        """True if this reminder was sent, or may have been (in doubt)."""
+        return self.state(email, webinar_id, stage) in DONE_STATES
+
+    def record(self, email: str, webinar_id: str, stage: str, row_number: int, event: str,
+               error: str = None) -> LedgerEntry:
+        """Append one event and return it as the key's latest entry."""
+        key = (*registration_key(email, webinar_id), stage)
+        at = datetime.now().isoformat()
+        conn = self._db.connect()
+        with self._lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                entry = self._append(conn, key, row_number, event, at, error)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            self._fold(key, entry)
+        return entry
+
+    def sync_to_sheet(self, sheets) -> int:
+        """
+        Write the flag cell of every sent-but-unsynced reminder in bulk,
+        then mark them synced. Returns the number of flags written.
+        """
+        self.refresh()
+        with self._lock:
+            pending = [(key, self._index[key]) for key in self._unsynced]
+        if not pending:
+            return 0
+        with sheets.batched_updates():
+            for (_, _, stage), entry in pending:
+                sheets.buffer_email_sent(entry.row_number, stage, entry.at)
+
+        conn = self._db.connect()
+        with self._lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                synced_at = datetime.now().isoformat()
+                synced = [(key, self._append(conn, key, entry.row_number, 'synced', synced_at))
+                          for key, entry in pending]
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            for key, entry in synced:
+                self._fold(key, entry)
+        return len(pending)
+
+    def in_doubt(self) -> List[sqlite3.Row]:
+        """Attempts with no recorded outcome."""
+        return self._db.connect().execute(
+            "SELECT sends.* FROM latest JOIN sends ON sends.id = latest.id "
+            "WHERE latest.event = 'attempt' ORDER BY sends.id"
+        ).fetchall()
+
+    def release(self, event_id: int) -> bool:
+        """Append a 'failed' event after a key's latest event so the scheduler may send it again."""
+        row = self._db.connect().execute('SELECT * FROM sends WHERE id = ?', (event_id,)).fetchone()
+        if row is None or row['event'] not in DONE_STATES:
+            return False
+        latest = self._latest((row['email'], row['webinar_id'], row['stage']))
+        if latest is None or latest.id != event_id:
+            return False
+        self.record(row['email'], row['webinar_id'], row['stage'], row['row_number'], 'failed',
+                    error='released by operator')
+        return True
+
+    def history(self, email: str) -> List[sqlite3.Row]:
+        return self._db.connect().execute(
+            'SELECT * FROM sends WHERE email = ? ORDER BY id', (registration_key(email, '')[0],)
+        ).fetchall()
+
+    def stats(self) -> Dict[str, int]:
+        """Keys by latest event."""
+        return dict(self._db.connect().execute('SELECT event, COUNT(*) FROM latest GROUP BY event').fetchall())
+
+
+_ledgers = ProcessRegistry()
+
+
+def get_ledger(sheet_id: str = None) -> SendLedger:
+    """This process's ledger for a sheet (default GOOGLE_SHEET_ID)."""
+    sheet_id = sheet_id or os.environ.get('GOOGLE_SHEET_ID')
+    return _ledgers.get(sheet_id, lambda: SendLedger(sheet_id))
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    ledger = get_ledger()
+
+    if command == 'stats':
+        print(ledger.stats())
+    elif command == 'in-doubt':
+        for row in ledger.in_doubt():
+            print(f"{row['id']:>7}  {row['stage']:<18} {row['email']:<36} {row['webinar_id']:<14} "
+                  f"row {row['row_number']:>5}  attempted {row['at']}")
+    elif command == 'release' and len(sys.argv) > 2:
+        released = ledger.release(int(sys.argv[2]))
+        print("Released; the next scheduler run may send it" if released
+              else "Not the latest event of a sent or in-doubt reminder")
+    elif command == 'history' and len(sys.argv) > 2:
+        for row in ledger.history(sys.argv[2]):
+            print(f"{row['id']:>7}  {row['at']}  {row['event']:<8} {row['stage']:<18} "
+                  f"{row['webinar_id']:<14} row {row['row_number']}  {row['error'] or ''}")
+    elif command == 'sync':
+        from google_sheets_client import SheetsClient
+        print(f"Wrote {ledger.sync_to_sheet(SheetsClient.shared(ledger.sheet_id))} flags to the sheet")
+    else:
+        print(__doc__)
@@ -0,0 +1,216 @@
+"""
+Outbound Email Rate Limiter
+===========================
+Token buckets shared by every process on this host that sends through the
+same SMTP account (scheduler, webhook workers, outbox dispatchers), kept in
+a local SQLite file in WAL mode. Both SMTP pools in email_sender and
+async_smtp_client take a token before every message.
+
+Each send reserves one token from every bucket of its account in one
+transaction. An empty bucket still hands out the token - its balance goes
+negative - and the caller sleeps until that token would have refilled, so
+concurrent senders queue in arrival order instead of failing or polling.
+A reservation that would wait longer than the caller's maximum is not
+taken; RateLimitExceeded is raised and the send fails as before. Web and
+outbox paths use SMTP_RATE_MAX_WAIT_SECONDS, short enough to finish well
+inside an outbox claim. Batch senders that pace a reminder wave (the
+scheduler and daemon) pass PACED_MAX_WAIT_SECONDS instead, so every
+reminder waits its turn and only a spent daily quota pushes sends into the
+retry queue.
+
+Limits per SMTP account (0 disables a bucket):
+    SMTP_RATE_PER_MINUTE        default 60
+    SMTP_RATE_PER_DAY           default 2000 (Google Workspace; 500 for a consumer Gmail account)
+    SMTP_RATE_MAX_WAIT_SECONDS  default 60 (keep well under OUTBOX_CLAIM_TIMEOUT)
+    SMTP_RATE_PACED_MAX_WAIT_SECONDS  default 3600 (scheduler and daemon sends)
+
+Usage:
+    from send_rate_limiter import get_rate_limiter
+    limiter = get_rate_limiter(settings)     # email_sender.get_smtp_settings()
+    limiter.acquire()                        # blocks until this send is allowed
+    limiter.acquire(max_wait=PACED_MAX_WAIT_SECONDS)   # batch sends: wait for the bucket
+    await limiter.acquire_async()
+    limiter.headroom()                       # {'minute': {...}, 'day': {...}}
+
+CLI:
+    python send_rate_limiter.py status       # headroom for the configured account
+    python send_rate_limiter.py reset        # refill every bucket
+"""
+
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, List
+
+from sqlite_store import ProcessRegistry, ThreadConnections
+
+RATE_LIMIT_PATH = Path(os.environ.get('SMTP_RATE_DB', Path(__file__).parent / '.tmp' / 'send_rate.db'))
+
+RATE_PER_MINUTE = int(os.environ.get('SMTP_RATE_PER_MINUTE', 60))
+RATE_PER_DAY = int(os.environ.get('SMTP_RATE_PER_DAY', 2000))
+# Well under the outbox claim timeout (OUTBOX_CLAIM_TIMEOUT, 300s), so a
+# throttled outbox job finishes long before its claim could expire
+MAX_WAIT_SECONDS = float(os.environ.get('SMTP_RATE_MAX_WAIT_SECONDS', 60))
+# Scheduler and daemon sends are paced rather than failed: at 60/min an hour
+# covers a 3600-reminder wave, and only a spent daily quota goes past it
+PACED_MAX_WAIT_SECONDS = float(os.environ.get('SMTP_RATE_PACED_MAX_WAIT_SECONDS', 3600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    account TEXT NOT NULL,
+    name TEXT NOT NULL,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (account, name)
+);
+"""
+
+# capacity tokens, refilled continuously over window seconds
+RateLimit = namedtuple('RateLimit', ['name', 'capacity', 'window'])
+
+
+class RateLimitExceeded(Exception):
+    """The next send slot is further away than the caller is willing to wait."""
+
+
+def configured_limits() -> List[RateLimit]:
+    limits = [RateLimit('minute', RATE_PER_MINUTE, 60), RateLimit('day', RATE_PER_DAY, 86400)]
+    return [limit for limit in limits if limit.capacity > 0]
+
+
+def account_key(settings: dict) -> str:
+    """Limits belong to the sending account, whichever process uses it."""
+    return f"{settings['user'] or ''}@{settings['host']}:{settings['port']}"
+
+
+class SendRateLimiter:
+    """Cross-process token buckets for one SMTP account."""
+
+    def __init__(self, account: str, limits: List[RateLimit] = None, path: Path = None,
+                 max_wait: float = MAX_WAIT_SECONDS):
+        self.account = account
+        self.limits = configured_limits() if limits is None else limits
+        self.max_wait = max_wait
+        self.path = Path(path or RATE_LIMIT_PATH)
+        self._db = ThreadConnections(self.path, synchronous='NORMAL')
+        if self.limits:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db.connect().executescript(SCHEMA)
+
+    def _balances(self, conn: sqlite3.Connection, now: float) -> Dict[str, float]:
+        """Current token balance per bucket, refilled up to now (negative = queued sends)."""
+        stored = {
+            row['name']: row for row in
+            conn.execute('SELECT name, tokens, updated_at FROM buckets WHERE account = ?', (self.account,))
+        }
+        balances = {}
+        for limit in self.limits:
+            row = stored.get(limit.name)
+            if row is None:
+                balances[limit.name] = float(limit.capacity)
+            else:
+                refill = (now - row['updated_at']) * limit.capacity / limit.window
+                balances[limit.name] = min(float(limit.capacity), row['tokens'] + refill)
+        return balances
+
+    def reserve(self, count: int = 1, max_wait: float = None) -> float:
+        """
+        Take `count` tokens from every bucket. Returns how many seconds the
+        caller must wait before sending; raises RateLimitExceeded (taking
+        nothing) if that is more than max_wait.
+        """
+        if not self.limits:
+            return 0.0
+        max_wait = self.max_wait if max_wait is None else max_wait
+        now = time.time()
+        conn = self._db.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            balances = self._balances(conn, now)
+            wait = 0.0
+            for limit in self.limits:
+                balances[limit.name] -= count
+                if balances[limit.name] < 0:
+                    wait = max(wait, -balances[limit.name] * limit.window / limit.capacity)
+            if wait > max_wait:
+                raise RateLimitExceeded(
+                    f"SMTP rate limit for {self.account}: next send slot in {wait:.1f}s "
+                    f"(max wait {max_wait:g}s)"
+                )
+            conn.executemany(
+                'INSERT OR REPLACE INTO buckets (account, name, tokens, updated_at) VALUES (?, ?, ?, ?)',
+                [(self.account, name, tokens, now) for name, tokens in balances.items()]
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def acquire(self, count: int = 1, max_wait: float = None) -> float:
+        """Block until `count` sends are allowed. Returns the seconds waited."""
+        wait = self.reserve(count, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, count: int = 1) -> float:
+        """acquire() for event loops: the SQLite write runs off-loop, the wait is a sleep."""
+        if not self.limits:
+            return 0.0
+        wait = await asyncio.to_thread(self.reserve, count)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def headroom(self) -> Dict[str, dict]:
+        """Per bucket: sends available now, sends queued behind it, and the refill rate."""
+        if not self.limits:
+            return {}
+        balances = self._balances(self._db.connect(), time.time())
+        report = {}
+        for limit in self.limits:
+            tokens = balances[limit.name]
+            report[limit.name] = {
+                'limit': limit.capacity,
+                'window_seconds': limit.window,
+                'available': max(0, math.floor(tokens)),
+                'queued': max(0, math.ceil(-tokens)),
+                'next_slot_seconds': round(max(0.0, 1 - tokens) * limit.window / limit.capacity, 2),
+            }
+        return report
+
+    def reset(self):
+        self._db.connect().execute('DELETE FROM buckets WHERE account = ?', (self.account,))
+
+
+_limiters = ProcessRegistry()
+
+
+def get_rate_limiter(settings: dict = None) -> SendRateLimiter:
+    """This process's limiter for an SMTP account (default: the configured one)."""
+    if settings is None:
+        from email_sender import get_smtp_settings
+        settings = get_smtp_settings()
+    account = account_key(settings)
+    return _limiters.get(account, lambda: SendRateLimiter(account))
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    limiter = get_rate_limiter()
+
+    if command == 'status':
+        print(f"Account {limiter.account} ({limiter.path})")
+        print(json.dumps(limiter.headroom(), indent=2))
+    elif command == 'reset':
+        limiter.reset()
+        print(f"Refilled all buckets for {limiter.account}")
+    else:
+        print(__doc__)
@@ -0,0 +1,173 @@
+"""
+Sheets Discovery Cache
+======================
+Offline, pre-pruned Sheets v4 discovery document for fast client construction.
+
+googleapiclient ships the full Sheets discovery document (~290 KB of JSON,
+250 schemas). Every build() parses all of it, and every Resource it creates
+generates methods and docstrings from it. We only use a handful of
+spreadsheets.values methods, so this module prunes the document down to
+those methods and the schemas they reference, strips descriptions, and
+caches the result on disk in marshal format. Later processes load the small
+cache with no network and almost no parsing.
+
+Usage:
+    from sheets_discovery import load_discovery_document
+    service = build_from_document(load_discovery_document(), credentials=creds)
+
+    python sheets_discovery.py          # (re)build the cache and print sizes
+    SHEETS_DISCOVERY_CACHE=0 ...        # bypass the cache (full build())
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DISCOVERY_CACHE_DIR = Path(__file__).parent / '.tmp' / 'discovery'
+
+# resource path -> methods this repo calls
+USED_METHODS = {
+    'spreadsheets.values': ['get', 'update', 'append', 'batchGet', 'batchUpdate', 'clear'],
+}
+
+# Keys that only feed generated docstrings
+DOC_KEYS = {'description', 'enumDescriptions', 'documentationLink', 'icons'}
+# Maps whose keys are user-defined names, not discovery keywords
+NAME_MAPS = {'properties', 'parameters', 'schemas', 'methods', 'resources'}
+
+_memory_cache: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def _strip_docs(node, in_name_map: bool = False):
+    """Recursively drop description fields, leaving property names alone."""
+    if isinstance(node, dict):
+        return {
+            key: _strip_docs(value, key in NAME_MAPS and not in_name_map)
+            for key, value in node.items()
+            if in_name_map or key not in DOC_KEYS
+        }
+    if isinstance(node, list):
+        return [_strip_docs(item) for item in node]
+    return node
+
+
+def _collect_refs(node, refs: set):
+    if isinstance(node, dict):
+        ref = node.get('$ref')
+        if isinstance(ref, str):
+            refs.add(ref)
+        for value in node.values():
+            _collect_refs(value, refs)
+    elif isinstance(node, list):
+        for item in node:
+            _collect_refs(item, refs)
+
+
+def prune_discovery_document(doc: Dict[str, Any], used_methods: Dict[str, list] = None) -> Dict[str, Any]:
+    """Keep only the used methods and the schemas reachable from them."""
+    used_methods = used_methods or USED_METHODS
+    pruned = {key: value for key, value in doc.items() if key not in ('resources', 'schemas')}
+    pruned['resources'] = {}
+
+    for path, methods in used_methods.items():
+        source, target = doc, pruned
+        for part in path.split('.'):
+            source = source['resources'][part]
+            target = target.setdefault('resources', {}).setdefault(part, {})
+        target['methods'] = {name: source['methods'][name] for name in methods}
+
+    # Transitive closure of $ref from the kept methods
+    schemas = doc.get('schemas', {})
+    needed, pending = set(), set()
+    _collect_refs(pruned['resources'], pending)
+    while pending:
+        name = pending.pop()
+        if name in needed or name not in schemas:
+            continue
+        needed.add(name)
+        _collect_refs(schemas[name], pending)
+    pruned['schemas'] = {name: schemas[name] for name in sorted(needed)}
+
+    return _strip_docs(pruned)
+
+
+def _cache_path(api: str, version: str, source_version: str) -> Path:
+    methods_key = hashlib.sha1(json.dumps(USED_METHODS, sort_keys=True).encode()).hexdigest()[:10]
+    py = f"py{sys.version_info[0]}{sys.version_info[1]}"
+    return DISCOVERY_CACHE_DIR / f"{api}.{version}.{source_version}.{methods_key}.{py}.marshal"
+
+
+def _read_static_document(api: str, version: str) -> Optional[Dict[str, Any]]:
+    """The discovery document bundled with googleapiclient (no network)."""
+    from googleapiclient.discovery_cache import get_static_doc
+    content = get_static_doc(api, version)
+    return json.loads(content) if content else None
+
+
+def load_discovery_document(api: str = 'sheets', version: str = 'v4') -> Optional[Dict[str, Any]]:
+    """
+    Return the pruned discovery document, from memory, disk cache, or by
+    pruning the bundled document (then writing the cache).
+    Returns None if no bundled document exists or SHEETS_DISCOVERY_CACHE=0;
+    callers then fall back to build().
+    """
+    if os.environ.get('SHEETS_DISCOVERY_CACHE') == '0':
+        return None
+
+    from googleapiclient.version import __version__ as client_version
+
+    path = _cache_path(api, version, client_version)
+    key = str(path)
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    with _lock:
+        if key in _memory_cache:
+            return _memory_cache[key]
+
+        doc = None
+        if path.exists():
+            try:
+                with open(path, 'rb') as f:
+                    doc = marshal.load(f)
+            except (EOFError, ValueError, TypeError):
+                doc = None  # corrupt or foreign cache file, rebuild below
+
+        if doc is None:
+            full = _read_static_document(api, version)
+            if full is None:
+                return None
+            doc = prune_discovery_document(full)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+                with open(tmp_path, 'wb') as f:
+                    marshal.dump(doc, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Could not write discovery cache {path}: {e}")
+
+        _memory_cache[key] = doc
+        return doc
+
+
+if __name__ == '__main__':
+    from googleapiclient.version import __version__ as client_version
+
+    full = _read_static_document('sheets', 'v4')
+    if full is None:
+        print("No bundled Sheets discovery document in this googleapiclient version")
+        sys.exit(1)
+    path = _cache_path('sheets', 'v4', client_version)
+    if path.exists():
+        path.unlink()
+    doc = load_discovery_document()
+    print(f"Full document:   {len(json.dumps(full)):>8,} bytes, {len(full['schemas'])} schemas")
+    print(f"Pruned document: {len(json.dumps(doc)):>8,} bytes, {len(doc['schemas'])} schemas")
+    print(f"Cache file:      {path.stat().st_size:>8,} bytes at {path}")
@@ -0,0 +1,209 @@
+"""
+Local SMTP Sink
+===============
+Minimal SMTP server for exercising email_sender without any outside
+network. Accepts EHLO, optional STARTTLS, AUTH PLAIN/LOGIN (any
+credentials), MAIL/RCPT/DATA, RSET, NOOP and QUIT, and counts delivered
+messages instead of relaying them. Standard library only.
+
+Usage:
+    python smtp_sink.py --port 8025                  # run a sink
+    python smtp_sink.py --port 8025 --starttls       # advertise STARTTLS (self-signed cert)
+    python smtp_sink.py --reject 'bounce@'           # 550 for matching recipients
+
+    # Point the senders at it
+    SMTP_HOST=127.0.0.1 SMTP_PORT=8025 SMTP_SECURITY=none python email_sender.py
+
+    # Send N messages through the async backend and the sync pool, report throughput
+    python smtp_sink.py --demo 500 [--starttls] [--latency-ms 20]
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+class SMTPSink:
+    """Counts messages delivered by any number of concurrent SMTP sessions."""
+
+    def __init__(self, tls_context: ssl.SSLContext = None, reject: str = None, latency_ms: float = 0):
+        self.tls_context = tls_context
+        self.reject = reject
+        self.latency = latency_ms / 1000
+        self.messages = []          # (mail_from, [rcpt], size_bytes)
+        self.sessions = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.sessions += 1
+        tls_active = False
+
+        async def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        await reply('220 planwell-sink ESMTP ready')
+        mail_from, recipients = None, []
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    return
+                line = raw.decode(errors='replace').rstrip('\r\n')
+                verb, _, arg = line.partition(' ')
+                verb = verb.upper()
+                if self.latency:
+                    await asyncio.sleep(self.latency)   # simulated server/network delay
+
+                if verb in ('EHLO', 'HELO'):
+                    extensions = ['250-planwell-sink', '250-8BITMIME', '250-AUTH PLAIN LOGIN']
+                    if self.tls_context and not tls_active:
+                        extensions.append('250-STARTTLS')
+                    extensions.append('250 SIZE 10485760')
+                    writer.write(('\r\n'.join(extensions) + '\r\n').encode())
+                    await writer.drain()
+                elif verb == 'STARTTLS' and self.tls_context and not tls_active:
+                    await reply('220 Ready to start TLS')
+                    await writer.start_tls(self.tls_context)
+                    tls_active = True
+                elif verb == 'AUTH':
+                    mechanism = arg.split()[0].upper() if arg else ''
+                    if mechanism == 'LOGIN':
+                        await reply('334 ' + base64.b64encode(b'Username:').decode())
+                        await reader.readline()
+                        await reply('334 ' + base64.b64encode(b'Password:').decode())
+                        await reader.readline()
+                    elif mechanism == 'PLAIN' and len(arg.split()) == 1:
+                        await reply('334 ')
+                        await reader.readline()
+                    await reply('235 Authentication successful')
+                elif verb == 'MAIL':
+                    mail_from, recipients = arg, []
+                    await reply('250 OK')
+                elif verb == 'RCPT':
+                    if self.reject and self.reject in arg:
+                        await reply('550 Mailbox unavailable')
+                    else:
+                        recipients.append(arg)
+                        await reply('250 OK')
+                elif verb == 'DATA':
+                    if not recipients:
+                        await reply('554 No valid recipients')
+                        continue
+                    await reply('354 End data with <CR><LF>.<CR><LF>')
+                    size = 0
+                    while True:
+                        chunk = await reader.readline()
+                        if chunk in (b'.\r\n', b'.\n', b''):
+                            break
+                        size += len(chunk)
+                    self.messages.append((mail_from, recipients, size))
+                    mail_from, recipients = None, []
+                    await reply('250 OK queued')
+                elif verb == 'RSET':
+                    mail_from, recipients = None, []
+                    await reply('250 OK')
+                elif verb == 'NOOP':
+                    await reply('250 OK')
+                elif verb == 'QUIT':
+                    await reply('221 Bye')
+                    return
+                else:
+                    await reply('502 Command not implemented')
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8025) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port)
+
+
+def self_signed_context() -> ssl.SSLContext:
+    """Server TLS context with a throwaway self-signed certificate (needs openssl)."""
+    directory = Path(tempfile.mkdtemp(prefix='smtp-sink-'))
+    cert, key = directory / 'cert.pem', directory / 'key.pem'
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=localhost', '-keyout', str(key), '-out', str(cert)],
+        check=True, capture_output=True
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+async def run_demo(sink: SMTPSink, port: int, count: int, security: str):
+    """Send `count` messages with send_bulk_async, then with the sync send_bulk."""
+    os.environ.update({
+        'SMTP_HOST': '127.0.0.1', 'SMTP_PORT': str(port), 'SMTP_SECURITY': security,
+        'SMTP_USER': 'sink', 'SMTP_PASSWORD': 'sink', 'SMTP_TLS_VERIFY': '0',
+        'FROM_EMAIL': 'webinars@planwellfp.com',
+        # Measure the senders, not the production send limits (and leave their buckets alone)
+        'SMTP_RATE_PER_MINUTE': '0', 'SMTP_RATE_PER_DAY': '0',
+        'SMTP_RATE_DB': str(Path(tempfile.mkdtemp(prefix='smtp-sink-')) / 'send_rate.db'),
+    })
+    from email_sender import close_smtp_pools, send_bulk, send_bulk_async
+    from async_smtp_client import close_async_smtp_pools
+
+    messages = [(f'registrant{i}@example.com', 'Your webinar starts tomorrow', 'Hello ' * 50)
+                for i in range(count)]
+
+    started = time.perf_counter()
+    results = await send_bulk_async(messages)
+    elapsed = time.perf_counter() - started
+    await close_async_smtp_pools()
+    ok = sum(1 for r in results if r.ok)
+    print(f"async send_bulk_async: {ok}/{count} sent in {elapsed:.2f}s "
+          f"({count / elapsed:.0f} msgs/s), sink has {len(sink.messages)} messages")
+
+    before = len(sink.messages)
+    started = time.perf_counter()
+    results = await asyncio.to_thread(send_bulk, messages)
+    elapsed = time.perf_counter() - started
+    await asyncio.to_thread(close_smtp_pools)
+    ok = sum(1 for r in results if r.ok)
+    print(f"sync  send_bulk:       {ok}/{count} sent in {elapsed:.2f}s "
+          f"({count / elapsed:.0f} msgs/s), sink received {len(sink.messages) - before}")
+    print(f"Sink sessions opened: {sink.sessions}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Local SMTP sink for email_sender testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--starttls', action='store_true', help='Advertise STARTTLS with a self-signed cert')
+    parser.add_argument('--reject', help='Refuse recipients containing this text (550)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay before every reply')
+    parser.add_argument('--demo', type=int, metavar='N', help='Send N messages through the senders and exit')
+    args = parser.parse_args()
+
+    sink = SMTPSink(self_signed_context() if args.starttls else None, args.reject, args.latency_ms)
+    server = await sink.start(args.host, args.port)
+    port = server.sockets[0].getsockname()[1]
+
+    if args.demo:
+        sys.stdout.reconfigure(line_buffering=True)
+        async with server:
+            await run_demo(sink, port, args.demo, 'starttls' if args.starttls else 'none')
+        return
+
+    print(f"SMTP sink listening on {args.host}:{port} (Ctrl+C to stop)")
+    async with server:
+        try:
+            await server.serve_forever()
+        finally:
+            print(f"\n{len(sink.messages)} messages received over {sink.sessions} sessions")
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
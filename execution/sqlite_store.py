@@ -0,0 +1,74 @@
+"""
+SQLite Store Helpers
+====================
+Plumbing shared by the host-local SQLite stores (outbox, registrant
+mirror, send ledger, send rate limiter, scheduler leases).
+
+ThreadConnections opens one connection per thread on first use, in
+autocommit mode (callers issue BEGIN IMMEDIATE themselves) with WAL so
+readers and the writer overlap, a 30s busy timeout, and sqlite3.Row
+rows. Each store picks its synchronous level: FULL where losing the last
+commit in a power cut matters (the outbox), NORMAL where it is
+re-derivable, or SQLite's default.
+
+ProcessRegistry hands out one store instance per key per process. It is
+keyed by pid as well, so a forked worker builds its own instead of
+sharing the parent's thread-local connections.
+
+Usage:
+    from sqlite_store import ProcessRegistry, ThreadConnections
+
+    class Store:
+        def __init__(self, path):
+            self._db = ThreadConnections(path, synchronous='NORMAL')
+            self._db.connect().executescript(SCHEMA)
+
+    _stores = ProcessRegistry()
+
+    def get_store(name: str = None) -> Store:
+        return _stores.get(name, lambda: Store(name))
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable
+
+BUSY_TIMEOUT_SECONDS = 30
+
+
+class ThreadConnections:
+    """One WAL connection per thread to a single SQLite file."""
+
+    def __init__(self, path: Path, synchronous: str = None):
+        self.path = path
+        self.synchronous = synchronous
+        self._local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            if self.synchronous:
+                conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            self._local.conn = conn
+        return conn
+
+
+class ProcessRegistry:
+    """Lazily built instances, one per (key, pid)."""
+
+    def __init__(self):
+        self._instances: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        key = (key, os.getpid())
+        if key not in self._instances:
+            with self._lock:
+                if key not in self._instances:
+                    self._instances[key] = factory()
+        return self._instances[key]
@@ -7,12 +7,41 @@ Single Flask server that handles all PlanWell webhooks:
 - /api/book-call - Call booking
 
 Run this instead of individual handlers:
-    python webhook_server.py
+    python webhook_server.py                          # production (gunicorn)
+    python webhook_server.py --workers 4 --threads 8  # size the worker pool
+    python webhook_server.py --dev                    # Flask dev server + reloader
+
+Production mode runs a gunicorn master with a pool of worker processes,
+each serving requests from a pool of threads. Signals to the master:
+    HUP   - graceful restart (new workers start, old ones finish in-flight requests)
+    TERM  - graceful shutdown (stop accepting, drain for --graceful-timeout seconds)
+    TTIN / TTOU - add / remove one worker
+
+Service-wide request rate, error count and latency percentiles are served
+at /metrics. Each worker publishes a latency histogram of its last minute
+to WEB_METRICS_DIR (default .tmp/request_stats) every few seconds, and
+/metrics merges every worker's on this host; percentiles are accurate to
+the histogram's 10% bucket width. Requests are timed at teardown, so ones
+that raise are counted too.
+
+Form endpoints only validate and write to the local outbox (outbox.py),
+then return 202. Each worker runs an outbox dispatcher that delivers the
+submissions to Google Sheets and SMTP with retries; its queue depth is
+included in /health, along with the shared SMTP rate limiter's headroom.
+The dispatcher starts when the worker boots, so jobs left pending or
+mid-claim by a restart are drained without waiting for a new submission.
 """
 
+import argparse
+import bisect
+import json
+import math
 import os
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from flask import Flask
+from flask import Flask, g, request
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -25,16 +54,213 @@ CORS(app)
 # Import and register blueprints/routes from individual handlers
 from webinar_nurture_handler import handle_webinar_registration
 from contact_form_handler import handle_contact_form
+from call_booking_handler import book_call
+import email_retry  # noqa: F401 - worker dispatchers also deliver queued email retries
+from outbox import ensure_dispatcher, get_outbox
+from send_rate_limiter import get_rate_limiter
 
 # Re-register routes on the combined app
 app.add_url_rule('/api/webinar', 'webinar', handle_webinar_registration, methods=['POST'])
 app.add_url_rule('/api/contact', 'contact', handle_contact_form, methods=['POST'])
+app.add_url_rule('/api/book-call', 'book_call', book_call, methods=['POST'])
+
+
+METRICS_DIR = Path(os.environ.get('WEB_METRICS_DIR', Path(__file__).parent / '.tmp' / 'request_stats'))
+METRICS_PUBLISH_SECONDS = 5
+# Latency histogram bucket upper bounds: 0.1 ms to ~2 min, each 10% wider than the last
+LATENCY_BUCKETS_MS = [0.1 * 1.1 ** i for i in range(int(math.log(1.2e6) / math.log(1.1)) + 2)]
+
+
+def histogram_percentile(counts: list, p: float) -> float:
+    """Upper bound of the bucket holding the p-th percentile of a latency histogram."""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank, seen = p / 100 * total, 0
+    for index, count in enumerate(counts):
+        seen += count
+        if count and seen >= rank:
+            return round(LATENCY_BUCKETS_MS[min(index, len(LATENCY_BUCKETS_MS) - 1)], 2)
+    return round(LATENCY_BUCKETS_MS[-1], 2)
+
+
+class RequestStats:
+    """Rolling request-rate and latency window for one worker process."""
+
+    def __init__(self, window_seconds: int = 60, max_samples: int = 50000):
+        self.window_seconds = window_seconds
+        self.samples = deque(maxlen=max_samples)  # (finished_at, duration_ms, path, failed)
+        self.total_requests = 0
+        self.total_errors = 0
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+        self._publisher = None
+
+    def record(self, path: str, duration_ms: float, failed: bool = False):
+        with self.lock:
+            self.samples.append((time.time(), duration_ms, path, failed))
+            self.total_requests += 1
+            self.total_errors += failed
+
+    def _recent(self):
+        cutoff = time.time() - self.window_seconds
+        with self.lock:
+            return [s for s in self.samples if s[0] >= cutoff], self.total_requests, self.total_errors
+
+    def publish(self):
+        """Write this worker's window as a latency histogram for /metrics to merge."""
+        recent, total, errors = self._recent()
+        counts = [0] * len(LATENCY_BUCKETS_MS)
+        for sample in recent:
+            counts[min(bisect.bisect_left(LATENCY_BUCKETS_MS, sample[1]), len(counts) - 1)] += 1
+        METRICS_DIR.mkdir(parents=True, exist_ok=True)
+        path = METRICS_DIR / f'{os.getpid()}.json'
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({
+            'pid': os.getpid(),
+            'published_at': time.time(),
+            'started_at': self.started_at,
+            'window_seconds': self.window_seconds,
+            'requests_in_window': len(recent),
+            'errors_in_window': sum(1 for s in recent if s[3]),
+            'total_requests': total,
+            'total_errors': errors,
+            'latency_histogram': counts,
+        }))
+        os.replace(tmp_path, path)
+
+    def ensure_publisher(self):
+        """Publish every METRICS_PUBLISH_SECONDS from a daemon thread (one per worker process)."""
+        if self._publisher is not None and self._publisher[0] == os.getpid():
+            return
+        with self.lock:
+            if self._publisher is not None and self._publisher[0] == os.getpid():
+                return
+            thread = threading.Thread(target=self._publish_loop, name='metrics-publisher', daemon=True)
+            self._publisher = (os.getpid(), thread)
+        thread.start()
+
+    def _publish_loop(self):
+        while True:
+            try:
+                self.publish()
+            except OSError as e:
+                print(f"Could not publish request stats: {e}")
+            time.sleep(METRICS_PUBLISH_SECONDS)
+
+    def snapshot(self) -> dict:
+        """Return req/s and latency percentiles over the rolling window."""
+        now = time.time()
+        recent, total, errors = self._recent()
+
+        durations = sorted(s[1] for s in recent)
+        window = min(self.window_seconds, max(now - self.started_at, 1e-6))
+
+        def percentile(p: float) -> float:
+            if not durations:
+                return 0.0
+            index = min(len(durations) - 1, int(round(p / 100 * (len(durations) - 1))))
+            return round(durations[index], 2)
+
+        return {
+            'pid': os.getpid(),
+            'window_seconds': self.window_seconds,
+            'requests_in_window': len(durations),
+            'requests_per_second': round(len(durations) / window, 2),
+            'p50_ms': percentile(50),
+            'p95_ms': percentile(95),
+            'p99_ms': percentile(99),
+            'errors_in_window': sum(1 for s in recent if s[3]),
+            'total_requests': total,
+            'total_errors': errors,
+        }
+
+
+def service_snapshot(window_seconds: int = 60) -> dict:
+    """
+    Req/s, errors and latency percentiles over every worker on this host,
+    merged from the histograms they publish. Files from workers gone for
+    longer than the window are removed.
+    """
+    now = time.time()
+    counts = [0] * len(LATENCY_BUCKETS_MS)
+    workers, requests, errors, total, total_errors, oldest = 0, 0, 0, 0, 0, now
+    for path in METRICS_DIR.glob('*.json'):
+        try:
+            stats = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if stats['published_at'] < now - window_seconds - METRICS_PUBLISH_SECONDS:
+            path.unlink(missing_ok=True)
+            continue
+        workers += 1
+        requests += stats['requests_in_window']
+        errors += stats['errors_in_window']
+        total += stats['total_requests']
+        total_errors += stats['total_errors']
+        oldest = min(oldest, stats['started_at'])
+        for index, count in enumerate(stats['latency_histogram'][:len(counts)]):
+            counts[index] += count
+    window = min(window_seconds, max(now - oldest, 1e-6))
+    return {
+        'workers': workers,
+        'window_seconds': window_seconds,
+        'requests_in_window': requests,
+        'requests_per_second': round(requests / window, 2),
+        'errors_in_window': errors,
+        'p50_ms': histogram_percentile(counts, 50),
+        'p95_ms': histogram_percentile(counts, 95),
+        'p99_ms': histogram_percentile(counts, 99),
+        'total_requests': total,
+        'total_errors': total_errors,
+    }
+
+
+request_stats = RequestStats()
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+    # Normally started by post_worker_init; covers the dev server and other WSGI hosts
+    ensure_dispatcher()
+    request_stats.ensure_publisher()
+
+
+@app.after_request
+def note_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def record_timing(exc):
+    # Runs for every request, including ones whose handler raised
+    started = g.pop('request_started', None)
+    if started is not None and request.path != '/metrics':
+        failed = exc is not None or g.pop('response_status', 500) >= 500
+        request_stats.record(request.path, (time.perf_counter() - started) * 1000, failed)
 
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint."""
-    return {'status': 'ok', 'service': 'planwell-webhooks'}
+    return {
+        'status': 'ok',
+        'service': 'planwell-webhooks',
+        'outbox': get_outbox().stats(),
+        'smtp_rate_headroom': get_rate_limiter().headroom(),
+    }
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request rate, errors and latency percentiles across this host's workers, and for this worker."""
+    request_stats.publish()
+    return {
+        'service': service_snapshot(request_stats.window_seconds),
+        'worker': request_stats.snapshot(),
+    }
 
 
 @app.route('/', methods=['GET'])
@@ -45,20 +271,101 @@ def index():
         'endpoints': [
             {'path': '/api/webinar', 'method': 'POST', 'description': 'Webinar registration'},
             {'path': '/api/contact', 'method': 'POST', 'description': 'Contact form'},
+            {'path': '/api/book-call', 'method': 'POST', 'description': 'Call booking'},
             {'path': '/health', 'method': 'GET', 'description': 'Health check'},
+            {'path': '/metrics', 'method': 'GET', 'description': 'Service and worker req/s and latency percentiles'},
         ]
     }
 
 
+def post_worker_init(worker):
+    """Gunicorn hook: start the worker's outbox dispatcher at boot, so jobs left
+    pending by a restart are delivered without waiting for a new submission,
+    and its request stats publisher."""
+    ensure_dispatcher()
+    request_stats.ensure_publisher()
+
+
+def worker_exit(server, worker):
+    """Gunicorn hook: log each worker's final numbers when it drains."""
+    request_stats.publish()
+    stats = request_stats.snapshot()
+    print(f"Worker {stats['pid']} exiting: {stats['total_requests']} requests, "
+          f"{stats['requests_per_second']} req/s, p99 {stats['p99_ms']} ms")
+
+
+def run_production(options: dict):
+    """Serve the app with a gunicorn master and a pool of threaded workers."""
+    from gunicorn.app.base import BaseApplication
+
+    class WebhookServer(BaseApplication):
+        def __init__(self, application, config):
+            self.application = application
+            self.config_options = config
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.config_options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    WebhookServer(app, options).run()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='PlanWell combined webhook server')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5001)))
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', 2)),
+                        help='Worker processes (default: WEB_WORKERS or 2)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 8)),
+                        help='Request threads per worker (default: WEB_THREADS or 8)')
+    parser.add_argument('--backlog', type=int, default=int(os.environ.get('WEB_BACKLOG', 256)),
+                        help='Max pending connections in the accept queue')
+    parser.add_argument('--timeout', type=int, default=60,
+                        help='Seconds before a stuck worker is killed and replaced')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='Seconds to drain in-flight requests on restart/shutdown')
+    parser.add_argument('--max-requests', type=int, default=5000,
+                        help='Recycle a worker after this many requests (0 = never)')
+    parser.add_argument('--dev', action='store_true',
+                        help='Use the single-process Flask dev server with reloader')
+    return parser.parse_args(argv)
+
+
 if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5001))
+    args = parse_args()
+    mode = 'development (Flask reloader)' if args.dev else \
+        f'production ({args.workers} workers x {args.threads} threads)'
     print(f"\n{'='*60}")
     print(f"PlanWell Webhook Server")
     print(f"{'='*60}")
-    print(f"Running on http://localhost:{port}")
+    print(f"Running on http://localhost:{args.port} - {mode}")
     print(f"\nEndpoints:")
     print(f"  POST /api/webinar  - Webinar registration")
     print(f"  POST /api/contact  - Contact form")
+    print(f"  POST /api/book-call - Call booking")
     print(f"  GET  /health       - Health check")
+    print(f"  GET  /metrics      - Service and worker req/s and p99")
     print(f"{'='*60}\n")
-    app.run(host='0.0.0.0', port=port, debug=True)
+
+    if args.dev:
+        app.run(host=args.host, port=args.port, debug=True)
+    else:
+        run_production({
+            'bind': f'{args.host}:{args.port}',
+            'workers': args.workers,
+            'threads': args.threads,
+            'worker_class': 'gthread',
+            'backlog': args.backlog,
+            'timeout': args.timeout,
+            'graceful_timeout': args.graceful_timeout,
+            'max_requests': args.max_requests,
+            'max_requests_jitter': args.max_requests // 10 if args.max_requests else 0,
+            'post_worker_init': post_worker_init,
+            'worker_exit': worker_exit,
+            'accesslog': '-',
+        })
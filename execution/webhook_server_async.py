@@ -0,0 +1,241 @@
+"""
+Combined Webhook Server (asyncio)
+=================================
+ASGI edition of webhook_server.py. Same routes, JSON request/response
+contract and durability: handlers validate, record the submission in the
+local outbox (outbox.py) off the event loop and return 202. Each process
+runs an outbox dispatcher, started with the app, that delivers submissions
+to Google Sheets and SMTP with retries, so a Sheets or SMTP outage delays
+work instead of losing it.
+
+The handlers only enqueue; they make no Sheets, SMTP or Graph calls, so a
+request holds nothing but a short local write and one process can keep
+hundreds of submissions in flight. Delivery runs on the dispatcher's
+threads with the same synchronous clients as the Flask server.
+
+- /api/webinar - Webinar registration
+- /api/contact - Contact form
+- /api/book-call - Call booking
+
+Usage:
+    python webhook_server_async.py
+    python webhook_server_async.py --port 5001 --workers 2
+    uvicorn webhook_server_async:app --port 5001
+"""
+
+import argparse
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# Load environment variables
+load_dotenv(Path(__file__).parent.parent / '.env')
+
+import email_retry  # noqa: F401 - the dispatcher also delivers queued email retries
+from outbox import enqueue, ensure_dispatcher, get_outbox
+from send_rate_limiter import get_rate_limiter
+# Importing the handlers registers their outbox job kinds
+from webinar_nurture_handler import is_valid_webinar_date
+import contact_form_handler  # noqa: F401
+from call_booking_handler import get_next_advisor, header_field_error, is_qualified, log_submission
+
+
+async def read_json(request):
+    """Parse the JSON body, returning None for empty or malformed input."""
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+async def queue(kind: str, payload: dict) -> int:
+    """Record a job in the outbox off the event loop (the write waits for fsync)."""
+    return await asyncio.to_thread(enqueue, kind, payload)
+
+
+async def handle_webinar_registration(request):
+    """Validate, queue for the sheet and confirmation email, return 202."""
+    data = await read_json(request)
+
+    if not data:
+        return JSONResponse({'success': False, 'error': 'No data provided'}, status_code=400)
+
+    email = data.get('email')
+    if not email:
+        return JSONResponse({'success': False, 'error': 'Email is required'}, status_code=400)
+
+    if not is_valid_webinar_date(data.get('webinar_date', '')):
+        return JSONResponse({'success': False, 'error': 'webinar_date must be an ISO 8601 date'}, status_code=400)
+
+    try:
+        job_id = await queue('webinar_registration', {
+            'name': data.get('name', ''),
+            'email': email,
+            'agency': data.get('agency', ''),
+            'timeline': data.get('timeline', ''),
+            'webinar_id': data.get('webinar_id', ''),
+            'webinar_date': data.get('webinar_date', ''),
+            'submitted_at': datetime.now().isoformat(),
+        })
+
+        return JSONResponse({
+            'success': True,
+            'message': 'Registration received',
+            'queued': True,
+            'job_id': job_id
+        }, status_code=202)
+
+    except Exception as e:
+        print(f"Error handling registration: {e}")
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+async def handle_contact_form(request):
+    """Validate, queue for the contact sheet, return 202."""
+    data = await read_json(request)
+
+    if not data:
+        return JSONResponse({'success': False, 'error': 'No data provided'}, status_code=400)
+
+    email = data.get('email')
+    if not email:
+        return JSONResponse({'success': False, 'error': 'Email is required'}, status_code=400)
+
+    try:
+        job_id = await queue('contact_submission', dict(data, submitted_at=datetime.now().isoformat()))
+
+        return JSONResponse({
+            'success': True,
+            'message': 'Contact form received',
+            'queued': True,
+            'job_id': job_id
+        }, status_code=202)
+
+    except Exception as e:
+        print(f"Error handling contact form: {e}")
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+async def book_call(request):
+    """Screen the prospect, assign an advisor, and queue both emails."""
+    data = await read_json(request)
+
+    if not data:
+        return JSONResponse({'success': False, 'error': 'No data provided'}, status_code=400)
+
+    if not data.get('email'):
+        return JSONResponse({'success': False, 'error': 'Email is required'}, status_code=400)
+
+    invalid = header_field_error(data)
+    if invalid:
+        return JSONResponse({'success': False, 'error': invalid}, status_code=400)
+
+    qualified, reason = is_qualified(data)
+
+    if not qualified:
+        await asyncio.to_thread(log_submission, data, None, False)
+
+        if reason == "redirect_to_webinar":
+            return JSONResponse({
+                'success': False,
+                'redirect': '/webinar',
+                'message': 'Based on your answers, our free webinar would be a great fit for you!'
+            })
+        return JSONResponse({'success': False, 'message': reason})
+
+    try:
+        # Round-robin state and the CSV log are file I/O, so they run off the
+        # event loop; call_booking_handler serializes them with a lock.
+        advisor = await asyncio.to_thread(get_next_advisor)
+        await asyncio.to_thread(log_submission, data, advisor, True)
+
+        # Queue both emails; the outbox dispatcher sends them with retries
+        await queue('call_booking_emails', {'prospect': data, 'advisor_id': advisor['id']})
+
+    except Exception as e:
+        print(f"Error handling call booking: {e}")
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+    return JSONResponse({
+        'success': True,
+        'advisor': {
+            'name': advisor['name'],
+            'title': advisor['title'],
+            'bio': advisor['bio']
+        },
+        'message': f"You've been matched with {advisor['name']}!"
+    }, status_code=202)
+
+
+async def health(request):
+    """Health check endpoint."""
+    ensure_dispatcher()
+    outbox_stats, headroom = await asyncio.gather(
+        asyncio.to_thread(lambda: get_outbox().stats()),
+        asyncio.to_thread(lambda: get_rate_limiter().headroom()),
+    )
+    return JSONResponse({
+        'status': 'ok',
+        'service': 'planwell-webhooks-async',
+        'outbox': outbox_stats,
+        'smtp_rate_headroom': headroom,
+    })
+
+
+async def index(request):
+    """Root endpoint with API info."""
+    return JSONResponse({
+        'service': 'PlanWell Webhook Server (async)',
+        'endpoints': [
+            {'path': '/api/webinar', 'method': 'POST', 'description': 'Webinar registration'},
+            {'path': '/api/contact', 'method': 'POST', 'description': 'Contact form'},
+            {'path': '/api/book-call', 'method': 'POST', 'description': 'Call booking'},
+            {'path': '/health', 'method': 'GET', 'description': 'Health check'},
+        ]
+    })
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Start this process's dispatcher now, so jobs left pending by a restart are drained
+    dispatcher = ensure_dispatcher()
+    yield
+    dispatcher.stop()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/webinar', handle_webinar_registration, methods=['POST']),
+        Route('/api/contact', handle_contact_form, methods=['POST']),
+        Route('/api/book-call', book_call, methods=['POST']),
+        Route('/health', health, methods=['GET']),
+        Route('/', index, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='PlanWell async webhook server')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5001)))
+    parser.add_argument('--workers', type=int, default=1, help='Event-loop processes')
+    args = parser.parse_args()
+
+    print(f"Starting PlanWell async webhook server on http://localhost:{args.port}")
+    if args.workers > 1:
+        uvicorn.run('webhook_server_async:app', host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -3,21 +3,26 @@ Webinar Email Templates
 =======================
 Pre-formatted HTML email templates for the webinar nurture sequence.
 
+Each email is an EmailTemplate compiled once at import (see
+email_templates); sends render straight to pre-encoded message bytes.
+
 Usage:
     from webinar_emails import send_webinar_confirmation, send_webinar_7day, ...
+
+Each send_webinar_* has a build_webinar_* twin that returns
+(subject, plain_body, html_body) without sending, for other transports.
+Batch senders can render WEBINAR_* templates directly:
+    send_bulk([WEBINAR_7DAY.render(email, first_name=..., webinar_date=...), ...])
 """
 
-from email_sender import send_email
+from email_sender import send_rendered
+from email_templates import EmailTemplate
 
 
-def send_webinar_confirmation(to_email: str, first_name: str, webinar_date: str, 
-                               timezone: str = 'EST', calendar_link: str = None) -> bool:
-    """
-    Send confirmation email immediately after registration.
-    """
-    subject = f"You're registered for the FERS Workshop on {webinar_date}"
-    
-    plain_body = f"""Hi {first_name},
+WEBINAR_CONFIRMATION = EmailTemplate(
+    'webinar_confirmation',
+    subject="You're registered for the FERS Workshop on {webinar_date}",
+    plain="""Hi {first_name},
 
 You're all set for the FERS Retirement Workshop!
 
@@ -42,9 +47,8 @@ The PlanWell Team
 ---
 PlanWell Financial Planning
 planwellfp.com
-"""
-
-    html_body = f"""
+""",
+    html="""
 <!DOCTYPE html>
 <html>
 <head>
@@ -103,18 +107,33 @@ planwellfp.com
     </div>
 </body>
 </html>
-"""
-    
-    return send_email(to_email, subject, plain_body, html_body)
+""",
+)
 
 
-def send_webinar_7day(to_email: str, first_name: str, webinar_date: str) -> bool:
+def build_webinar_confirmation(first_name: str, webinar_date: str, 
+                               timezone: str = 'EST', calendar_link: str = None) -> tuple:
     """
-    Send 7-day reminder email - preview topics, build excitement.
+    Build the confirmation email sent immediately after registration.
+    Returns (subject, plain_body, html_body).
     """
-    subject = "One week until the FERS Workshop – Here's what to expect"
-    
-    plain_body = f"""Hi {first_name},
+    return WEBINAR_CONFIRMATION.render_text(first_name=first_name, webinar_date=webinar_date, timezone=timezone)
+
+
+def send_webinar_confirmation(to_email: str, first_name: str, webinar_date: str, 
+                              timezone: str = 'EST', calendar_link: str = None) -> bool:
+    """
+    Send confirmation email immediately after registration.
+    """
+    return send_rendered(WEBINAR_CONFIRMATION.render(
+        to_email, first_name=first_name, webinar_date=webinar_date, timezone=timezone
+    ))
+
+
+WEBINAR_7DAY = EmailTemplate(
+    'webinar_7day',
+    subject="One week until the FERS Workshop – Here's what to expect",
+    plain="""Hi {first_name},
 
 Your FERS Retirement Workshop is coming up in one week ({webinar_date}).
 
@@ -134,9 +153,8 @@ Over 500 federal employees have attended our workshops. We're looking forward to
 
 See you on {webinar_date},
 The PlanWell Team
-"""
-
-    html_body = f"""
+""",
+    html="""
 <!DOCTYPE html>
 <html>
 <head>
@@ -186,19 +204,31 @@ The PlanWell Team
     </div>
 </body>
 </html>
-"""
-    
-    return send_email(to_email, subject, plain_body, html_body)
+""",
+)
 
 
-def send_webinar_3day(to_email: str, first_name: str, webinar_date: str, 
-                       timezone: str = 'EST') -> bool:
+def build_webinar_7day(first_name: str, webinar_date: str) -> tuple:
     """
-    Send 3-day reminder - what to prepare.
+    Build the 7-day reminder email - preview topics, build excitement.
+    Returns (subject, plain_body, html_body).
     """
-    subject = "3 days until your FERS Workshop – Quick prep"
-    
-    plain_body = f"""Hi {first_name},
+    return WEBINAR_7DAY.render_text(first_name=first_name, webinar_date=webinar_date)
+
+
+def send_webinar_7day(to_email: str, first_name: str, webinar_date: str) -> bool:
+    """
+    Send 7-day reminder email - preview topics, build excitement.
+    """
+    return send_rendered(WEBINAR_7DAY.render(
+        to_email, first_name=first_name, webinar_date=webinar_date
+    ))
+
+
+WEBINAR_3DAY = EmailTemplate(
+    'webinar_3day',
+    subject="3 days until your FERS Workshop – Quick prep",
+    plain="""Hi {first_name},
 
 Just 3 days until the FERS Retirement Workshop on {webinar_date} at 11:00 AM {timezone}.
 
@@ -217,9 +247,8 @@ Your Zoom link will arrive tomorrow.
 
 See you soon,
 The PlanWell Team
-"""
-
-    html_body = f"""
+""",
+    html="""
 <!DOCTYPE html>
 <html>
 <head>
@@ -270,19 +299,33 @@ The PlanWell Team
     </div>
 </body>
 </html>
-"""
-    
-    return send_email(to_email, subject, plain_body, html_body)
+""",
+)
 
 
-def send_webinar_1day(to_email: str, first_name: str, webinar_date: str, 
-                       zoom_link: str, timezone: str = 'EST') -> bool:
+def build_webinar_3day(first_name: str, webinar_date: str, 
+                       timezone: str = 'EST') -> tuple:
     """
-    Send 1-day reminder with Zoom link.
+    Build the 3-day reminder - what to prepare.
+    Returns (subject, plain_body, html_body).
     """
-    subject = f"Tomorrow: Your FERS Workshop + Zoom Link"
-    
-    plain_body = f"""Hi {first_name},
+    return WEBINAR_3DAY.render_text(first_name=first_name, webinar_date=webinar_date, timezone=timezone)
+
+
+def send_webinar_3day(to_email: str, first_name: str, webinar_date: str, 
+                      timezone: str = 'EST') -> bool:
+    """
+    Send 3-day reminder - what to prepare.
+    """
+    return send_rendered(WEBINAR_3DAY.render(
+        to_email, first_name=first_name, webinar_date=webinar_date, timezone=timezone
+    ))
+
+
+WEBINAR_1DAY = EmailTemplate(
+    'webinar_1day',
+    subject="Tomorrow: Your FERS Workshop + Zoom Link",
+    plain="""Hi {first_name},
 
 Your FERS Retirement Workshop is tomorrow!
 
@@ -299,9 +342,8 @@ We recommend blocking off the full 3 hours. Most attendees tell us they wished t
 
 See you tomorrow,
 The PlanWell Team
-"""
-
-    html_body = f"""
+""",
+    html="""
 <!DOCTYPE html>
 <html>
 <head>
@@ -353,19 +395,33 @@ The PlanWell Team
     </div>
 </body>
 </html>
-"""
-    
-    return send_email(to_email, subject, plain_body, html_body)
+""",
+)
 
 
-def send_webinar_dayof(to_email: str, first_name: str, zoom_link: str, 
-                        timezone: str = 'EST') -> bool:
+def build_webinar_1day(first_name: str, webinar_date: str, 
+                       zoom_link: str, timezone: str = 'EST') -> tuple:
     """
-    Send day-of reminder (morning of webinar).
+    Build the 1-day reminder with Zoom link.
+    Returns (subject, plain_body, html_body).
     """
-    subject = "Starting in a few hours – Join the FERS Workshop"
-    
-    plain_body = f"""Hi {first_name},
+    return WEBINAR_1DAY.render_text(first_name=first_name, webinar_date=webinar_date, zoom_link=zoom_link, timezone=timezone)
+
+
+def send_webinar_1day(to_email: str, first_name: str, webinar_date: str, 
+                      zoom_link: str, timezone: str = 'EST') -> bool:
+    """
+    Send 1-day reminder with Zoom link.
+    """
+    return send_rendered(WEBINAR_1DAY.render(
+        to_email, first_name=first_name, webinar_date=webinar_date, zoom_link=zoom_link, timezone=timezone
+    ))
+
+
+WEBINAR_DAYOF = EmailTemplate(
+    'webinar_dayof',
+    subject="Starting in a few hours – Join the FERS Workshop",
+    plain="""Hi {first_name},
 
 The FERS Retirement Workshop starts today at 11:00 AM {timezone}.
 
@@ -373,9 +429,8 @@ The FERS Retirement Workshop starts today at 11:00 AM {timezone}.
 
 See you soon,
 The PlanWell Team
-"""
-
-    html_body = f"""
+""",
+    html="""
 <!DOCTYPE html>
 <html>
 <head>
@@ -413,9 +468,27 @@ The PlanWell Team
     </div>
 </body>
 </html>
-"""
-    
-    return send_email(to_email, subject, plain_body, html_body)
+""",
+)
+
+
+def build_webinar_dayof(first_name: str, zoom_link: str, 
+                        timezone: str = 'EST') -> tuple:
+    """
+    Build the day-of reminder (morning of webinar).
+    Returns (subject, plain_body, html_body).
+    """
+    return WEBINAR_DAYOF.render_text(first_name=first_name, zoom_link=zoom_link, timezone=timezone)
+
+
+def send_webinar_dayof(to_email: str, first_name: str, zoom_link: str, 
+                       timezone: str = 'EST') -> bool:
+    """
+    Send day-of reminder (morning of webinar).
+    """
+    return send_rendered(WEBINAR_DAYOF.render(
+        to_email, first_name=first_name, zoom_link=zoom_link, timezone=timezone
+    ))
 
 
 if __name__ == '__main__':
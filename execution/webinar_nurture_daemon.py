@@ -0,0 +1,315 @@
+"""
+Webinar Nurture Daemon
+======================
+Resident alternative to the hourly cron scheduler: sends each reminder
+(7-day, 3-day, 1-day, day-of) at its exact due time instead of at the
+next hourly run.
+
+The daemon keeps a min-heap with one entry per upcoming registrant: the
+due time of that registrant's next unsent reminder. It sleeps until the
+head of the heap is due, sends everything due, and plans each
+registrant's following reminder. The Google client stack, templates and
+mirror are loaded once for the life of the process.
+
+Due times, in the webinar's timezone:
+    7-day    one week before the webinar starts
+    3-day    three days before
+    1-day    one day before
+    day-of   NURTURE_DAYOF_HOUR (default 8:00) on the day, or an hour before start if earlier
+A reminder that is already due when a registration arrives goes out
+straight away while it is still inside the scheduler's day window
+(7-day: 6-8 days out, 3-day: 2-4, 1-day: 1, day-of: before the start).
+
+New registrations reach the heap through the local mirror: rows recorded
+by the webhook workers on this host are picked up every
+NURTURE_POLL_SECONDS (default 15, one indexed query), and the mirror is
+synced from the sheet every NURTURE_SYNC_SECONDS (default 300) for rows
+added by hand or elsewhere. A full resync rebuilds the heap. Flags are
+re-read from the mirror before each send, so a reminder sent by another
+process in the meantime is not sent twice.
+
+Failed sends go to the email retry queue (email_retry), whose jobs this
+process also delivers.
+
+Only the holder of the scheduler's leader lease (scheduler_lease,
+'webinar-nurture') sends. A daemon that cannot take it, because a cron
+run or another daemon holds it, stays on standby: it keeps its heap
+current and tries for the lease every poll, so a second daemon on another
+host takes over within SCHEDULER_LEASE_TTL of the first one dying. Cron
+runs in leader mode exit while a daemon holds the lease, and the daemon
+also stands by while `--mode shard` runs hold shard leases.
+
+Usage:
+    python webinar_nurture_daemon.py
+    python webinar_nurture_daemon.py --concurrency 16
+    python webinar_nurture_daemon.py --plan 20     # print the next 20 due reminders and exit
+
+systemd unit (instead of the cron entry):
+    ExecStart=/usr/bin/python3 /path/to/planwell-site/execution/webinar_nurture_daemon.py
+    Restart=always
+"""
+
+import argparse
+import heapq
+import os
+import signal
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv(Path(__file__).parent.parent / '.env')
+
+import email_retry
+from google_sheets_client import Registrant, SheetsClient
+from outbox import OutboxDispatcher, get_outbox
+from registrant_mirror import get_mirror
+from scheduler_lease import SchedulerLeases, require_shared_store
+from send_ledger import get_ledger
+from reminder_planner import REMINDER_STAGES, parse_webinar_date
+from webinar_nurture_scheduler import (
+    DEFAULT_SEND_CONCURRENCY,
+    SCHEDULER_FIELDS,
+    FlagSync,
+    SendPipeline,
+    load_zoom_links,
+    record_attempt,
+    record_failed,
+    record_sent,
+    reminder_task,
+    reminder_template,
+)
+
+POLL_SECONDS = float(os.environ.get('NURTURE_POLL_SECONDS', 15))
+SYNC_SECONDS = float(os.environ.get('NURTURE_SYNC_SECONDS', 300))
+DAYOF_SEND_HOUR = int(os.environ.get('NURTURE_DAYOF_HOUR', 8))
+
+# Reminders sent a fixed time before the webinar starts; day-of goes in the morning
+STAGE_LEADS = {
+    'Email_7Day_Sent': timedelta(days=7),
+    'Email_3Day_Sent': timedelta(days=3),
+    'Email_1Day_Sent': timedelta(days=1),
+}
+DAYOF_MIN_LEAD = timedelta(hours=1)
+
+
+def stage_times(stage, webinar: datetime) -> Tuple[float, float]:
+    """(due_at, expires_at) epoch seconds of one reminder for a webinar start time."""
+    day_start = webinar.replace(hour=0, minute=0, second=0, microsecond=0)
+    if stage.column in STAGE_LEADS:
+        due = webinar - STAGE_LEADS[stage.column]
+        # End of the last day of the stage's window
+        expires = day_start - timedelta(days=stage.min_days - 1)
+    else:
+        due = min(day_start.replace(hour=DAYOF_SEND_HOUR), webinar - DAYOF_MIN_LEAD)
+        expires = webinar
+    return due.timestamp(), expires.timestamp()
+
+
+def next_reminder(reg, first_stage: int = 0, now: float = None) -> Optional[Tuple[int, float]]:
+    """(stage index, due_at) of a registrant's next unsent, unexpired reminder, or None."""
+    webinar = parse_webinar_date(reg.webinar_date)
+    if not reg.email or not webinar:
+        return None
+    now = time.time() if now is None else now
+    for index in range(first_stage, len(REMINDER_STAGES)):
+        stage = REMINDER_STAGES[index]
+        if getattr(reg, stage.field):
+            continue
+        due_at, expires_at = stage_times(stage, webinar)
+        if expires_at > now:
+            return index, due_at
+    return None
+
+
+class NurtureDaemon:
+    """Due-time heap of every upcoming registrant's next reminder."""
+
+    def __init__(self, sheets: SheetsClient, concurrency: int = DEFAULT_SEND_CONCURRENCY):
+        self.sheets = sheets
+        self.mirror = get_mirror(sheets.sheet_id)
+        self.ledger = get_ledger(sheets.sheet_id)
+        self.lease = SchedulerLeases('leader')
+        self.concurrency = concurrency
+        self.zoom_links = load_zoom_links()
+        self.heap = []           # (due_at, row_number, stage index)
+        self.planned = {}        # row_number -> (due_at, stage index) of its live heap entry
+        self.seen_through = 0    # highest mirror row planned
+        self.generation = None   # mirror generation the heap was built from
+        self.last_sync = 0.0
+        self.stopping = threading.Event()
+
+    def plan(self, reg, first_stage: int = 0, now: float = None):
+        """Schedule a registrant's next reminder from first_stage on (replaces any earlier entry)."""
+        self.planned.pop(reg.row_number, None)
+        if self.mirror.canonical_row(reg.email, reg.webinar_id) != reg.row_number:
+            return  # repeat registration: only the first row gets reminders
+        upcoming = next_reminder(reg, first_stage, now)
+        if upcoming:
+            index, due_at = upcoming
+            self.planned[reg.row_number] = (due_at, index)
+            heapq.heappush(self.heap, (due_at, reg.row_number, index))
+
+    def rebuild(self):
+        """Plan every registrant whose webinar has not passed, from the mirror's day index."""
+        self.heap, self.planned = [], {}
+        self.generation = self.mirror.generation
+        self.seen_through = self.mirror.last_row()
+        now = time.time()
+        for reg in self.mirror.iter_by_webinar_day(date.today() - timedelta(days=1), date.max, SCHEDULER_FIELDS):
+            self.plan(reg, now=now)
+        print(f"Planned {len(self.planned)} upcoming reminders")
+
+    def catch_up(self):
+        """Sync the mirror when due, then plan rows added since the last look."""
+        if time.time() - self.last_sync >= SYNC_SECONDS:
+            try:
+                stats = self.mirror.sync(self.sheets)
+                if any(stats.values()):
+                    print(f"Mirror sync: {stats}")
+            except Exception as e:
+                print(f"Mirror sync failed, retrying in {SYNC_SECONDS:g}s: {e}")
+            self.last_sync = time.time()
+
+        if self.mirror.generation != self.generation:
+            self.rebuild()
+            return
+        for reg in self.mirror.iter_registrants(SCHEDULER_FIELDS, after=self.seen_through):
+            self.plan(reg)
+            self.seen_through = reg.row_number
+            if reg.row_number in self.planned:
+                due_at, index = self.planned[reg.row_number]
+                print(f"  New registrant {reg.email}: {REMINDER_STAGES[index].label} "
+                      f"due {datetime.fromtimestamp(due_at):%Y-%m-%d %H:%M}")
+
+    def pop_due(self, now: float):
+        """Heap entries due by now, skipping entries replaced by a later plan()."""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due_at, row_number, index = heapq.heappop(self.heap)
+            if self.planned.get(row_number) == (due_at, index):
+                del self.planned[row_number]
+                due.append((row_number, index))
+        return due
+
+    def send_due(self):
+        now = time.time()
+        due = self.pop_due(now)
+        if not due:
+            return
+
+        retry_keys = email_retry.open_retry_keys(self.sheets.sheet_id)
+        self.ledger.refresh()
+        # Shared content per (stage, webinar), rendered once for the whole batch
+        templates = {}
+        flag_sync = FlagSync(self.ledger, self.sheets)
+        pipeline = SendPipeline(
+            self.concurrency,
+            on_sent=lambda task: record_sent(self.ledger, self.mirror, task),
+            on_failed=lambda task, error: record_failed(self.ledger, self.sheets, task, error)
+        )
+        try:
+            for row_number, index in due:
+                # Re-read: flags may have been set, or the date edited, since this was planned
+                row = self.mirror.get_registrant(row_number)
+                if row is None:
+                    continue
+                reg = Registrant(**row)
+                stage = REMINDER_STAGES[index]
+                upcoming = next_reminder(reg, index, now)
+                if upcoming is None or upcoming[0] != index or upcoming[1] > now:
+                    self.plan(reg, index, now)
+                    continue
+                # The following stage is a day or more away; a failure here belongs to the retry queue
+                self.plan(reg, index + 1, now)
+                if (row_number, stage.column) in retry_keys or \
+                        self.ledger.is_done(reg.email, reg.webinar_id, stage.column):
+                    continue
+                if not self.lease.held:
+                    # Another instance may be sending: stop, and replan everything on regaining the lease
+                    self.generation = None
+                    break
+                key = (index, reg.webinar_id, reg.webinar_date)
+                if key not in templates:
+                    templates[key] = reminder_template(stage, reg.webinar_id, reg.webinar_date, self.zoom_links)
+                task = reminder_task(stage, reg, templates[key])
+                record_attempt(self.ledger, task)
+                pipeline.submit(task)
+                flag_sync.maybe_sync()
+        finally:
+            pipeline.drain()
+            self.ledger.sync_to_sheet(self.sheets)
+
+        if pipeline.sent or pipeline.failed:
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {pipeline.summary()}")
+        if self.heap:
+            due_at, row_number, index = self.heap[0]
+            print(f"Next: {REMINDER_STAGES[index].label} for row {row_number} "
+                  f"at {datetime.fromtimestamp(due_at):%Y-%m-%d %H:%M:%S} ({len(self.planned)} planned)")
+
+    def run(self):
+        print(f"Webinar Nurture Daemon - {datetime.now().isoformat()}")
+        recovered = self.sheets.flush_updates() + self.ledger.sync_to_sheet(self.sheets)
+        if recovered:
+            print(f"Flushed {recovered} sent-timestamps left over from a previous run")
+
+        leading = None
+        while not self.stopping.is_set():
+            try:
+                if not self.lease.held and self.lease.acquire():
+                    # Another instance may have sent while this one waited
+                    self.generation = None
+                if self.lease.held != leading:
+                    leading = self.lease.held
+                    print(f"Leader lease {'acquired; sending' if leading else 'held elsewhere; on standby'}")
+                self.catch_up()
+                if leading:
+                    self.send_due()
+            except Exception as e:
+                print(f"Nurture daemon error: {e}")
+            # Sleep until the next reminder is due, waking to look for new registrations
+            timeout = POLL_SECONDS
+            if self.heap and leading:
+                timeout = min(timeout, max(0.0, self.heap[0][0] - time.time()))
+            self.stopping.wait(timeout)
+        self.lease.release()
+        print("Nurture daemon stopped")
+
+    def stop(self):
+        self.stopping.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Send webinar nurture emails at their due times')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_SEND_CONCURRENCY,
+                        help='Parallel sends (default: SCHEDULER_SEND_CONCURRENCY or 8)')
+    parser.add_argument('--plan', type=int, metavar='N',
+                        help='Print the next N due reminders and exit')
+    args = parser.parse_args()
+
+    daemon = NurtureDaemon(SheetsClient(), concurrency=args.concurrency)
+    if args.plan is not None:
+        daemon.catch_up()
+        for due_at, row_number, index in heapq.nsmallest(args.plan, daemon.heap):
+            print(f"  {datetime.fromtimestamp(due_at):%Y-%m-%d %H:%M}  {REMINDER_STAGES[index].label:<16} "
+                  f"row {row_number}")
+        return
+
+    # Fail at startup rather than on every poll
+    require_shared_store()
+    retries = OutboxDispatcher(get_outbox(), kinds=[email_retry.EMAIL_JOB])
+    retries.start()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: daemon.stop())
+    try:
+        daemon.run()
+    finally:
+        retries.stop()
+
+
+if __name__ == '__main__':
+    main()
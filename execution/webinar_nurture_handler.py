@@ -2,7 +2,8 @@
 Webinar Nurture Handler
 ========================
 Flask webhook endpoint to handle webinar registration submissions.
-Adds to Google Sheet and sends confirmation email immediately.
+Queues the submission in the local outbox and returns 202; the outbox
+dispatcher adds it to the Google Sheet and sends the confirmation email.
 
 Usage:
     python webinar_nurture_handler.py
@@ -15,6 +16,11 @@ Expects POST to /api/webinar with JSON:
     "webinar_id": "dec-30-2025",
     "webinar_date": "2025-12-30T11:00:00-05:00"
 }
+
+Responds 202 with {"success": true, "queued": true, "job_id": ...}. The
+response no longer carries "email_sent": the confirmation goes out after
+the response, from the outbox. Without SMTP credentials the confirmation
+is logged and skipped, not retried.
 """
 
 import os
@@ -28,12 +34,35 @@ from dotenv import load_dotenv
 load_dotenv(Path(__file__).parent.parent / '.env')
 
 # Import our modules
-from google_sheets_client import SheetsClient
-from webinar_emails import send_webinar_confirmation
+from google_sheets_client import COLUMNS, SheetsClient, build_registrant_row
+from registrant_mirror import get_mirror
+from email_sender import SMTPNotConfigured, deliver
+from webinar_emails import WEBINAR_CONFIRMATION
+from outbox import PermanentJobError, enqueue, ensure_dispatcher, register_job
 
 app = Flask(__name__)
 CORS(app)
 
+# Registrant fields a repeat submission may update in place
+DETAIL_FIELDS = {'first_name': 'First Name', 'last_name': 'Last Name', 'agency': 'Agency'}
+
+
+def is_valid_webinar_date(iso_date: str) -> bool:
+    """
+    True for an empty or ISO 8601 webinar_date. Anything else is refused
+    at the door: format_webinar_date() would pass it through into the
+    confirmation subject.
+    """
+    if not iso_date:
+        return True
+    if not isinstance(iso_date, str):
+        return False
+    try:
+        datetime.fromisoformat(iso_date.replace('Z', '+00:00'))
+        return True
+    except ValueError:
+        return False
+
 
 def format_webinar_date(iso_date: str) -> str:
     """Convert ISO date to human-readable format."""
@@ -60,14 +89,121 @@ def get_timezone_from_date(iso_date: str) -> str:
         return 'EST'
 
 
+def registrant_from_payload(data):
+    """Registrant dict (as taken by SheetsClient.add_registrant) for a queued submission."""
+    return {
+        'name': data.get('name', ''),
+        'email': data['email'],
+        'agency': data.get('agency', ''),
+        'timeline': data.get('timeline', ''),
+        'source': 'webinar_registration',
+        'webinar_id': data.get('webinar_id', ''),
+        'webinar_date': data.get('webinar_date', ''),
+        'submitted_at': data.get('submitted_at'),
+    }
+
+
+def changed_details(existing, registrant):
+    """Name/agency values a repeat submission changes, as {field: new value}."""
+    row = build_registrant_row(registrant)
+    return {
+        field: row[COLUMNS[column]]
+        for field, column in DETAIL_FIELDS.items()
+        if row[COLUMNS[column]] and row[COLUMNS[column]] != existing[field]
+    }
+
+
+def process_webinar_registration(job):
+    """
+    Outbox job: add the registrant to the sheet and send the confirmation.
+    
+    Repeat submissions for the same email and webinar are found through the
+    mirror's (email, webinar_id) index and never append a second row:
+    - new registration        -> append the row, send the confirmation
+    - repeat, not confirmed   -> re-send the confirmation against the first row
+    - repeat, confirmed       -> skip (name/agency changes are updated in place)
+    
+    Each completed step is checkpointed on the job, so a retry after a
+    Sheets or SMTP failure resumes without appending a duplicate row.
+    """
+    data = job.payload
+    sheets = SheetsClient.shared()
+    mirror = get_mirror(sheets.sheet_id)
+    if data.get('row_num') is None:
+        # Pick up rows added by hand or on another host before deciding
+        mirror.sync_if_stale(sheets)
+    
+    # Held for the whole job, so a repeat submission processed concurrently,
+    # by this or another worker process, waits and then sees this job's row
+    # and confirmation timestamp
+    with mirror.key_lock(data['email'], data.get('webinar_id', '')):
+        register_and_confirm(job, sheets, mirror)
+
+
+def register_and_confirm(job, sheets, mirror):
+    data = job.payload
+    if data.get('already_confirmed'):
+        return
+    
+    row_num = data.get('row_num')
+    if row_num is None:
+        registrant = registrant_from_payload(data)
+        existing = mirror.find_registration(data['email'], data.get('webinar_id', ''))
+        if existing is None:
+            sheets.ensure_headers()
+            row_num = sheets.add_registrant(registrant)
+            mirror.record_row(row_num, build_registrant_row(registrant))
+            job.checkpoint(row_num=row_num)
+            print(f"Added registrant to row {row_num}")
+        else:
+            row_num = existing['row_number']
+            changes = changed_details(existing, registrant)
+            if changes:
+                sheets.update_cells(row_num, {DETAIL_FIELDS[f]: value for f, value in changes.items()})
+                mirror.update_fields(row_num, changes)
+            already_confirmed = bool(existing['email_confirmation_sent'])
+            job.checkpoint(row_num=row_num, duplicate=True, already_confirmed=already_confirmed)
+            print(f"Repeat registration for {data['email']} ({data.get('webinar_id', '')}), "
+                  f"row {row_num}: {'skipped' if already_confirmed else 're-confirming'}")
+            if already_confirmed:
+                return
+    
+    if not data.get('email_sent'):
+        # Format date for email
+        webinar_date = format_webinar_date(data.get('webinar_date', ''))
+        timezone = get_timezone_from_date(data.get('webinar_date', ''))
+        first_name = data.get('name', '').split()[0] if data.get('name') else 'there'
+        
+        try:
+            deliver(WEBINAR_CONFIRMATION.render(
+                data['email'], first_name=first_name, webinar_date=webinar_date, timezone=timezone
+            ))
+        except SMTPNotConfigured:
+            return  # logged by deliver(); nothing to retry until SMTP is set up
+        except ValueError as e:
+            raise PermanentJobError(str(e))  # e.g. a line break in a header value
+        print(f"Email sent successfully to {data['email']}")
+        job.checkpoint(email_sent=True)
+    
+    # Update email sent timestamp
+    if row_num > 0:
+        sheets.update_email_sent(row_num, 'Email_Confirmation_Sent')
+        mirror.mark_email_sent(row_num, 'Email_Confirmation_Sent', datetime.now().isoformat())
+        print(f"Updated confirmation timestamp for row {row_num}")
+
+
+register_job('webinar_registration', process_webinar_registration)
+
+
 @app.route('/api/webinar', methods=['POST'])
 def handle_webinar_registration():
     """
     Handle webinar registration form submission.
     
-    1. Add to Google Sheet
-    2. Send confirmation email
-    3. Return success response
+    1. Validate the submission
+    2. Record it in the local outbox
+    3. Return 202 - the outbox dispatcher adds it to the Google Sheet
+       and sends the confirmation email
     """
     data = request.json
     
@@ -79,47 +215,26 @@ def handle_webinar_registration():
     if not email:
         return jsonify({'success': False, 'error': 'Email is required'}), 400
     
+    if not is_valid_webinar_date(data.get('webinar_date', '')):
+        return jsonify({'success': False, 'error': 'webinar_date must be an ISO 8601 date'}), 400
+    
     try:
-        # Initialize sheets client
-        sheets = SheetsClient()
-        sheets.ensure_headers()
-        
-        # Add registrant to sheet
-        row_num = sheets.add_registrant({
+        job_id = enqueue('webinar_registration', {
             'name': data.get('name', ''),
             'email': email,
             'agency': data.get('agency', ''),
             'timeline': data.get('timeline', ''),
-            'source': 'webinar_registration',
             'webinar_id': data.get('webinar_id', ''),
             'webinar_date': data.get('webinar_date', ''),
+            'submitted_at': datetime.now().isoformat(),
         })
         
-        print(f"Added registrant to row {row_num}")
-        
-        # Format date for email
-        webinar_date = format_webinar_date(data.get('webinar_date', ''))
-        timezone = get_timezone_from_date(data.get('webinar_date', ''))
-        first_name = data.get('name', '').split()[0] if data.get('name') else 'there'
-        
-        # Send confirmation email
-        email_sent = send_webinar_confirmation(
-            to_email=email,
-            first_name=first_name,
-            webinar_date=webinar_date,
-            timezone=timezone
-        )
-        
-        # Update email sent timestamp
-        if email_sent and row_num > 0:
-            sheets.update_email_sent(row_num, 'Email_Confirmation_Sent')
-            print(f"Updated confirmation timestamp for row {row_num}")
-        
         return jsonify({
             'success': True,
             'message': 'Registration received',
-            'email_sent': email_sent
-        })
+            'queued': True,
+            'job_id': job_id
+        }), 202
         
     except Exception as e:
         print(f"Error handling registration: {e}")
@@ -139,4 +254,5 @@ if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
     print(f"Starting Webinar Nurture Handler on port {port}")
     print(f"Webhook URL: http://localhost:{port}/api/webinar")
+    ensure_dispatcher()  # drain jobs left over from before a restart
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -2,31 +2,64 @@
 Webinar Nurture Scheduler
 ==========================
 Scheduled script (run via cron) to send timed nurture emails.
-Checks all registrants and sends emails based on days until webinar.
+Checks registrants whose webinar is 0-8 days away (read through the
+mirror's webinar-day index, so past webinars cost nothing) and sends
+emails based on days until webinar. The due list for every stage is
+planned in one pass by reminder_planner (NumPy column masks when NumPy is
+installed, the per-row loop otherwise).
+
+Sends run on a bounded thread pool (--concurrency, default
+SCHEDULER_SEND_CONCURRENCY or 8); the main thread is the single writer that
+records sent flags as results come back, and the run ends with a
+throughput summary.
+
+Failed sends go to the persistent retry queue (email_retry) instead of
+waiting for the next hourly run; due retries are delivered at the start
+and end of each run, and rows with a queued or dead-lettered retry are
+not sent again here.
+
+Sent flags are written to the sheet from the send ledger every
+SCHEDULER_FLAG_SYNC_SECONDS (10) during the run and again at its end, so
+if this host dies mid-run, an instance on another host that takes over
+the lease re-sends at most the few seconds of sends still in flight.
+
+Instances coordinate through scheduler_lease: by default a run takes the
+leader lease and exits if another run (an overlapping cron run, another
+host, the resident daemon) holds it. With --mode shard, instances split
+webinars between SCHEDULER_SHARDS shard leases and each sends only its own.
 
 Usage:
     python webinar_nurture_scheduler.py
+    python webinar_nurture_scheduler.py --concurrency 16
+    python webinar_nurture_scheduler.py --mode shard --max-shards 2
 
-Cron setup (run every hour):
-    5 * * * * cd /path/to/planwell-site && python execution/webinar_nurture_scheduler.py >> /tmp/webinar_nurture.log 2>&1
+Cron setup (run every hour; SCHEDULER_LEASE_ALLOW_LOCAL=1 on a single host,
+SCHEDULER_LEASE_PATH on shared storage for several):
+    5 * * * * cd /path/to/planwell-site && SCHEDULER_LEASE_ALLOW_LOCAL=1 python execution/webinar_nurture_scheduler.py >> /tmp/webinar_nurture.log 2>&1
 """
 
+import argparse
 import os
 import json
-from datetime import datetime, timedelta
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent / '.env')
 
+import email_retry
+from email_sender import deliver
+from email_templates import EmailTemplate
 from google_sheets_client import SheetsClient
-from webinar_emails import (
-    send_webinar_7day,
-    send_webinar_3day,
-    send_webinar_1day,
-    send_webinar_dayof
-)
+from registrant_mirror import get_mirror
+from send_ledger import get_ledger
+from reminder_planner import ReminderStage, plan_reminders
+from send_rate_limiter import PACED_MAX_WAIT_SECONDS
+from scheduler_lease import LEASE_MODE, LEASE_MODES, LEASE_SHARDS, SchedulerLeases
 
 # Webinar data with Zoom links (loaded from JSON or hardcoded)
 WEBINAR_ZOOM_LINKS = {
@@ -73,110 +106,324 @@ def get_timezone_from_date(iso_date: str) -> str:
         return 'EST'
 
 
-def parse_webinar_date(iso_date: str) -> datetime:
-    """Parse ISO date string to datetime."""
+# The only registrant fields the send loop reads
+SCHEDULER_FIELDS = [
+    'first_name', 'email', 'webinar_id', 'webinar_date',
+    'email_7day_sent', 'email_3day_sent', 'email_1day_sent', 'email_dayof_sent',
+]
+
+
+# Reminders go out 8 days before a webinar at the earliest (7-day stage, 6-8 days
+# out) and on the day at the latest. The window is a day wider on each side
+# because days are counted in the webinar's timezone, not this host's.
+DUE_WINDOW_DAYS = (-1, 9)
+
+
+def due_window(today: date = None):
+    """First and last webinar day with a reminder that may be due today."""
+    today = today or date.today()
+    return today + timedelta(days=DUE_WINDOW_DAYS[0]), today + timedelta(days=DUE_WINDOW_DAYS[1])
+
+
+# One due email: message is a RenderedEmail, column records that it was sent
+SendTask = namedtuple('SendTask', ['row_number', 'email', 'webinar_id', 'column', 'label', 'message'])
+
+
+def reminder_template(stage: ReminderStage, webinar_id: str, webinar_date: str, zoom_links: dict) -> EmailTemplate:
+    """A stage's template with one webinar's date, timezone and Zoom link bound in."""
+    shared = {
+        'webinar_date': get_webinar_date_formatted(webinar_date),
+        'timezone': get_timezone_from_date(webinar_date),
+        'zoom_link': zoom_links.get(webinar_id, 'https://planwellfp.com/webinar'),
+    }
+    return stage.template.bind(**{slot: value for slot, value in shared.items() if slot in stage.template.slots})
+
+
+def reminder_task(stage: ReminderStage, reg, template: EmailTemplate) -> SendTask:
+    """One registrant's reminder from its webinar's reminder_template(); only the name is filled in."""
+    message = template.render(reg.email, first_name=reg.first_name or 'there')
+    return SendTask(reg.row_number, reg.email, reg.webinar_id, stage.column, stage.label, message)
+
+
+DEFAULT_SEND_CONCURRENCY = int(os.environ.get('SCHEDULER_SEND_CONCURRENCY', 8))
+# Sheet flags of finished sends are written at least this often during a run,
+# so an instance that takes over after a crash sees them rather than re-sending
+FLAG_SYNC_SECONDS = float(os.environ.get('SCHEDULER_FLAG_SYNC_SECONDS', 10))
+
+
+class FlagSync:
+    """Writes ledgered sends' sheet flags every FLAG_SYNC_SECONDS while sends are queued."""
+    
+    def __init__(self, ledger, sheets, interval: float = FLAG_SYNC_SECONDS):
+        self.ledger = ledger
+        self.sheets = sheets
+        self.interval = interval
+        self.next_at = time.monotonic() + interval
+    
+    def maybe_sync(self):
+        if time.monotonic() < self.next_at:
+            return
+        self.next_at = time.monotonic() + self.interval
+        try:
+            self.ledger.sync_to_sheet(self.sheets)
+        except Exception as e:
+            # The ledger keeps them as sent; the next sync writes them
+            print(f"  Could not write sent flags to the sheet yet: {e}")
+
+
+def record_attempt(ledger, task: SendTask):
+    """Ledger the send before it is handed to SMTP."""
+    ledger.record(task.email, task.webinar_id, task.column, task.row_number, 'attempt')
+
+
+def record_sent(ledger, mirror, task: SendTask):
+    """Ledger the send and mirror its flag; the sheet flag follows in ledger.sync_to_sheet()."""
+    entry = ledger.record(task.email, task.webinar_id, task.column, task.row_number, 'sent')
+    mirror.mark_email_sent(task.row_number, task.column, entry.at)
+
+
+def record_failed(ledger, sheets, task: SendTask, error: Exception):
+    """Ledger the failure and hand the message to the retry queue."""
+    ledger.record(task.email, task.webinar_id, task.column, task.row_number, 'failed',
+                  error=f"{type(error).__name__}: {error}")
+    queue_failed(sheets, task, error)
+
+
+def run_send(task: SendTask):
+    """
+    Pool worker: send one email. Returns (task, ok, duration_ms, error).
+    A throttled send waits its turn at the rate limiter rather than failing.
+    """
+    started = time.perf_counter()
     try:
-        return datetime.fromisoformat(iso_date.replace('Z', '+00:00'))
-    except:
-        return None
+        deliver(task.message, max_wait=PACED_MAX_WAIT_SECONDS)
+        ok, error = True, None
+    except Exception as e:
+        ok, error = False, e
+    return task, ok, (time.perf_counter() - started) * 1000, error
+
+
+class SendPipeline:
+    """
+    Bounded worker pool for sends with a single result writer.
+    
+    Worker threads only send. Results are handed back to the thread that
+    calls submit()/drain(), which is the only one that calls on_sent and
+    on_failed, so flag recording and retry queueing need no locking. At most 2 x concurrency sends are in
+    flight, so planning never runs far ahead of sending.
+    """
+    
+    def __init__(self, concurrency: int, on_sent, on_failed=None):
+        self.concurrency = max(1, concurrency)
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='send')
+        self.in_flight = set()
+        self.durations = []
+        self.sent = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+    
+    def submit(self, task: SendTask):
+        while len(self.in_flight) >= self.concurrency * 2:
+            self._collect(wait(self.in_flight, return_when=FIRST_COMPLETED).done)
+        self.in_flight.add(self.executor.submit(run_send, task))
+    
+    def drain(self):
+        """Wait for every in-flight send and record its result."""
+        while self.in_flight:
+            self._collect(wait(self.in_flight, return_when=FIRST_COMPLETED).done)
+        self.executor.shutdown()
+    
+    def _collect(self, done):
+        for future in done:
+            self.in_flight.discard(future)
+            task, ok, duration_ms, error = future.result()
+            self.durations.append(duration_ms)
+            if ok:
+                self.sent += 1
+                self.on_sent(task)
+                print(f"    ✓ Sent {task.label} to {task.email}")
+            else:
+                self.failed += 1
+                print(f"    ✗ {task.label} to {task.email} failed: {error}")
+                if self.on_failed:
+                    self.on_failed(task, error)
+    
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        attempted = self.sent + self.failed
+        durations = sorted(self.durations)
+        
+        def percentile(p: float) -> float:
+            if not durations:
+                return 0.0
+            return durations[min(len(durations) - 1, int(round(p / 100 * (len(durations) - 1))))]
+        
+        return (f"Sent {self.sent}/{attempted} emails ({self.failed} failed) in {elapsed:.1f}s - "
+                f"{attempted / elapsed if elapsed else 0:.1f} emails/s with {self.concurrency} workers; "
+                f"send latency p50 {percentile(50):.0f} ms, p95 {percentile(95):.0f} ms")
 
 
-def days_until_webinar(webinar_date: datetime) -> int:
-    """Calculate days until the webinar."""
-    if not webinar_date:
-        return -999
-    now = datetime.now(webinar_date.tzinfo) if webinar_date.tzinfo else datetime.now()
-    delta = webinar_date.date() - now.date()
-    return delta.days
+def queue_failed(sheets, task: SendTask, error: Exception):
+    """Hand a failed send to the retry queue, which sets its flag once it goes out."""
+    job_id = email_retry.queue_retry(task.message, error, sheets.sheet_id, task.row_number,
+                                     task.column, task.label, task.webinar_id)
+    if job_id is not None:
+        outcome = 'dead-lettered (permanent failure)' if email_retry.is_permanent(error) else 'queued for retry'
+        print(f"      {outcome} as job {job_id}")
 
 
-def is_morning() -> bool:
-    """Check if it's morning (before noon) for day-of emails."""
-    return datetime.now().hour < 12
+def drain_retries(max_seconds: float = None):
+    stats = email_retry.drain(email_retry.RETRY_DRAIN_SECONDS if max_seconds is None else max_seconds)
+    if stats:
+        print(f"Email retry queue: {stats}")
 
 
-def run_scheduler():
+def run_scheduler(concurrency: int = DEFAULT_SEND_CONCURRENCY, mode: str = LEASE_MODE,
+                  shards: int = LEASE_SHARDS, max_shards: int = None):
     """Main scheduler function - check all registrants and send due emails."""
     print(f"\n{'='*60}")
     print(f"Webinar Nurture Scheduler - {datetime.now().isoformat()}")
     print(f"{'='*60}")
     
+    # Another run (an overlapping cron run, another host, the daemon) may be
+    # sending: work only under the leader lease or the shards this run holds
+    leases = SchedulerLeases(mode, shards, max_shards)
+    if not leases.acquire():
+        print(f"Another instance holds {leases.conflict}; nothing to do")
+        return
+    print(f"Holding {leases.describe()}")
+    
     zoom_links = load_zoom_links()
     
     try:
         sheets = SheetsClient()
-        registrants = sheets.get_all_registrants()
-        print(f"Found {len(registrants)} registrants to check")
         
-        emails_sent = 0
+        # Timestamps journaled by a run that crashed before flushing, and
+        # sends ledgered by a run that never got to write their flags
+        recovered = sheets.flush_updates()
+        ledger = get_ledger(sheets.sheet_id)
+        recovered += ledger.sync_to_sheet(sheets)
+        if recovered:
+            print(f"Flushed {recovered} sent-timestamps left over from a previous run")
+        in_doubt = len(ledger.in_doubt())
+        if in_doubt:
+            print(f"{in_doubt} reminders are in doubt (interrupted mid-send) and will not be re-sent; "
+                  f"see `python execution/send_ledger.py in-doubt`")
         
-        for reg in registrants:
-            email = reg.get('email')
-            first_name = reg.get('first_name') or 'there'
-            webinar_id = reg.get('webinar_id')
-            webinar_date_str = reg.get('webinar_date')
-            row_num = reg.get('row_number')
-            
-            if not email or not webinar_date_str:
-                continue
-            
-            webinar_date = parse_webinar_date(webinar_date_str)
-            if not webinar_date:
-                print(f"  Skipping {email}: Invalid webinar date")
-                continue
-            
-            days = days_until_webinar(webinar_date)
-            formatted_date = get_webinar_date_formatted(webinar_date_str)
-            timezone = get_timezone_from_date(webinar_date_str)
-            zoom_link = zoom_links.get(webinar_id, 'https://planwellfp.com/webinar')
-            
-            print(f"\n  Checking {first_name} ({email}): {days} days until webinar")
-            
-            # Skip if webinar already passed
-            if days < 0:
-                print(f"    Webinar already passed, skipping")
-                continue
-            
-            # 7-day reminder (between 6-8 days out to have some buffer)
-            if 6 <= days <= 8 and not reg.get('email_7day_sent'):
-                print(f"    Sending 7-day reminder...")
-                if send_webinar_7day(email, first_name, formatted_date):
-                    sheets.update_email_sent(row_num, 'Email_7Day_Sent')
-                    emails_sent += 1
-                    print(f"    ✓ Sent 7-day reminder")
-            
-            # 3-day reminder (between 2-4 days out)
-            elif 2 <= days <= 4 and not reg.get('email_3day_sent'):
-                print(f"    Sending 3-day reminder...")
-                if send_webinar_3day(email, first_name, formatted_date, timezone):
-                    sheets.update_email_sent(row_num, 'Email_3Day_Sent')
-                    emails_sent += 1
-                    print(f"    ✓ Sent 3-day reminder")
-            
-            # 1-day reminder (1 day before)
-            elif days == 1 and not reg.get('email_1day_sent'):
-                print(f"    Sending 1-day reminder with Zoom link...")
-                if send_webinar_1day(email, first_name, formatted_date, zoom_link, timezone):
-                    sheets.update_email_sent(row_num, 'Email_1Day_Sent')
-                    emails_sent += 1
-                    print(f"    ✓ Sent 1-day reminder")
+        # Incremental sync of the local mirror: new rows + flag columns only
+        mirror = get_mirror(sheets.sheet_id)
+        sync_stats = mirror.sync(sheets)
+        print(f"Mirror sync: {sync_stats}")
+        
+        # Retries due from earlier runs first; anything still queued is left to the queue
+        drain_retries(max_seconds=0)
+        retry_keys = email_retry.open_retry_keys(sheets.sheet_id)
+        
+        first_day, last_day = due_window()
+        upcoming = sum(mirror.count_by_webinar_day(first_day, last_day).values())
+        print(f"Found {upcoming} registrants with webinars {first_day} to {last_day} "
+              f"({mirror.count()} in total)")
+        
+        duplicates_skipped = 0
+        retries_skipped = 0
+        ledger_skipped = 0
+        other_shards = 0
+        pipeline = SendPipeline(
+            concurrency,
+            on_sent=lambda task: record_sent(ledger, mirror, task),
+            on_failed=lambda task, error: record_failed(ledger, sheets, task, error)
+        )
+        
+        # Every send is ledgered before and after SMTP; the sheet flags are
+        # written from the ledger in bulk as the run goes and on the way out
+        flag_sync = FlagSync(ledger, sheets)
+        try:
+            # Only upcoming webinars, read through the day index as compact
+            # records of SCHEDULER_FIELDS, then planned in one pass:
+            # 7-day (6-8 days out, for some buffer), 3-day (2-4), 1-day,
+            # or day-of (mornings only); nothing once the webinar has passed
+            plan = plan_reminders(list(mirror.iter_by_webinar_day(first_day, last_day, SCHEDULER_FIELDS)))
+            for reg in plan.invalid:
+                print(f"  Skipping {reg.email}: Invalid webinar date")
             
-            # Day-of reminder (morning only)
-            elif days == 0 and is_morning() and not reg.get('email_dayof_sent'):
-                print(f"    Sending day-of reminder...")
-                if send_webinar_dayof(email, first_name, zoom_link, timezone):
-                    sheets.update_email_sent(row_num, 'Email_DayOf_Sent')
-                    emails_sent += 1
-                    print(f"    ✓ Sent day-of reminder")
+            # One group per stage and webinar: the date, timezone, Zoom link and
+            # email body are rendered once, each registrant only adds a name
+            for stage, webinar_id, webinar_date, group in plan.groups():
+                # Webinars in shards held by other instances are theirs to send
+                if not leases.owns(webinar_id):
+                    other_shards += len(group)
+                    continue
+                template = reminder_template(stage, webinar_id, webinar_date, zoom_links)
+                print(f"  {stage.label} for {webinar_id or webinar_date}: {len(group)} due")
+                
+                for _, reg, days in group:
+                    row_num = reg.row_number
+                    
+                    # Lease lost (expired or taken over): another instance may be sending now
+                    if not leases.held:
+                        raise RuntimeError(f"Lost {leases.describe()}; stopped queueing sends")
+                    
+                    # Repeat registrations: only the first row for an email+webinar gets reminders
+                    if mirror.canonical_row(reg.email, reg.webinar_id) != row_num:
+                        duplicates_skipped += 1
+                        continue
+                    
+                    # Already in the retry queue (or dead-lettered): the queue owns it
+                    if (row_num, stage.column) in retry_keys:
+                        retries_skipped += 1
+                        continue
+                    
+                    # Ledgered as sent (or in doubt) even if the sheet flag never got written
+                    if ledger.is_done(reg.email, reg.webinar_id, stage.column):
+                        ledger_skipped += 1
+                        continue
+                    
+                    task = reminder_task(stage, reg, template)
+                    print(f"  Queueing {task.label} for {reg.first_name or 'there'} ({reg.email}), {days} days out")
+                    record_attempt(ledger, task)
+                    pipeline.submit(task)
+                    flag_sync.maybe_sync()
+        finally:
+            # Record every send already handed to the pool, even if planning failed
+            pipeline.drain()
+            ledger.sync_to_sheet(sheets)
+        
+        # Give this run's transient failures their first few backoff rounds now
+        if pipeline.failed:
+            drain_retries()
         
         print(f"\n{'='*60}")
-        print(f"Scheduler complete. Sent {emails_sent} emails.")
+        print(f"Scheduler complete. {pipeline.summary()}")
+        if duplicates_skipped:
+            print(f"Skipped {duplicates_skipped} duplicate registration rows with a due reminder.")
+        if retries_skipped:
+            print(f"Skipped {retries_skipped} reminders already in the retry queue.")
+        if ledger_skipped:
+            print(f"Skipped {ledger_skipped} reminders the send ledger records as sent or in doubt.")
+        if other_shards:
+            print(f"Left {other_shards} due reminders to the instances holding the other shards.")
         print(f"{'='*60}\n")
         
     except Exception as e:
         print(f"Scheduler error: {e}")
         raise
+    finally:
+        leases.release()
 
 
 if __name__ == '__main__':
-    run_scheduler()
+    parser = argparse.ArgumentParser(description='Send due webinar nurture emails')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_SEND_CONCURRENCY,
+                        help='Parallel sends (default: SCHEDULER_SEND_CONCURRENCY or 8)')
+    parser.add_argument('--mode', choices=LEASE_MODES, default=LEASE_MODE,
+                        help='leader: one instance sends; shard: instances split webinars '
+                             '(default: SCHEDULER_MODE or leader)')
+    parser.add_argument('--shards', type=int, default=LEASE_SHARDS,
+                        help='Shard count in shard mode; the same on every instance (default: SCHEDULER_SHARDS or 4)')
+    parser.add_argument('--max-shards', type=int,
+                        help='Most shards this instance takes (default: every free shard)')
+    args = parser.parse_args()
+    run_scheduler(concurrency=args.concurrency, mode=args.mode, shards=args.shards,
+                  max_shards=args.max_shards)